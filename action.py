@@ -0,0 +1,37 @@
+from __future__ import annotations
+from enum import Enum
+
+from coord import Coord
+
+
+class ActionType(Enum):
+    MOVE = 0
+    ATTACK = 1
+    HEAL = 2
+    RAISE_DEAD = 3
+    END_TURN = 4
+
+
+class Action:
+    """
+    A single choice the selected unit can make during a turn
+
+    Attributes:
+        kind (ActionType): what the selected unit does
+        from_coord (Coord): square of the selected unit, None for END_TURN
+        to_coord (Coord): destination or target square, None for END_TURN
+    """
+    __slots__ = ('kind', 'from_coord', 'to_coord')
+
+    def __init__(self, kind: ActionType, from_coord: Coord = None, to_coord: Coord = None):
+        self.kind = kind
+        self.from_coord = from_coord
+        self.to_coord = to_coord
+
+    def __str__(self):
+        if self.kind is ActionType.END_TURN:
+            return 'Action(END_TURN)'
+        return f'Action({self.kind.name} {self.from_coord} -> {self.to_coord})'
+
+
+END_TURN = Action(ActionType.END_TURN)
@@ -0,0 +1,108 @@
+from __future__ import annotations
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Iterator, List, Optional
+
+from dungeon import Dungeon
+from game import Game
+from rng import CounterRNG
+
+
+class ScriptResult:
+    """
+    Outcome of playing one command file through Game
+
+    Attributes:
+        path (str): the command file, None for commands given directly
+        zobrist (int): hash of the final position, see Dungeon.zobrist
+        error (str): the exception that stopped the game early, None if
+            every command was read
+    """
+    __slots__ = ('path', 'zobrist', 'error')
+
+    def __init__(self, path: Optional[str], zobrist: int, error: str = None):
+        self.path = path
+        self.zobrist = zobrist
+        self.error = error
+
+    def __eq__(self, other):
+        if not isinstance(other, ScriptResult):
+            return NotImplemented
+        return (self.path, self.zobrist, self.error) == (other.path, other.zobrist, other.error)
+
+    def __str__(self):
+        line = f'{self.zobrist:016x} {self.path}'
+        return line if self.error is None else f'{line} error: {self.error}'
+
+
+def run_commands(commands: Iterable[str], seed: int = 0, height: int = 8, width: int = 8,
+                 path: str = None) -> ScriptResult:
+    """
+    Plays a fresh game from the lines of commands, exactly as if they had
+    been typed, with nothing drawn or printed. The villains and every dice
+    roll come from CounterRNG(seed), so the same commands and seed always
+    end in the same position.
+
+    Parameters:
+        commands (iterable): command lines, an open file works
+        seed (int): seed of the game's RNG
+        height (int): dungeon height
+        width (int): dungeon width
+        path (str): name to report the result under
+
+    Returns:
+        result (ScriptResult): hash of the position the commands left
+    """
+    game = Game(Dungeon(height, width, [], verbose=False, rng=CounterRNG(seed)), commands, verbose=False)
+    game.setup()
+    try:
+        game.play()
+    except Exception as e:  # a malformed line stops that game, not the run
+        return ScriptResult(path, game.dungeon.zobrist, f'{e.__class__.__name__}: {e}')
+    return ScriptResult(path, game.dungeon.zobrist)
+
+
+def run_file(path: str, seed: int = 0, height: int = 8, width: int = 8) -> ScriptResult:
+    """
+    Plays one command file, see run_commands
+    """
+    with open(path) as f:
+        return run_commands(f, seed, height, width, path)
+
+
+def run_files(paths: List[str], seed: int = 0, workers: int = None, chunk_size: int = 16,
+              **options) -> Iterator[ScriptResult]:
+    """
+    Plays command files across a process pool and yields their results in
+    the order of paths. Every file starts from the same seeded position, so
+    results don't depend on the number of workers. Keyword options are
+    passed on to run_file.
+
+    Parameters:
+        paths (list): command files
+        seed (int): seed of every game's RNG
+        workers (int): worker processes, os.cpu_count() by default; 1 plays
+            every file in this process
+        chunk_size (int): files handed to a worker at a time
+    """
+    if chunk_size <= 0:
+        raise ValueError
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers == 1:
+        for path in paths:
+            yield run_file(path, seed, **options)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        yield from pool.map(_run_file, [(path, seed, options) for path in paths], chunksize=chunk_size)
+
+
+def _run_file(job) -> ScriptResult:
+    path, seed, options = job
+    return run_file(path, seed, **options)
+
+
+if __name__ == "__main__":
+    for result in run_files(sys.argv[1:]):
+        print(result)
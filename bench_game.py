@@ -0,0 +1,355 @@
+from __future__ import annotations
+import argparse
+import contextlib
+import json
+import math
+import platform
+import random
+import sys
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from coord import Coord
+from creatures import Goblin, Skeleton, Necromancer
+from dungeon import Dungeon
+from game import Game
+from rng import CounterRNG
+from simulation import GreedyAgent, Simulation
+
+# Benchmarks for the rules code run in every turn. Each case times one
+# benchmark on a square board of one size with a given number of villains
+# and reports the best seconds per operation over a few repeats.
+#
+#   python bench_game.py --out baseline.json
+#   python bench_game.py --compare baseline.json
+#
+# The second run times everything again and lists every benchmark that got
+# more than --threshold slower than the baseline, exiting with status 1 if any
+# did; --against compares two stored runs instead.
+
+VERSION = 1
+SIZES = tuple(range(4, 13))
+UNITS = tuple(range(1, 13))
+BUDGET = 0.01  # seconds per case and round
+REPEATS = 3
+ROUNDS = 3
+GAMES = 3  # headless games per board size
+THRESHOLD = 0.25  # slowdown flagged as a regression
+
+
+class _Discard:
+    """
+    Stream that drops everything, print_board is timed without a terminal
+    """
+
+    @staticmethod
+    def write(text):
+        return len(text)
+
+    @staticmethod
+    def flush():
+        pass
+
+
+def build(size: int, units: int, seed: int = 0) -> Optional[Dungeon]:
+    """
+    Returns a size x size dungeon with the heroes placed and units villains
+    on distinct squares above them, the first one right in front of the
+    Warrior so there is always an attack to make. None when the villains
+    don't fit.
+    """
+    free = (size - 2) * size
+    if units > free:
+        return None
+    rng = random.Random(f'{size}:{units}:{seed}')
+    villains = [Necromancer() if i == units - 1 and units > 2 else (Skeleton() if i % 3 else Goblin())
+                for i in range(units)]
+    d = Dungeon(size, size, villains, verbose=False, rng=CounterRNG(seed))
+    d.place_heroes()
+    warrior = d.position_of(d.heroes[0])
+    front = Coord(warrior.x - 1, warrior.y)
+    squares = [Coord(x, y) for x in range(size - 2) for y in range(size) if Coord(x, y) != front]
+    d.set_character_at(villains[0], front.x, front.y)
+    for v, square in zip(villains[1:], rng.sample(squares, units - 1)):
+        d.set_character_at(v, square.x, square.y)
+    return d
+
+
+def move_validation(d: Dungeon, rng: random.Random) -> Tuple[Callable, int]:
+    """
+    Dungeon.is_valid_move from every unit to a sample of squares
+    """
+    squares = [Coord(x, y) for x in range(d.height) for y in range(d.width)]
+    pairs = [[start, to] for start in d.positions.values() for to in rng.sample(squares, 8)]
+    is_valid_move = d.is_valid_move
+
+    def run():
+        for pair in pairs:
+            is_valid_move(pair)
+    return run, len(pairs)
+
+
+def path_scan(d: Dungeon, rng: random.Random) -> Tuple[Callable, int]:
+    """
+    Villain.is_valid_move along every row and column through each villain,
+    the path scanning part of the villain movement rule
+    """
+    board = d.board
+    calls = []
+    for v in d.villains:
+        start = d.position_of(v)
+        for to in [Coord(start.x, y) for y in range(d.width)] + [Coord(x, start.y) for x in range(d.height)]:
+            if to != start:
+                calls.append((v.is_valid_move, start, to))
+
+    def run():
+        for is_valid_move, start, to in calls:
+            is_valid_move(start, to, board)
+    return run, len(calls)
+
+
+def attack(d: Dungeon, rng: random.Random) -> Tuple[Callable, int]:
+    """
+    Dungeon.attack, dice included, for every attack on the board; health is
+    put back after each pass so nothing dies
+    """
+    pairs = [(start, to) for start in d.positions.values() for to in d.targets(start)[0]]
+    healths = [(char, char._temp_health) for char in d.positions]
+    resolve = d.attack
+
+    def run():
+        for start, to in pairs:
+            resolve(start, to)
+        for char, hp in healths:
+            char._temp_health = hp
+    return run, len(pairs)
+
+
+def find_character(d: Dungeon, rng: random.Random) -> Tuple[Callable, int]:
+    """
+    Game.find_character for every unit
+    """
+    game = Game(d, verbose=False)
+    chars = list(d.positions)
+    find = game.find_character
+
+    def run():
+        for char in chars:
+            find(char)
+    return run, len(chars)
+
+
+def print_board(d: Dungeon, rng: random.Random) -> Tuple[Callable, int]:
+    """
+    Dungeon.print_board into a stream that drops the text
+    """
+    discard = _Discard()
+
+    def run():
+        with contextlib.redirect_stdout(discard):
+            d.print_board()
+    return run, 1
+
+
+def place_villains(d: Dungeon, rng: random.Random) -> Tuple[Callable, int]:
+    """
+    Dungeon.place_villains on an empty board, clearing the board included
+    """
+    size = d.height
+
+    def run():
+        d.board = [[None] * size for _ in range(size)]
+        d.place_villains()
+    return run, 1
+
+
+def generate_villains(d: Dungeon, rng: random.Random) -> Tuple[Callable, int]:
+    """
+    Dungeon.generate_villains, which picks its own villain count
+    """
+    return d.generate_villains, 1
+
+
+def game(size: int, seed: int = 0) -> Tuple[Callable, int]:
+    """
+    Full headless games between greedy agents, GAMES per pass
+    """
+    def run():
+        for i in range(GAMES):
+            d = Dungeon(size, size, [], verbose=False, rng=CounterRNG(seed, i))
+            sim = Simulation(d, GreedyAgent(random.Random(i)), GreedyAgent(random.Random(-i)))
+            sim.setup()
+            sim.play()
+    return run, GAMES
+
+
+# benchmarks run for every board size and villain count
+UNIT_BENCHMARKS: Dict[str, Callable] = {
+    'dungeon.is_valid_move': move_validation,
+    'villain.is_valid_move': path_scan,
+    'dungeon.attack': attack,
+    'game.find_character': find_character,
+    'dungeon.print_board': print_board,
+    'dungeon.place_villains': place_villains,
+}
+# benchmarks run once per board size
+SIZE_BENCHMARKS: Dict[str, Callable] = {
+    'dungeon.generate_villains': lambda size: generate_villains(build(size, 1), None),
+    'simulation.game': game,
+}
+
+
+def measure(run: Callable, ops: int, budget: float = BUDGET, repeats: int = REPEATS) -> float:
+    """
+    Returns the best seconds per operation of run, which does ops operations
+    per call. Calls are batched until a batch takes budget / repeats.
+    """
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            run()
+        elapsed = time.perf_counter() - start
+        if elapsed >= budget / repeats:
+            break
+        number *= 2
+    best = elapsed
+    for _ in range(repeats - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            run()
+        best = min(best, time.perf_counter() - start)
+    return best / (number * max(ops, 1))
+
+
+def key(name: str, size: int, units: int = None) -> str:
+    return f'{name}/{size}x{size}' if units is None else f'{name}/{size}x{size}/{units}'
+
+
+def cases(sizes: Iterable[int] = SIZES, units: Iterable[int] = UNITS, only: str = '') -> List[Tuple[str, Callable]]:
+    """
+    Lists (case key, function setting the case up) for every benchmark whose
+    name contains only, skipping villain counts that don't fit the board
+    """
+    found = []
+    for size in sizes:
+        for count in units:
+            if count > (size - 2) * size:
+                continue
+            for name, bench in UNIT_BENCHMARKS.items():
+                if only in name:
+                    found.append((key(name, size, count),
+                                  lambda bench=bench, size=size, count=count, name=name:
+                                  bench(build(size, count), random.Random(f'{name}:{size}:{count}'))))
+        for name, bench in SIZE_BENCHMARKS.items():
+            if only in name:
+                found.append((key(name, size), lambda bench=bench, size=size: bench(size)))
+    return found
+
+
+def run(sizes: Iterable[int] = SIZES, units: Iterable[int] = UNITS, budget: float = BUDGET,
+        only: str = '', rounds: int = ROUNDS) -> Dict[str, float]:
+    """
+    Times every benchmark whose name contains only. The whole set is run
+    rounds times and each case keeps its best time, so a burst of load on
+    the machine during one pass doesn't show up as a slow case.
+
+    Returns:
+        results (dict): case key -> seconds per operation
+    """
+    results = {}
+    todo = cases(sizes, units, only)
+    for _ in range(rounds):
+        for case, setup in todo:
+            repeats = 1 if case.startswith('simulation.game') else REPEATS
+            seconds = measure(*setup(), budget, repeats)
+            results[case] = min(seconds, results.get(case, seconds))
+    return results
+
+
+def report(results: Dict[str, float]) -> dict:
+    """
+    Wraps results with what they were measured on, as written to JSON
+    """
+    return {'version': VERSION, 'python': platform.python_version(), 'machine': platform.machine(),
+            'results': results}
+
+
+def ratios(baseline: Dict[str, float], current: Dict[str, float]) -> Dict[str, Tuple[float, int]]:
+    """
+    Returns benchmark name -> (geometric mean of current / baseline over the
+    cases in both runs, number of such cases)
+    """
+    logs: Dict[str, List[float]] = {}
+    for case, seconds in current.items():
+        if case in baseline and seconds > 0 and baseline[case] > 0:
+            logs.setdefault(case.split('/')[0], []).append(math.log(seconds / baseline[case]))
+    return {name: (math.exp(sum(values) / len(values)), len(values)) for name, values in logs.items()}
+
+
+def compare(baseline: Dict[str, float], current: Dict[str, float], threshold: float = THRESHOLD,
+            normalize: bool = False) -> List[Tuple[str, float, int]]:
+    """
+    Lists the benchmarks that got slower than the baseline by more than
+    threshold, as a fraction. Benchmarks are judged by the geometric mean
+    over all their board sizes and villain counts: a single case can be off
+    by a third on a busy machine, a slowdown in the code shows in all of
+    them. With normalize, every ratio is divided by the mean over the whole
+    run first, which cancels a machine that is simply slower today but also
+    hides a slowdown shared by every benchmark.
+
+    Returns:
+        regressions (list): (benchmark name, slowdown ratio, cases compared), worst first
+    """
+    found = ratios(baseline, current)
+    scale = 1.0
+    if normalize and found:
+        total = sum(n for _, n in found.values())
+        scale = math.exp(sum(math.log(ratio) * n for ratio, n in found.values()) / total)
+    regressions = [(name, ratio / scale, n) for name, (ratio, n) in found.items() if ratio / scale > 1 + threshold]
+    regressions.sort(key=lambda r: r[1], reverse=True)
+    return regressions
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description='Times the rules hot paths')
+    parser.add_argument('--out', help='write the results to this JSON file')
+    parser.add_argument('--compare', metavar='BASELINE', help='flag regressions against this JSON file')
+    parser.add_argument('--against', metavar='RESULTS', help='compare this JSON file instead of timing again')
+    parser.add_argument('--threshold', type=float, default=THRESHOLD, help='slowdown counted as a regression')
+    parser.add_argument('--normalize', action='store_true', help='cancel out a uniformly slower machine')
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(SIZES))
+    parser.add_argument('--units', type=int, nargs='+', default=list(UNITS))
+    parser.add_argument('--budget', type=float, default=BUDGET, help='seconds spent on each case per round')
+    parser.add_argument('--rounds', type=int, default=ROUNDS, help='passes over every case, the best is kept')
+    parser.add_argument('--only', default='', help='run the benchmarks whose name contains this')
+    args = parser.parse_args(argv)
+
+    if args.against:
+        with open(args.against) as f:
+            results = json.load(f)['results']
+    else:
+        results = run(args.sizes, args.units, args.budget, args.only, args.rounds)
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(report(results), f, indent=1, sort_keys=True)
+    if not args.compare:
+        for case, seconds in results.items():
+            print(f'{case:<40}{seconds * 1e6:12.3f} us')
+        return 0
+    with open(args.compare) as f:
+        baseline = json.load(f)
+    if baseline.get('version') != VERSION:
+        print(f'{args.compare} is not a version {VERSION} benchmark file', file=sys.stderr)
+        return 2
+    regressions = compare(baseline['results'], results, args.threshold, args.normalize)
+    flagged = {name for name, _, _ in regressions}
+    for name, (ratio, n) in sorted(ratios(baseline['results'], results).items()):
+        mark = 'REGRESSION' if name in flagged else ''
+        print(f'{mark:<11}{name:<30}{ratio - 1:+8.1%} over {n} cases')
+    print(f'{len(regressions)} benchmarks slower by more than {args.threshold:.0%}')
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
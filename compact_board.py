@@ -0,0 +1,427 @@
+from __future__ import annotations
+from functools import lru_cache
+from typing import List, Optional
+
+from character import Character, Player
+from coord import Coord, board_coords
+from creatures import Villain, Goblin, Skeleton, Necromancer, Warrior, Mage, Paladin, Ranger
+from dice import roll, count_successes, GOBLIN_BONUS_DICE
+from odds import combat_odds
+
+MAX_UNITS = 16  # 4 heroes plus the most villains a 12x12 dungeon generates
+MAX_CELLS = 12 * 12
+NOWHERE = 255  # pos of a unit that is not on the board
+
+# piece codes; 0 is never a kind so an empty cell can stay 0
+KINDS = (None, Warrior, Mage, Paladin, Ranger, Goblin, Skeleton, Necromancer)
+KIND_CODES = {cls: code for code, cls in enumerate(KINDS) if cls is not None}
+PROTOTYPES = tuple(cls() if cls is not None else None for cls in KINDS)  # rules lookups by kind
+
+# flags
+IN_HEROES = 1  # counted by adventurer_defeat
+IN_VILLAINS = 2  # counted by is_dungeon_clear
+CAN_HEAL = 4  # a Paladin that has not revived anyone yet
+
+_HEIGHT, _WIDTH, _PLAYER, _UNITS = range(4)
+_CELLS = 4
+_FIELDS = ('kinds', 'players', 'healths', 'temp_healths', 'attacks', 'defenses', 'moves', 'ranges', 'positions', 'flags')
+SIZE = _CELLS + MAX_CELLS + len(_FIELDS) * MAX_UNITS
+
+
+@lru_cache(maxsize=None)
+def dealt_damage(atk_kind: int, def_kind: int, margin: int) -> int:
+    """
+    Returns the damage the attacker's deal_damage turns an attack margin into
+    """
+    probe = KINDS[def_kind]()
+    probe.temp_health = 1000
+    return PROTOTYPES[atk_kind].deal_damage(probe, margin)
+
+
+class CompactBoard:
+    """
+    Dungeon position stored in one fixed layout bytearray: a header, one
+    byte per cell holding the slot of the unit standing there (slot + 1,
+    0 for empty), then one array per stat indexed by unit slot. Copying or
+    hashing a position is one pass over SIZE bytes, and no Character
+    objects are involved.
+
+    Attributes:
+        buffer (bytearray): the whole position, a memoryview for wrap()
+        cells (memoryview): height * width cells, row by row
+        kinds, players, healths, temp_healths, attacks, defenses, moves,
+        ranges, positions, flags (memoryview): per slot stat arrays
+    """
+
+    def __init__(self, height: int, width: int):
+        if not (4 <= height <= 12):
+            raise ValueError
+        if not (4 <= width <= 12):
+            raise ValueError
+        self.buffer = bytearray(SIZE)
+        self.buffer[_HEIGHT] = height
+        self.buffer[_WIDTH] = width
+        self.buffer[_PLAYER] = Player.HERO.value
+        self.__bind()
+
+    @classmethod
+    def wrap(cls, buffer) -> CompactBoard:
+        """
+        Views SIZE bytes of an existing buffer as a CompactBoard without
+        copying them. A read only buffer gives a read only board.
+
+        Raises:
+            ValueError: if buffer is not SIZE bytes or its dimensions are out of range
+        """
+        view = memoryview(buffer)
+        if len(view) != SIZE:
+            raise ValueError
+        if not (4 <= view[_HEIGHT] <= 12) or not (4 <= view[_WIDTH] <= 12) or view[_UNITS] > MAX_UNITS:
+            raise ValueError
+        board = cls.__new__(cls)
+        board.buffer = view
+        board.__bind()
+        return board
+
+    def __bind(self):
+        view = memoryview(self.buffer)
+        self.cells = view[_CELLS:_CELLS + MAX_CELLS]
+        start = _CELLS + MAX_CELLS
+        for name in _FIELDS:
+            setattr(self, name, view[start:start + MAX_UNITS])
+            start += MAX_UNITS
+
+    @classmethod
+    def from_dungeon(cls, dungeon) -> CompactBoard:
+        """
+        Copies a Dungeon's board, heroes and villains into a new CompactBoard.
+        Units are given slots in the order heroes, villains, then anything
+        else standing on the board.
+        """
+        board = cls(dungeon.height, dungeon.width)
+        if dungeon.player is not Player.HERO:
+            board.set_next_player()
+        slots = {}
+        for char in dungeon.heroes:
+            slots[id(char)] = board.add_unit(char, IN_HEROES)
+        for char in dungeon.villains:
+            slots[id(char)] = board.add_unit(char, IN_VILLAINS)
+        for x in range(dungeon.height):
+            for y in range(dungeon.width):
+                char = dungeon.character_at(x, y)
+                if char is None:
+                    continue
+                if id(char) not in slots:
+                    slots[id(char)] = board.add_unit(char, 0)
+                board.set_character_at(slots[id(char)], x, y)
+        return board
+
+    @property
+    def height(self):
+        return self.buffer[_HEIGHT]
+
+    @property
+    def width(self):
+        return self.buffer[_WIDTH]
+
+    @property
+    def player(self):
+        return Player(self.buffer[_PLAYER])
+
+    @property
+    def units(self):
+        return self.buffer[_UNITS]
+
+    def add_unit(self, char: Character, flags: int = 0) -> int:
+        """
+        Copies char's class and stats into the next free slot, off the board
+
+        Returns:
+            slot (int): the slot char now occupies
+
+        Raises:
+            ValueError: if every slot is taken
+        """
+        slot = self.buffer[_UNITS]
+        if slot >= MAX_UNITS:
+            raise ValueError
+        self.buffer[_UNITS] = slot + 1
+        self.kinds[slot] = KIND_CODES[type(char)]
+        self.players[slot] = char.player.value
+        self.healths[slot] = char.health
+        self.temp_healths[slot] = char.temp_health
+        self.attacks[slot] = char._attack
+        self.defenses[slot] = char._defense
+        self.moves[slot] = char.move
+        self.ranges[slot] = char.range
+        self.positions[slot] = NOWHERE
+        if isinstance(char, Paladin) and char.heal:
+            flags |= CAN_HEAL
+        self.flags[slot] = flags
+        return slot
+
+    def snapshot(self) -> bytes:
+        """
+        Returns an immutable copy of the whole position
+        """
+        return bytes(self.buffer)
+
+    def restore(self, snapshot: bytes):
+        """
+        Overwrites the position with one returned by snapshot()
+        """
+        self.buffer[:] = snapshot
+
+    def copy(self) -> CompactBoard:
+        board = CompactBoard(self.height, self.width)
+        board.restore(self.buffer)
+        return board
+
+    def __eq__(self, other):
+        if not isinstance(other, CompactBoard):
+            return NotImplemented
+        return self.buffer == other.buffer
+
+    def __hash__(self):
+        return hash(bytes(self.buffer))
+
+    def character_at(self, x: int, y: int) -> Optional[int]:
+        """
+        if given valid coordinates, returns the slot of the unit at coordinates
+
+        Returns:
+            slot (int or None): None if no unit is there
+
+        Raises:
+            ValueError: if x or y isn't within range between 0 and height/width
+        """
+        if not (0 <= x < self.height) or not (0 <= y < self.width):
+            raise ValueError
+        cell = self.cells[x * self.width + y]
+        return cell - 1 if cell else None
+
+    def set_character_at(self, slot: Optional[int], x: int, y: int):
+        """
+        if given valid coordinates, places the unit in slot at x and y,
+        taking it off its old square. A unit already standing there is
+        taken off the board, like Dungeon.set_character_at overwriting it.
+
+        Raises:
+            ValueError: if x or y isn't within range between 0 and height/width
+        """
+        if not (0 <= x < self.height) or not (0 <= y < self.width):
+            raise ValueError
+        index = x * self.width + y
+        old = self.cells[index]
+        if old:
+            self.positions[old - 1] = NOWHERE
+        if slot is None:
+            self.cells[index] = 0
+            return
+        if self.positions[slot] != NOWHERE:
+            self.cells[self.positions[slot]] = 0
+        self.cells[index] = slot + 1
+        self.positions[slot] = index
+
+    def coord_of(self, slot: int) -> Optional[Coord]:
+        """
+        Returns where the unit in slot stands, None if it is off the board
+        """
+        index = self.positions[slot]
+        if index == NOWHERE:
+            return None
+        return Coord(index // self.width, index % self.width)
+
+    def is_valid_move(self, from_coord: Coord, to_coord: Coord) -> bool:
+        """
+        Applies the same rules as Dungeon.is_valid_move: the square must be
+        empty and inside the board, villains slide orthogonally up to their
+        move without passing anyone, the Warrior moves orthogonally and the
+        other heroes may go to any empty square
+        """
+        height = self.height
+        width = self.width
+        if not (0 <= from_coord.x < height) or not (0 <= from_coord.y < width):
+            return False
+        if not (0 <= to_coord.x < height) or not (0 <= to_coord.y < width):
+            return False
+        if from_coord.x == to_coord.x and from_coord.y == to_coord.y:
+            return False
+        cell = self.cells[from_coord.x * width + from_coord.y]
+        if not cell:
+            return False
+        if self.cells[to_coord.x * width + to_coord.y]:
+            return False
+        kind = KINDS[self.kinds[cell - 1]]
+        orthogonal = from_coord.x == to_coord.x or from_coord.y == to_coord.y
+        if issubclass(kind, Villain):
+            move = self.moves[cell - 1]
+            if not orthogonal:
+                return False
+            if abs(from_coord.x - to_coord.x) > move or abs(from_coord.y - to_coord.y) > move:
+                return False
+            if from_coord.x == to_coord.x:
+                step = 1 if to_coord.y > from_coord.y else -1
+                row = from_coord.x * width
+                for y in range(from_coord.y + step, to_coord.y, step):
+                    if self.cells[row + y]:
+                        return False
+            else:
+                step = 1 if to_coord.x > from_coord.x else -1
+                for x in range(from_coord.x + step, to_coord.x, step):
+                    if self.cells[x * width + from_coord.y]:
+                        return False
+            return True
+        if kind is Warrior:
+            return orthogonal
+        return True
+
+    def legal_moves(self, slot: int) -> List[Coord]:
+        """
+        Returns every square the unit in slot may move to, following the
+        same rules as is_valid_move and the per class generators
+        """
+        index = self.positions[slot]
+        if index == NOWHERE:
+            return []
+        height = self.height
+        width = self.width
+        cells = self.cells
+        coords = board_coords(height, width)
+        x, y = divmod(index, width)
+        kind = KINDS[self.kinds[slot]]
+        squares = []
+        if issubclass(kind, Villain):
+            reach = self.moves[slot]
+            for dx, dy in ((1, 0), (-1, 0), (0, 1), (0, -1)):
+                nx, ny = x + dx, y + dy
+                for _ in range(reach):
+                    if not (0 <= nx < height and 0 <= ny < width) or cells[nx * width + ny]:
+                        break
+                    squares.append(coords[nx][ny])
+                    nx += dx
+                    ny += dy
+        elif kind is Warrior:
+            squares.extend(coords[x][j] for j in range(width) if not cells[x * width + j])
+            squares.extend(coords[i][y] for i in range(height) if not cells[i * width + y])
+        else:
+            squares.extend(coords[i][j] for i in range(height) for j in range(width) if not cells[i * width + j])
+        return squares
+
+    def move(self, from_coord: Coord, to_coord: Coord):
+        """
+        Moves the unit at the beginning coordinate to the ending coordinate
+        if the move is valid
+        """
+        if self.is_valid_move(from_coord, to_coord):
+            width = self.width
+            src = from_coord.x * width + from_coord.y
+            dst = to_coord.x * width + to_coord.y
+            cell = self.cells[src]
+            self.cells[dst] = cell
+            self.cells[src] = 0
+            self.positions[cell - 1] = dst
+
+    def is_valid_attack(self, from_coord: Coord, to_coord: Coord) -> bool:
+        """
+        Applies the same rules as Dungeon.is_valid_attack
+        """
+        height = self.height
+        width = self.width
+        if not (0 <= from_coord.x < height) or not (0 <= from_coord.y < width):
+            return False
+        if not (0 <= to_coord.x < height) or not (0 <= to_coord.y < width):
+            return False
+        if from_coord.x == to_coord.x and from_coord.y == to_coord.y:
+            return False
+        atk = self.cells[from_coord.x * width + from_coord.y]
+        defd = self.cells[to_coord.x * width + to_coord.y]
+        if not atk or not defd:
+            return False
+        atk -= 1
+        defd -= 1
+        if self.players[atk] == self.players[defd] or self.temp_healths[defd] == 0:
+            return False
+        return abs(from_coord.x - to_coord.x) + abs(from_coord.y - to_coord.y) <= self.ranges[atk]
+
+    def attack(self, from_coord: Coord, to_coord: Coord, sample: bool = False) -> int:
+        """
+        Resolves an attack the way Dungeon.attack does, rolling the attack
+        and defense pools unless sample is set, in which case the margin is
+        drawn from the odds table
+
+        Returns:
+            dealt (int): damage dealt, 0 for an invalid attack
+        """
+        if not self.is_valid_attack(from_coord, to_coord):
+            return 0
+        width = self.width
+        atk = self.cells[from_coord.x * width + from_coord.y] - 1
+        defd = self.cells[to_coord.x * width + to_coord.y] - 1
+        atk_kind = self.kinds[atk]
+        def_kind = self.kinds[defd]
+        if sample:
+            margin = combat_odds(PROTOTYPES[atk_kind], PROTOTYPES[def_kind]).sample()
+        else:
+            margin = count_successes(roll(self.attacks[atk]), True)
+            if KINDS[atk_kind] is Warrior and KINDS[def_kind] is Goblin:
+                margin += count_successes(roll(GOBLIN_BONUS_DICE), True)
+            margin -= count_successes(roll(self.defenses[defd]), False)
+        return self.__damage(atk, defd, margin)
+
+    def __damage(self, atk: int, defd: int, margin: int) -> int:
+        if margin <= 0:
+            return 0
+        dealt = min(dealt_damage(self.kinds[atk], self.kinds[defd], margin), self.temp_healths[defd])
+        self.temp_healths[defd] -= dealt
+        return dealt
+
+    def revive(self, from_coord: Coord, to_coord: Coord):
+        """
+        Paladin.revive on the board: brings the unit at to_coord back to half
+        health once per game if it is within the Paladin's range
+        """
+        width = self.width
+        paladin = self.cells[from_coord.x * width + from_coord.y] - 1
+        target = self.cells[to_coord.x * width + to_coord.y] - 1
+        if paladin < 0 or target < 0 or not self.flags[paladin] & CAN_HEAL:
+            return
+        if abs(from_coord.x - to_coord.x) + abs(from_coord.y - to_coord.y) > self.ranges[paladin]:
+            return
+        self.temp_healths[target] = self.healths[target] // 2
+        self.flags[paladin] &= ~CAN_HEAL
+
+    def raise_dead(self, from_coord: Coord, to_coord: Coord):
+        """
+        Necromancer.raise_dead on the board: a dead unit within range comes
+        back at half health fighting for the villains
+        """
+        width = self.width
+        necro = self.cells[from_coord.x * width + from_coord.y] - 1
+        target = self.cells[to_coord.x * width + to_coord.y] - 1
+        if necro < 0 or target < 0 or KINDS[self.kinds[necro]] is not Necromancer:
+            return
+        if self.temp_healths[target] > 0:
+            return
+        if abs(from_coord.x - to_coord.x) + abs(from_coord.y - to_coord.y) > self.ranges[necro]:
+            return
+        self.players[target] = Player.VILLAIN.value
+        self.temp_healths[target] = self.healths[target] // 2
+
+    def set_next_player(self):
+        """
+        Sets current player to its opposite
+        """
+        self.buffer[_PLAYER] ^= 1
+
+    def is_dungeon_clear(self) -> bool:
+        for slot in range(self.units):
+            if self.flags[slot] & IN_VILLAINS and self.temp_healths[slot] > 0:
+                return False
+        return True
+
+    def adventurer_defeat(self) -> bool:
+        for slot in range(self.units):
+            if self.flags[slot] & IN_HEROES and self.temp_healths[slot] > 0:
+                return False
+        return True
@@ -1,18 +1,81 @@
-
-class Coord:
-
-    def __init__(self, x: int, y: int):
-        if isinstance(x, int) and isinstance(y, int):
-            self.__x = x
-            self.__y = y
-
-    @property
-    def x(self):
-        return self.__x
-
-    @property
-    def y(self):
-        return self.__y
-
-    def __str__(self):
-        return f'({self.__x}, {self.__y})'
+from __future__ import annotations
+import operator
+from functools import lru_cache
+from operator import itemgetter
+from typing import Tuple
+
+MAX_SIDE = 12  # largest height or width a Dungeon allows
+
+
+class Coord(tuple):
+    """
+    Immutable (x, y) board coordinate. It hashes and compares like the
+    tuple (x, y), so it can key dicts and sit in sets. Every coordinate
+    that fits on the largest board is interned: Coord(x, y) hands back
+    the same instance each time instead of allocating.
+    """
+    __slots__ = ()
+
+    def __new__(cls, x: int, y: int):
+        """
+        Raises:
+            TypeError: if x or y isn't an integer; bools and NumPy integers
+                are accepted and stored as int
+        """
+        if type(x) is not int or type(y) is not int:
+            x = int(operator.index(x))
+            y = int(operator.index(y))
+        if 0 <= x < MAX_SIDE and 0 <= y < MAX_SIDE:
+            return _INTERNED[x * MAX_SIDE + y]
+        return tuple.__new__(cls, (x, y))
+
+    # itemgetter keeps attribute access in C, these are read in every rules check
+    x = property(itemgetter(0))
+    y = property(itemgetter(1))
+
+    def __getnewargs__(self):
+        return tuple(self)
+
+    def __repr__(self):
+        return f'Coord({self[0]}, {self[1]})'
+
+    def __str__(self):
+        return f'({self[0]}, {self[1]})'
+
+
+_INTERNED = tuple(tuple.__new__(Coord, (x, y)) for x in range(MAX_SIDE) for y in range(MAX_SIDE))
+
+
+@lru_cache(maxsize=None)
+def board_coords(height: int, width: int) -> Tuple[Tuple[Coord, ...], ...]:
+    """
+    Returns the flyweight table of a board, indexed [x][y], so hot loops
+    can look coordinates up instead of constructing them
+
+    Raises:
+        ValueError: if height or width is outside 1..MAX_SIDE
+    """
+    if not (0 < height <= MAX_SIDE) or not (0 < width <= MAX_SIDE):
+        raise ValueError
+    return tuple(tuple(_INTERNED[x * MAX_SIDE + y] for y in range(width)) for x in range(height))
+
+
+@lru_cache(maxsize=None)
+def range_mask(height: int, width: int, reach: int) -> Tuple[Tuple[Tuple[Coord, ...], ...], ...]:
+    """
+    Returns, for every square of a board, the squares within Manhattan
+    distance reach of it, the square itself excluded, indexed [x][y].
+    Attack, revive and raise dead range checks are all this distance.
+
+    Raises:
+        ValueError: if height or width is outside 1..MAX_SIDE or reach < 0
+    """
+    if reach < 0:
+        raise ValueError
+    coords = board_coords(height, width)
+    offsets = [(dx, dy) for dx in range(-reach, reach + 1) for dy in range(-reach, reach + 1)
+               if 0 < abs(dx) + abs(dy) <= reach]
+    return tuple(tuple(tuple(coords[x + dx][y + dy] for dx, dy in offsets
+                             if 0 <= x + dx < height and 0 <= y + dy < width)
+                       for y in range(width))
+                 for x in range(height))
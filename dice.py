@@ -0,0 +1,173 @@
+from __future__ import annotations
+from random import randint
+from typing import List, Sequence
+
+try:
+    import numpy as np
+except ImportError:  # the interactive game only needs the scalar functions
+    np = None
+
+ATTACK_THRESHOLD = 4  # an attack die succeeds when it rolls above this
+DEFENSE_THRESHOLD = 3  # a defense die succeeds when it rolls above this
+GOBLIN_BONUS_DICE = 2  # extra attack dice a Warrior rolls against a Goblin
+MARGIN_BATCH = 1024  # attack margins a MarginBuffer draws at a time
+
+
+def roll(dice: int) -> List[int]:
+    """
+    Rolls a pool of six sided dice
+
+    Parameters:
+        dice (int): number of dice in the pool
+
+    Returns:
+        lst (list): the rolls, each between 1 and 6
+    """
+    return [randint(1, 6) for _ in range(dice)]
+
+
+def count_successes(rolls: Sequence[int], attack: bool = True) -> int:
+    """
+    Counts the rolls that beat the attack or defense threshold
+
+    Parameters:
+        rolls (list): dice rolls
+        attack (Bool): True for attack dice, False for defense dice
+
+    Returns:
+        succ_sum (int): successful rolls
+    """
+    threshold = ATTACK_THRESHOLD if attack else DEFENSE_THRESHOLD
+    succ_sum = 0
+    for r in rolls:
+        if r > threshold:
+            succ_sum += 1
+    return succ_sum
+
+
+def _require_numpy():
+    if np is None:
+        raise ImportError('batched dice need numpy')
+
+
+def roll_batch(dice, size: int, rng=None):
+    """
+    Rolls size pools of dice at once
+
+    Parameters:
+        dice (int or array): dice per pool, one value for every pool or one
+            value per pool
+        size (int): number of pools
+        rng (numpy.random.Generator): source of the rolls, a fresh one by default
+
+    Returns:
+        rolls (ndarray): int8 array of shape (size, most dice); the columns
+            past a pool's own dice count are 0 and never succeed
+    """
+    _require_numpy()
+    if rng is None:
+        rng = np.random.default_rng()
+    dice = np.broadcast_to(np.asarray(dice, dtype=np.int64), (size,))
+    most = int(dice.max()) if size else 0
+    rolls = rng.integers(1, 7, size=(size, most), dtype=np.int8)
+    if most and dice.min() != most:
+        rolls[np.arange(most) >= dice[:, None]] = 0
+    return rolls
+
+
+def count_successes_batch(rolls, attack: bool = True):
+    """
+    Counts the successes of every pool in a batch
+
+    Parameters:
+        rolls (ndarray): array of shape (pools, dice), 0 marks an unused die
+        attack (Bool): True for attack dice, False for defense dice
+
+    Returns:
+        successes (ndarray): successes per pool
+    """
+    _require_numpy()
+    threshold = ATTACK_THRESHOLD if attack else DEFENSE_THRESHOLD
+    return np.count_nonzero(np.asarray(rolls) > threshold, axis=-1)
+
+
+def successes_batch(dice, size: int, attack: bool = True, rng=None):
+    """
+    Rolls size pools and returns the successes of each one
+    """
+    return count_successes_batch(roll_batch(dice, size, rng), attack)
+
+
+def margin_batch(attack_dice: int, defense_dice: int, size: int, rng=None):
+    """
+    Resolves size attacks of an attack pool against a defense pool at once
+
+    Parameters:
+        attack_dice (int): dice in the attack pool
+        defense_dice (int): dice in the defense pool
+        size (int): number of attacks
+        rng (numpy.random.Generator): source of the rolls, a fresh one by default
+
+    Returns:
+        margins (ndarray): attack successes minus defense successes per attack
+    """
+    _require_numpy()
+    if rng is None:
+        rng = np.random.default_rng()
+    return successes_batch(attack_dice, size, True, rng) - successes_batch(defense_dice, size, False, rng)
+
+
+def damage_batch(attacker, defender, size: int, rng=None):
+    """
+    Resolves size attacks of attacker against defender at once, rolling
+    the same pools Dungeon.attack would, including the Warrior's bonus dice
+    against Goblins. Damage modifiers from deal_damage are not applied.
+
+    Parameters:
+        attacker (Character): the attacking character
+        defender (Character): the defending character
+        size (int): number of attacks
+        rng (numpy.random.Generator): source of the rolls, a fresh one by default
+
+    Returns:
+        damage (ndarray): attack successes minus defense successes per attack
+    """
+    return margin_batch(attacker.attack_dice(defender), defender.combat[1], size, rng)
+
+
+class MarginBuffer:
+    """
+    Attack margins drawn size at a time with margin_batch, one buffer per
+    pair of pool sizes, so an attack costs a list pop instead of a Python
+    call per die. Every refill seeds a NumPy generator from the RNG service
+    it is given, so games still reproduce from their service's seed.
+
+    Attributes:
+        size (int): margins drawn per refill
+        margins (dict): (attack dice, defense dice) -> margins not used yet
+    """
+    __slots__ = ('size', 'margins')
+
+    def __init__(self, size: int = MARGIN_BATCH):
+        _require_numpy()
+        if size < 1:
+            raise ValueError
+        self.size = size
+        self.margins = {}
+
+    def draw(self, attack_dice: int, defense_dice: int, rng) -> int:
+        """
+        Returns the margin of one attack between the two pools
+
+        Parameters:
+            attack_dice (int): dice in the attack pool
+            defense_dice (int): dice in the defense pool
+            rng: RNG service seeding the next batch when this pair's runs out,
+                see rng.py
+        """
+        key = (attack_dice, defense_dice)
+        margins = self.margins.get(key)
+        if not margins:
+            generator = np.random.default_rng(rng.randint(0, (1 << 64) - 1))
+            margins = self.margins[key] = margin_batch(attack_dice, defense_dice, self.size, generator).tolist()
+        return margins.pop()
@@ -1,336 +1,654 @@
-from __future__ import annotations
-from creatures import Villain
-from coord import Coord
-from typing import Optional, Union, List
-from coord import Coord
-from character import Player
-from character import Character
-
-from creatures import Villain, Goblin, Skeleton, Necromancer
-from creatures import Hero, Warrior, Mage, Paladin, Ranger
-from random import randint
-
-
-class Dungeon:
-    def __init__(self, height: int, width: int, villains: List[Villain] = []):
-        if not (4 <= height <= 12):
-            raise ValueError
-        if not (4 <= width <= 12):
-            raise ValueError
-
-        self.__height = height
-        self.__width = width
-        self.__heroes = [Warrior(), Mage(), Paladin(), Ranger()]
-        self.__board = [[None for _ in range(width)] for _ in range(height)]
-        self.__player = Player.HERO
-        if len(villains) > 0:
-            self.villains = villains
-        else:
-            self.generate_villains()
-
-    @property
-    def height(self):
-        return self.__height
-
-    @property
-    def width(self):
-        return self.__width
-
-    @property
-    def board(self):
-        return self.__board
-
-    @board.setter
-    def board(self, board: List[List[Union[None, Character]]]):
-        if not isinstance(board, list):
-            if len(board) != self.__width or len(board) != self.__height:
-                raise ValueError
-        else:
-            raise TypeError
-        self.__board = board
-
-    @property
-    def player(self):
-        return self.__player
-
-    @property
-    def heroes(self):
-        return self.__heroes
-
-    @heroes.setter
-    def heroes(self, h):
-        if not isinstance(h, list):
-            for i in h:
-                if not isinstance(i, Hero):
-                    raise TypeError
-            self.__heroes = h
-        else:
-            raise TypeError
-
-    @property
-    def villains(self):
-        return self.__villains
-
-    @villains.setter
-    def villains(self, v):
-        if isinstance(v, list):
-            for i in v:
-                if not isinstance(i, Villain):
-                    raise TypeError
-            if len(v) > 0:
-                self.__villains = v
-        else:
-            raise TypeError
-
-    def generate_villains(self):
-        """
-        This function generates villains for current list of villains if empty
-        """
-        villains = randint(1, max(self.height, self.width))
-        v_lst = []
-        necromancer = False
-
-        for _ in range(villains):  # randomly generated number of villains
-            val = randint(1, 10)
-            if val in range(1, 6):  # 50% chance of selection
-                v_lst.append(Goblin())
-            elif val in range(6, 9):  # 30% chance of selection
-                v_lst.append(Skeleton())
-            elif val in range(9, 11) and necromancer is False:
-                v_lst.append(Necromancer())  # 20% chance of selection
-                necromancer = True
-            elif val in range(9, 11) and necromancer is True:
-                v_lst.append(Skeleton())
-        self.villains = v_lst
-
-    def is_valid_move(self, coords: List[Coord]) -> bool:
-        '''
-                Determines if the move the player is trying to make is valid
-                :param coords:
-                :return: True or False
-                '''
-        # if the length of coords is less than 2 returns false
-        if len(coords) < 2:
-            return False
-
-        from_coord = coords[0]
-        to_coord = coords[1]
-
-        # prevents starting off the board
-        if not (0 <= from_coord.x < self.height) or not (0 <= from_coord.y < self.width):
-            return False
-        # prevents landing off the board
-        if not (0 <= to_coord.x < self.height) or not (0 <= to_coord.y < self.width):
-            return False
-        # prevents moving to the same spot you're already at
-        if (from_coord.x == to_coord.x) and (from_coord.y == to_coord.y):
-            return False
-        # Prevents moving when your character is not at its spot
-        if self.character_at(from_coord.x, from_coord.y) != self:
-            return False
-        # prevents moving through obstacles
-        if self.character_at(to_coord.x, to_coord.y) is not None:
-            return False
-        else:
-            return True
-
-    def is_valid_attack(self, coords: List[Coord]) -> bool:
-        """
-        Determines if the attack is valid using coordinates
-        :param coords:
-        :return: True or False
-        """
-        # if length of coords is less than 2 returns false
-        if len(coords) < 2:
-            return False
-
-        from_coord = coords[0]
-        to_coord = coords[1]
-
-        # prevents attacking from off the board
-        if not (0 <= from_coord.x < self.height) or not (0 <= from_coord.y < self.width):
-            return False
-        # prevents attacking something off the board
-        if not (0 <= to_coord.x < self.height) or not (0 <= to_coord.y < self.width):
-            return False
-        # Prevents attacking the same position your already in
-        if (from_coord.x == to_coord.x) and (from_coord.y == to_coord.y):
-            return False
-        # prevents attacking when there is no character at the attackers position
-        if self.character_at(from_coord.x, from_coord.y) is None:
-            return False
-        # prevents attacking when your character is
-        if self.character_at(to_coord.x, to_coord.y) is None:
-            return False
-        else:
-            return True
-
-    def character_at(self, x: int, y: int):
-        """
-        if given valid coordinates, returns character at coordinates
-
-        Returns:
-            self.board[x][y] (Character or None): None if character isn't there
-
-        Raises:
-            ValueError: if x or y isn't within range between 0 and height/width
-        """
-        if not (0 <= x < self.height) or not (0 <= y < self.width):
-            raise ValueError
-
-        return self.board[x][y]
-
-
-    def set_character_at(self, target: Character, x: int, y: int):
-        """
-        if given valid coordinates, this sets character at x and y coordinates
-        on board
-
-        Raises:
-            ValueError: if x or y isn't within range between 0 and height/width
-        """
-        if not (0 <= x < self.height) or not (0 <= y < self.width):
-            raise ValueError
-
-        self.board[x][y] = target
-
-    def move(self, from_coord: Coord, to_coord: Coord):
-        """
-        Moves value stored at beginning coordinate and places
-        it at ending coordinate
-       """
-
-        if self.is_valid_move([from_coord, to_coord]):  # move must be valid
-            self.board[to_coord.x][to_coord.y] = self.board[from_coord.x][from_coord.y]
-            self.board[from_coord.x][from_coord.y] = None  # setting it to None symbolizes it being moved
-
-    def set_next_player(self):
-        """
-        Sets current player to its opposite
-        """
-        if self.__player == Player.HERO:
-            self.__player = Player.VILLAIN
-        else:
-            self.__player = Player.HERO
-
-    def attack(self, from_coord: Coord, to_coord: Coord):
-        """
-        Checks to see the from_coords and to_coords produce a valid attack.
-         If so, it calculates and deals damage to the Character at the location of the to_coords
-
-        Parameters:
-            from_coord (Coord): x and y starting coordinate
-            to_coord (Coord): x and y ending coordinate
-
-        Raises:
-            TypeError: if value at from or to coordinate is not a character
-        """
-        if not self.is_valid_attack([from_coord, to_coord]):
-            return
-        else:
-            atk = self.character_at(from_coord.x, from_coord.y)
-            defd = self.character_at(to_coord.x, to_coord.y)
-            if isinstance(atk, Character) and isinstance(defd, Character):
-                atk_result = atk.calculate_dice(defd, True)
-                defd_result = defd.calculate_dice(atk, False)
-                damage = atk_result - defd_result
-                if damage > 0:
-                    atk.deal_damage(defd, damage)
-                else:
-                    print(f'{defd} to no damage from {atk}')
-            else:
-                raise TypeError
-
-    def place_heroes(self):
-        """
-        This function places heroes on board in order and does so
-        on board being even or odd length
-        """
-        if len(self.__board) % 2 == 0:  # checking if length of board is even
-            length = len(self.__board)
-            self.set_character_at(Warrior(), length-2, (length//2)-1)
-            self.set_character_at(Mage(), length-1, (length//2)-1)
-            self.set_character_at(Paladin(), length-2, (length//2))
-            self.set_character_at(Ranger(), length-1, (length//2))
-        else:
-            length = len(self.__board)  # if length of board is odd
-            self.set_character_at(Warrior(), length-2, length//2)
-            self.set_character_at(Mage(), length-1, length//2)
-            self.set_character_at(Paladin(), length-2, (length//2)+1)
-            self.set_character_at(Ranger(), length-1, (length//2)+1)
-
-    def place_villains(self):
-        """
-        Randomly places all the villains on the board without
-        the exception of the bottom two rows.
-        """
-        for v in self.__villains:
-            x = randint(1, len(self.__villains))
-            y = randint(1, len(self.__villains))
-            self.set_character_at(v, x, y)  # setting each villain, v, at random coordinates, x and y
-
-
-
-    def print_board(self):
-        st = ' \t'
-        st += '_____' * len(self.board)
-        st += '\n'
-        for i in range(len(self.__board)):
-            st += f'{i}\t'
-            for j in range(len(self.__board[i])):
-                if self.board[i][j] is None:
-                    st += '|___|'
-                else:
-                    st += f'|{self.board[i][j].__class__.__name__[:3]}|'
-            st += '\n'
-        st += '\t'
-        for i in range(len(self.board[0])):
-            st += f'  {i}  '
-        print(st)
-
-    def is_dungeon_clear(self):
-        '''
-        Returns true if the dungeon is clear,  false if it is not.
-        :return: True or False
-        '''
-        for i in self.__villains:
-            if not i.temp_health <= 0:
-                return False
-        return True
-
-    def generate_new_board(self, height: int = -1, width: int = -1):
-        """
-        Makes new board based on new height and width but dungeon
-        must be clear in order to do so
-
-        Parameters:
-            height (int): new height that current height gets set to
-            width (int): new width that current width gets set to
-        """
-        if not self.is_dungeon_clear():
-            return
-
-        if height is None and width is None:  # if no values for height and width are given
-            height = randint(4, 12)
-            width = randint(4, 12)
-            self.board = [[None for _ in range(width)] for _ in range(height)]
-            self.generate_villains()
-            self.place_heroes()
-            self.place_villains()
-
-        else:
-            self.board = [[None for _ in range(width)] for _ in range(height)]
-            self.generate_villains()
-            self.place_heroes()
-            self.place_villains()
-
-    def adventurer_defeat(self):
-        """
-        Returns true if the heroes are all dead, false if they are not
-        :return: True or False
-        """
-        for hero in self.__heroes:
-            if hero.temp_health <= 0:
-                return True
-            else:
-                return False
\ No newline at end of file
+from __future__ import annotations
+from creatures import Villain
+from coord import Coord, range_mask
+from typing import Optional, Union, List, Iterator, Tuple
+from coord import Coord
+from character import Player
+from character import Character
+
+from creatures import Villain, Goblin, Skeleton, Necromancer
+from creatures import Hero, Warrior, Mage, Paladin, Ranger
+from rng import GLOBAL_RNG
+from dice import MarginBuffer
+from odds import combat_odds
+from zobrist import piece_key, position_key, VILLAIN_TO_MOVE
+from action import Action, ActionType
+from placement import place
+from events import EventBus, UnitMoved, AttackResolved, DamageDealt, UnitDied, UnitRevived, TurnEnded, RoomCleared
+
+
+class Dungeon:
+    def __init__(self, height: int, width: int, villains: List[Villain] = [], verbose: bool = True,
+                 sample_attacks: bool = False, rng=None, batch_attacks: bool = False):
+        if not (4 <= height <= 12):
+            raise ValueError
+        if not (4 <= width <= 12):
+            raise ValueError
+
+        self.__height = height
+        self.__width = width
+        self.__heroes = [Warrior(), Mage(), Paladin(), Ranger()]
+        self.__board = [[None for _ in range(width)] for _ in range(height)]
+        self.__positions = {}  # every character on the board -> its Coord
+        self.__zobrist = 0  # incremental hash of the position, see zobrist.py
+        self.__player = Player.HERO
+        self.events = EventBus()  # observers of moves, attacks and turns, see events.py
+        self.__verbose = False
+        self.verbose = verbose  # headless simulations turn off the attack messages
+        self.replay_log = None  # a replay.ReplayWriter recording every change, see replay.py
+        self.rng = rng if rng is not None else GLOBAL_RNG  # every dice roll and random placement, see rng.py
+        self.sample_attacks = sample_attacks  # one draw from the odds table instead of rolling every die
+        self.margins = MarginBuffer() if batch_attacks else None  # margins rolled in batches, see dice.py
+        if len(villains) > 0:
+            self.villains = villains
+        else:
+            self.generate_villains()
+
+    def __getstate__(self):
+        # copies and pickles never write to the original's replay log or tell its observers
+        state = self.__dict__.copy()
+        state['replay_log'] = None
+        state['events'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.events = EventBus()
+        if self.__verbose:
+            self.events.subscribe(AttackResolved, print_attack)
+
+    @property
+    def verbose(self):
+        """
+        Returns true while attacks are printed, which is done by an
+        AttackResolved handler on events
+        """
+        return self.__verbose
+
+    @verbose.setter
+    def verbose(self, verbose: bool):
+        self.__verbose = verbose
+        if verbose:
+            self.events.subscribe(AttackResolved, print_attack)
+        else:
+            self.events.unsubscribe(AttackResolved, print_attack)
+
+    @property
+    def height(self):
+        return self.__height
+
+    @property
+    def width(self):
+        return self.__width
+
+    @property
+    def board(self):
+        return self.__board
+
+    @board.setter
+    def board(self, board: List[List[Union[None, Character]]]):
+        if not isinstance(board, list):
+            raise TypeError
+        if len(board) != self.__height or any(len(row) != self.__width for row in board):
+            raise ValueError
+        self.__board = board
+        self.__positions = {}
+        for x, row in enumerate(board):
+            for y, char in enumerate(row):
+                if char is not None:
+                    self.__positions[char] = Coord(x, y)
+        self.__zobrist = position_key(board, self.__player)
+
+    @property
+    def positions(self):
+        """
+        Returns the index of every character on the board to its Coord.
+        It is kept up to date by set_character_at and move, so the board
+        should only be changed through them.
+        """
+        return self.__positions
+
+    @property
+    def zobrist(self):
+        """
+        Returns the 64 bit hash of the position: every character's class,
+        side, health and square, the Paladin's unused revive and the side
+        to move. Changes made through Dungeon's methods update it in O(1);
+        call rehash() after changing a character's stats directly.
+        """
+        return self.__zobrist
+
+    def rehash(self):
+        """
+        Recomputes the position hash from scratch
+        """
+        self.__zobrist = position_key(self.__board, self.__player)
+
+    def position_of(self, char: Character) -> Optional[Coord]:
+        """
+        Returns where char stands, None if it is not on the board
+        """
+        return self.__positions.get(char)
+
+    @property
+    def player(self):
+        return self.__player
+
+    @property
+    def heroes(self):
+        return self.__heroes
+
+    @heroes.setter
+    def heroes(self, h):
+        if isinstance(h, list):
+            for i in h:
+                if not isinstance(i, Hero):
+                    raise TypeError
+            self.__heroes = h
+        else:
+            raise TypeError
+
+    @property
+    def villains(self):
+        return self.__villains
+
+    @villains.setter
+    def villains(self, v):
+        if isinstance(v, list):
+            for i in v:
+                if not isinstance(i, Villain):
+                    raise TypeError
+            if len(v) > 0:
+                self.__villains = v
+        else:
+            raise TypeError
+
+    def generate_villains(self):
+        """
+        This function generates villains for current list of villains if empty
+        """
+        villains = self.rng.randint(1, max(self.height, self.width))
+        v_lst = []
+        necromancer = False
+
+        for _ in range(villains):  # randomly generated number of villains
+            val = self.rng.randint(1, 10)
+            if val in range(1, 6):  # 50% chance of selection
+                v_lst.append(Goblin())
+            elif val in range(6, 9):  # 30% chance of selection
+                v_lst.append(Skeleton())
+            elif val in range(9, 11) and necromancer is False:
+                v_lst.append(Necromancer())  # 20% chance of selection
+                necromancer = True
+            elif val in range(9, 11) and necromancer is True:
+                v_lst.append(Skeleton())
+        self.villains = v_lst
+
+    def is_valid_move(self, coords: List[Coord]) -> bool:
+        '''
+                Determines if the move the player is trying to make is valid
+                :param coords:
+                :return: True or False
+                '''
+        # if the length of coords is less than 2 returns false
+        if len(coords) < 2:
+            return False
+
+        from_coord = coords[0]
+        to_coord = coords[1]
+
+        # prevents starting off the board
+        if not (0 <= from_coord.x < self.height) or not (0 <= from_coord.y < self.width):
+            return False
+        # prevents landing off the board
+        if not (0 <= to_coord.x < self.height) or not (0 <= to_coord.y < self.width):
+            return False
+        # prevents moving to the same spot you're already at
+        if (from_coord.x == to_coord.x) and (from_coord.y == to_coord.y):
+            return False
+        # Prevents moving when there is no character at the starting spot
+        char = self.character_at(from_coord.x, from_coord.y)
+        if char is None:
+            return False
+        # prevents moving through obstacles
+        if self.character_at(to_coord.x, to_coord.y) is not None:
+            return False
+        # the character's own movement rules decide the rest
+        if not char.is_valid_move(from_coord, to_coord, self.board):
+            return False
+        else:
+            return True
+
+    def legal_moves(self, from_coord: Coord) -> Iterator[Coord]:
+        """
+        Yields every destination is_valid_move accepts for the character
+        at from_coord, using that character's own movement rule
+
+        Raises:
+            ValueError: if from_coord isn't on the board
+        """
+        char = self.character_at(from_coord.x, from_coord.y)
+        if char is not None:
+            yield from char.legal_moves(from_coord, self.__board)
+
+    def all_moves(self, player: Player = None) -> Iterator[Tuple[Coord, Coord]]:
+        """
+        Yields (from, to) for every legal move of every living character on
+        player's side, the side to move by default
+        """
+        if player is None:
+            player = self.__player
+        board = self.__board
+        for char, pos in list(self.__positions.items()):
+            if char._player is player and char._temp_health > 0:
+                for to in char.legal_moves(pos, board):
+                    yield pos, to
+
+    def is_valid_attack(self, coords: List[Coord]) -> bool:
+        """
+        Determines if the attack is valid using coordinates
+        :param coords:
+        :return: True or False
+        """
+        # if length of coords is less than 2 returns false
+        if len(coords) < 2:
+            return False
+
+        from_coord = coords[0]
+        to_coord = coords[1]
+
+        # prevents attacking from off the board
+        if not (0 <= from_coord.x < self.height) or not (0 <= from_coord.y < self.width):
+            return False
+        # prevents attacking something off the board
+        if not (0 <= to_coord.x < self.height) or not (0 <= to_coord.y < self.width):
+            return False
+        # Prevents attacking the same position your already in
+        if (from_coord.x == to_coord.x) and (from_coord.y == to_coord.y):
+            return False
+        # prevents attacking when there is no character at the attackers position
+        atk = self.character_at(from_coord.x, from_coord.y)
+        if atk is None:
+            return False
+        # prevents attacking when your character is
+        defd = self.character_at(to_coord.x, to_coord.y)
+        if defd is None:
+            return False
+        # prevents attacking allies and characters that are already down
+        if atk._player is defd._player or defd._temp_health <= 0:
+            return False
+        # prevents attacking beyond the attacker's range
+        if abs(from_coord.x - to_coord.x) + abs(from_coord.y - to_coord.y) > atk._range:
+            return False
+        else:
+            return True
+
+    def targets(self, from_coord: Coord) -> Tuple[List[Coord], List[Coord], List[Coord]]:
+        """
+        Lists everything the character at from_coord can act on this turn,
+        in one pass over the squares within its range
+
+        Returns:
+            attacks (list): squares is_valid_attack accepts
+            heals (list): fallen allies a Paladin that still has its heal can revive
+            raises (list): fallen characters a Necromancer can raise
+
+        Raises:
+            ValueError: if from_coord isn't on the board
+        """
+        char = self.character_at(from_coord.x, from_coord.y)
+        attacks = []
+        heals = []
+        raises = []
+        if char is None:
+            return attacks, heals, raises
+        board = self.__board
+        player = char._player
+        can_heal = isinstance(char, Paladin) and char.heal
+        can_raise = isinstance(char, Necromancer)
+        for to in range_mask(self.__height, self.__width, char._range)[from_coord.x][from_coord.y]:
+            target = board[to.x][to.y]
+            if target is None:
+                continue
+            if target._temp_health > 0:
+                if target._player is not player:
+                    attacks.append(to)
+            elif can_raise:
+                raises.append(to)
+            elif can_heal and target._player is player:
+                heals.append(to)
+        return attacks, heals, raises
+
+    def character_at(self, x: int, y: int):
+        """
+        if given valid coordinates, returns character at coordinates
+
+        Returns:
+            self.board[x][y] (Character or None): None if character isn't there
+
+        Raises:
+            ValueError: if x or y isn't within range between 0 and height/width
+        """
+        if not (0 <= x < self.height) or not (0 <= y < self.width):
+            raise ValueError
+
+        return self.board[x][y]
+
+
+    def set_character_at(self, target: Character, x: int, y: int):
+        """
+        if given valid coordinates, this sets character at x and y coordinates
+        on board
+
+        Raises:
+            ValueError: if x or y isn't within range between 0 and height/width
+        """
+        if not (0 <= x < self.height) or not (0 <= y < self.width):
+            raise ValueError
+
+        board = self.__board
+        old = board[x][y]
+        if old is not None:
+            self.__positions.pop(old, None)  # the character standing there is taken off the board
+            self.__zobrist ^= piece_key(old, x, y)
+        if target is not None:
+            previous = self.__positions.get(target)
+            if previous is not None and board[previous.x][previous.y] is target:
+                board[previous.x][previous.y] = None
+                self.__zobrist ^= piece_key(target, previous.x, previous.y)
+            self.__positions[target] = Coord(x, y)
+            self.__zobrist ^= piece_key(target, x, y)
+        board[x][y] = target
+
+    def move(self, from_coord: Coord, to_coord: Coord):
+        """
+        Moves value stored at beginning coordinate and places
+        it at ending coordinate
+       """
+
+        if self.is_valid_move([from_coord, to_coord]):  # move must be valid
+            char = self.board[from_coord.x][from_coord.y]
+            self.board[to_coord.x][to_coord.y] = char
+            self.board[from_coord.x][from_coord.y] = None  # setting it to None symbolizes it being moved
+            self.__positions[char] = to_coord
+            self.__zobrist ^= piece_key(char, from_coord.x, from_coord.y) ^ piece_key(char, to_coord.x, to_coord.y)
+            if self.replay_log is not None:
+                self.replay_log.record(ActionType.MOVE, from_coord, to_coord)
+            if UnitMoved in self.events.handlers:
+                self.events.emit(UnitMoved(char, from_coord, to_coord))
+
+    def set_next_player(self):
+        """
+        Sets current player to its opposite
+        """
+        ended = self.__player
+        if self.__player == Player.HERO:
+            self.__player = Player.VILLAIN
+        else:
+            self.__player = Player.HERO
+        self.__zobrist ^= VILLAIN_TO_MOVE
+        if self.replay_log is not None:
+            self.replay_log.record(ActionType.END_TURN)
+        if TurnEnded in self.events.handlers:
+            self.events.emit(TurnEnded(ended))
+
+    def attack(self, from_coord: Coord, to_coord: Coord, margin: int = None) -> Optional[int]:
+        """
+        Checks to see the from_coords and to_coords produce a valid attack.
+         If so, it calculates and deals damage to the Character at the location of the to_coords
+
+        Parameters:
+            from_coord (Coord): x and y starting coordinate
+            to_coord (Coord): x and y ending coordinate
+            margin (int): attack minus defense successes to resolve with
+                instead of rolling, for searches that walk every outcome
+
+        Returns:
+            margin (int): the margin the attack was resolved with, None if it was invalid
+
+        Raises:
+            TypeError: if value at from or to coordinate is not a character
+        """
+        if not self.is_valid_attack([from_coord, to_coord]):
+            return
+        else:
+            atk = self.character_at(from_coord.x, from_coord.y)
+            defd = self.character_at(to_coord.x, to_coord.y)
+            if isinstance(atk, Character) and isinstance(defd, Character):
+                if margin is not None:
+                    damage = margin
+                elif self.sample_attacks:
+                    damage = combat_odds(atk, defd).sample(self.rng)
+                elif self.margins is not None:
+                    damage = self.margins.draw(atk.attack_dice(defd), defd.combat[1], self.rng)
+                else:
+                    atk_result = atk.calculate_dice(defd, True, rng=self.rng)
+                    defd_result = defd.calculate_dice(atk, False, rng=self.rng)
+                    damage = atk_result - defd_result
+                dealt = 0
+                if damage > 0:
+                    before = piece_key(defd, to_coord.x, to_coord.y)
+                    dealt = atk.deal_damage(defd, damage)
+                    self.__zobrist ^= before ^ piece_key(defd, to_coord.x, to_coord.y)
+                if self.replay_log is not None:
+                    self.replay_log.record(ActionType.ATTACK, from_coord, to_coord, damage)
+                if self.events.handlers:
+                    self.__announce_attack(atk, defd, from_coord, to_coord, damage, dealt)
+                return damage
+            else:
+                raise TypeError
+
+    def __announce_attack(self, atk: Character, defd: Character, from_coord: Coord, to_coord: Coord,
+                          margin: int, dealt: int):
+        handlers = self.events.handlers
+        emit = self.events.emit
+        if AttackResolved in handlers:
+            emit(AttackResolved(atk, defd, from_coord, to_coord, margin, dealt))
+        if dealt > 0:
+            if DamageDealt in handlers:
+                emit(DamageDealt(atk, defd, to_coord, dealt))
+            if defd._temp_health <= 0:
+                if UnitDied in handlers:
+                    emit(UnitDied(defd, to_coord, atk))
+                if RoomCleared in handlers and isinstance(defd, Villain) and self.is_dungeon_clear():
+                    emit(RoomCleared())
+
+    def revive(self, from_coord: Coord, to_coord: Coord):
+        """
+        Has the Paladin at from_coord revive the character at to_coord,
+        following Paladin.revive's rules
+        """
+        self.__change_pair(from_coord, to_coord, Paladin, Paladin.revive)
+
+    def raise_dead(self, from_coord: Coord, to_coord: Coord):
+        """
+        Has the Necromancer at from_coord raise the character at to_coord,
+        following Necromancer.raise_dead's rules
+        """
+        self.__change_pair(from_coord, to_coord, Necromancer, Necromancer.raise_dead)
+
+    def __change_pair(self, from_coord: Coord, to_coord: Coord, cls: type, action):
+        char = self.character_at(from_coord.x, from_coord.y)
+        target = self.character_at(to_coord.x, to_coord.y)
+        if not isinstance(char, cls) or target is None:
+            return
+        before = piece_key(char, from_coord.x, from_coord.y) ^ piece_key(target, to_coord.x, to_coord.y)
+        hp = target._temp_health
+        action(char, target, from_coord, to_coord, self.__board)
+        if self.replay_log is not None:
+            self.replay_log.record(ActionType.HEAL if cls is Paladin else ActionType.RAISE_DEAD, from_coord, to_coord)
+        self.__zobrist ^= before ^ piece_key(char, from_coord.x, from_coord.y) ^ piece_key(target, to_coord.x, to_coord.y)
+        if UnitRevived in self.events.handlers and hp <= 0 < target._temp_health:
+            self.events.emit(UnitRevived(target, to_coord, char))
+
+    def apply(self, action: Action, margin: int = None) -> Tuple:
+        """
+        Carries out a move, attack, heal, raise dead or end of turn and
+        returns what undo() needs to take it back. An action the rules
+        reject changes nothing and its record undoes nothing.
+
+        Parameters:
+            action (Action): what to do; END_TURN passes play to the other side
+            margin (int): for an attack, the margin to resolve with instead of rolling
+
+        Returns:
+            record (tuple): (action, position hash before, character changed,
+                its health before, Paladin heal flag or side before)
+        """
+        kind = action.kind
+        key = self.__zobrist
+        if kind is ActionType.END_TURN:
+            self.set_next_player()
+            return action, key, None, None, None
+        from_coord = action.from_coord
+        to_coord = action.to_coord
+        if kind is ActionType.MOVE:
+            char = self.__board[from_coord.x][from_coord.y]
+            self.move(from_coord, to_coord)
+            moved = char if char is not None and self.__positions.get(char) == to_coord else None
+            return action, key, moved, None, None
+        target = self.character_at(to_coord.x, to_coord.y)
+        if target is None:
+            return action, key, None, None, None
+        hp = target._temp_health
+        if kind is ActionType.ATTACK:
+            self.attack(from_coord, to_coord, margin)
+            return action, key, target, hp, None
+        if kind is ActionType.HEAL:
+            paladin = self.character_at(from_coord.x, from_coord.y)
+            heal = paladin.heal if isinstance(paladin, Paladin) else None
+            self.revive(from_coord, to_coord)
+            return action, key, target, hp, heal
+        side = target._player
+        self.raise_dead(from_coord, to_coord)
+        return action, key, target, hp, side
+
+    def undo(self, record: Tuple):
+        """
+        Restores the exact position from before the apply() that returned
+        record. Records must be undone newest first.
+        """
+        action, key, char, hp, flag = record
+        kind = action.kind
+        if kind is ActionType.END_TURN:
+            self.__player = Player.VILLAIN if self.__player is Player.HERO else Player.HERO
+        elif char is None:
+            pass
+        elif kind is ActionType.MOVE:
+            board = self.__board
+            board[action.from_coord.x][action.from_coord.y] = char
+            board[action.to_coord.x][action.to_coord.y] = None
+            self.__positions[char] = action.from_coord
+        else:
+            char._temp_health = hp
+            if kind is ActionType.HEAL:
+                paladin = self.__board[action.from_coord.x][action.from_coord.y]
+                if flag is not None:
+                    paladin._heal = flag
+            elif kind is ActionType.RAISE_DEAD:
+                char._player = flag
+        self.__zobrist = key
+
+    def place_heroes(self):
+        """
+        This function places heroes in the bottom two rows, centred on
+        the board being even or odd width
+        """
+        warrior, mage, paladin, ranger = self.__heroes
+        length = self.height
+        middle = self.width // 2
+        if self.width % 2 == 0:  # checking if width of board is even
+            self.set_character_at(warrior, length-2, middle-1)
+            self.set_character_at(mage, length-1, middle-1)
+            self.set_character_at(paladin, length-2, middle)
+            self.set_character_at(ranger, length-1, middle)
+        else:  # if width of board is odd
+            self.set_character_at(warrior, length-2, middle)
+            self.set_character_at(mage, length-1, middle)
+            self.set_character_at(paladin, length-2, middle+1)
+            self.set_character_at(ranger, length-1, middle+1)
+
+    def place_villains(self, min_distance: int = 1, rear: Tuple[type, ...] = ()):
+        """
+        Randomly places all the villains on the board without the exception
+        of the bottom two rows, never two on one square and never on a
+        character that isn't one of the villains. See placement.py.
+
+        Parameters:
+            min_distance (int): Manhattan distance every villain keeps from
+                the other characters on the board, e.g. 3 to keep them out
+                of the heroes' reach
+            rear (tuple): villain classes placed in the rows furthest from
+                the heroes, e.g. (Necromancer,)
+
+        Raises:
+            PlacementError: if the allowed squares can't hold every villain
+        """
+        villains = set(self.__villains)
+        blocked = frozenset(c for char, c in self.__positions.items() if char not in villains)
+        for v, c in place(self.__villains, self.height, self.width, self.rng, blocked, min_distance, rear):
+            self.set_character_at(v, c.x, c.y)
+
+    def print_board(self):
+        lines = [' \t' + '_____' * len(self.__board)]
+        for i, row in enumerate(self.__board):
+            lines.append(f'{i}\t' + ''.join('|___|' if char is None else f'|{char.__class__.__name__[:3]}|'
+                                              for char in row))
+        lines.append('\t' + ''.join(f'  {i}  ' for i in range(len(self.__board[0]))))
+        print('\n'.join(lines))
+
+    def is_dungeon_clear(self):
+        '''
+        Returns true if the dungeon is clear,  false if it is not.
+        :return: True or False
+        '''
+        for i in self.__villains:
+            if not i._temp_health <= 0:
+                return False
+        return True
+
+    def generate_new_board(self, height: int = -1, width: int = -1):
+        """
+        Makes new board based on new height and width but dungeon
+        must be clear in order to do so
+
+        Parameters:
+            height (int): new height that current height gets set to
+            width (int): new width that current width gets set to
+        """
+        if not self.is_dungeon_clear():
+            return
+
+        if height is None or height < 0:  # if no value for height is given
+            height = self.rng.randint(4, 12)
+        if width is None or width < 0:
+            width = self.rng.randint(4, 12)
+        if not (4 <= height <= 12) or not (4 <= width <= 12):
+            raise ValueError
+
+        self.__height = height
+        self.__width = width
+        self.board = [[None for _ in range(width)] for _ in range(height)]  # also resets the position index
+        self.generate_villains()
+        self.place_heroes()
+        self.place_villains()
+
+    def adventurer_defeat(self):
+        """
+        Returns true if the heroes are all dead, false if they are not
+        :return: True or False
+        """
+        for hero in self.__heroes:
+            if hero._temp_health > 0:
+                return False
+        return True
+
+
+def print_attack(event: AttackResolved):
+    """
+    Prints the outcome of an attack, the messages of a verbose Dungeon
+    """
+    if event.margin > 0:
+        print(f'{event.defender} was dealt {event.dealt} damage')
+    else:
+        print(f'{event.defender} to no damage from {event.attacker}')
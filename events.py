@@ -0,0 +1,150 @@
+from __future__ import annotations
+from typing import Callable, Dict, Tuple
+
+from character import Character, Player
+from coord import Coord
+
+
+class GameEvent:
+    """
+    Something that happened on the board. Events are plain records, they
+    hold the characters involved rather than copies, so read them inside
+    the handler.
+    """
+    __slots__ = ()
+
+    def __eq__(self, other):
+        if type(other) is not type(self):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    def __repr__(self):
+        fields = ', '.join(f'{name}={getattr(self, name)!r}' for name in self.__slots__)
+        return f'{self.__class__.__name__}({fields})'
+
+
+class UnitMoved(GameEvent):
+    __slots__ = ('unit', 'from_coord', 'to_coord')
+
+    def __init__(self, unit: Character, from_coord: Coord, to_coord: Coord):
+        self.unit = unit
+        self.from_coord = from_coord
+        self.to_coord = to_coord
+
+
+class AttackResolved(GameEvent):
+    """
+    Attributes:
+        margin (int): attack minus defense successes
+        dealt (int): health the defender actually lost
+    """
+    __slots__ = ('attacker', 'defender', 'from_coord', 'to_coord', 'margin', 'dealt')
+
+    def __init__(self, attacker: Character, defender: Character, from_coord: Coord, to_coord: Coord,
+                 margin: int, dealt: int):
+        self.attacker = attacker
+        self.defender = defender
+        self.from_coord = from_coord
+        self.to_coord = to_coord
+        self.margin = margin
+        self.dealt = dealt
+
+
+class DamageDealt(GameEvent):
+    __slots__ = ('attacker', 'target', 'coord', 'amount')
+
+    def __init__(self, attacker: Character, target: Character, coord: Coord, amount: int):
+        self.attacker = attacker
+        self.target = target
+        self.coord = coord
+        self.amount = amount
+
+
+class UnitDied(GameEvent):
+    __slots__ = ('unit', 'coord', 'killer')
+
+    def __init__(self, unit: Character, coord: Coord, killer: Character):
+        self.unit = unit
+        self.coord = coord
+        self.killer = killer
+
+
+class UnitRevived(GameEvent):
+    """
+    A Paladin's heal or a Necromancer's raise dead; a raised unit has
+    already changed sides when this is sent
+    """
+    __slots__ = ('unit', 'coord', 'reviver')
+
+    def __init__(self, unit: Character, coord: Coord, reviver: Character):
+        self.unit = unit
+        self.coord = coord
+        self.reviver = reviver
+
+
+class TurnEnded(GameEvent):
+    """
+    Attributes:
+        player (Player): the side whose turn just ended
+    """
+    __slots__ = ('player',)
+
+    def __init__(self, player: Player):
+        self.player = player
+
+
+class RoomCleared(GameEvent):
+    """
+    The last villain standing went down
+    """
+    __slots__ = ()
+
+
+EVENTS = (UnitMoved, AttackResolved, DamageDealt, UnitDied, UnitRevived, TurnEnded, RoomCleared)
+
+
+class EventBus:
+    """
+    Handlers by event type. Handlers are called in the order they
+    subscribed, for events of exactly their type. Code that emits checks
+    handlers before building an event, so an event nobody subscribed to
+    costs one dict lookup and is never created.
+
+    Attributes:
+        handlers (dict): event type -> tuple of handlers, types without
+            handlers are left out
+    """
+    __slots__ = ('handlers',)
+
+    def __init__(self):
+        self.handlers: Dict[type, Tuple[Callable, ...]] = {}
+
+    def subscribe(self, kind: type, handler: Callable):
+        """
+        Calls handler(event) for every event of type kind; subscribing the
+        same handler twice has no effect
+        """
+        handlers = self.handlers.get(kind, ())
+        if handler not in handlers:
+            self.handlers[kind] = handlers + (handler,)
+
+    def subscribe_all(self, handler: Callable):
+        for kind in EVENTS:
+            self.subscribe(kind, handler)
+
+    def unsubscribe(self, kind: type, handler: Callable):
+        handlers = self.handlers.get(kind, ())
+        if handler in handlers:
+            handlers = tuple(h for h in handlers if h != handler)
+            if handlers:
+                self.handlers[kind] = handlers
+            else:
+                del self.handlers[kind]
+
+    def unsubscribe_all(self, handler: Callable):
+        for kind in list(self.handlers):
+            self.unsubscribe(kind, handler)
+
+    def emit(self, event: GameEvent):
+        for handler in self.handlers.get(type(event), ()):
+            handler(event)
@@ -0,0 +1,382 @@
+from __future__ import annotations
+import time
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+from character import Player
+from compact_board import CompactBoard, KINDS, PROTOTYPES, CAN_HEAL, NOWHERE, dealt_damage
+from coord import Coord, range_mask
+from creatures import Paladin, Necromancer
+from dungeon import Dungeon
+from odds import combat_odds
+from simulation import Agent, Action, ActionType
+from transposition import Bound, TranspositionTable
+
+WIN = 1000.0  # larger than any material score; a faster win scores a little more
+LIVE_BONUS = 2  # worth of a unit being alive on top of its health
+HEAL_BONUS = 1  # worth of a Paladin's unused revive
+
+
+class TurnPlan:
+    """
+    One whole turn for the search: the unit in slot optionally moves to
+    to_coord, then optionally attacks, heals or raises the unit on target
+
+    Attributes:
+        slot (int): CompactBoard slot of the acting unit
+        start (Coord): square the unit starts the turn on
+        to_coord (Coord): destination, None to stay put
+        kind (ActionType): ATTACK, HEAL or RAISE_DEAD, None for a quiet turn
+        target (Coord): square acted on, None for a quiet turn
+    """
+    __slots__ = ('slot', 'start', 'to_coord', 'kind', 'target')
+
+    def __init__(self, slot: int, start: Coord, to_coord: Optional[Coord] = None,
+                 kind: Optional[ActionType] = None, target: Optional[Coord] = None):
+        self.slot = slot
+        self.start = start
+        self.to_coord = to_coord
+        self.kind = kind
+        self.target = target
+
+    @property
+    def key(self) -> Tuple:
+        return self.slot, self.to_coord, self.kind, self.target
+
+    def __str__(self):
+        return f'TurnPlan({self.start} -> {self.to_coord}, {self.kind.name if self.kind else None} {self.target})'
+
+
+@lru_cache(maxsize=None)
+def attack_outcomes(atk_kind: int, def_kind: int, hp: int) -> Tuple[Tuple[float, int], ...]:
+    """
+    Returns the chance node of one attack against a defender with hp
+    health: (probability, damage dealt) pairs, margins that deal the same
+    capped damage merged, most likely first
+    """
+    odds = combat_odds(PROTOTYPES[atk_kind], PROTOTYPES[def_kind])
+    merged = {}
+    for margin, chance in enumerate(odds.hits):
+        dealt = min(dealt_damage(atk_kind, def_kind, margin), hp) if margin > 0 else 0
+        merged[dealt] = merged.get(dealt, 0) + chance
+    return tuple(sorted(((float(chance), dealt) for dealt, chance in merged.items() if chance),
+                        key=lambda outcome: -outcome[0]))
+
+
+def evaluate(board: CompactBoard) -> float:
+    """
+    Scores a position from the heroes' side: health plus a bonus per
+    living unit, heroes counted positive and villains negative
+    """
+    score = 0.0
+    hero = Player.HERO.value
+    for slot in range(board.units):
+        hp = board.temp_healths[slot]
+        if hp <= 0 or board.positions[slot] == NOWHERE:
+            continue
+        worth = hp + LIVE_BONUS
+        if board.flags[slot] & CAN_HEAL:
+            worth += HEAL_BONUS
+        score += worth if board.players[slot] == hero else -worth
+    return score
+
+
+def _distance(a: Coord, b: Coord) -> int:
+    return abs(a.x - b.x) + abs(a.y - b.y)
+
+
+def turn_plans(board: CompactBoard, breadth: int = 2) -> List[TurnPlan]:
+    """
+    Generates the turns the search looks at for the side to move, in
+    search order: attacks by expected damage and kill chance, then heals
+    and raises, then quiet moves. Of the many squares a unit could act
+    from, only the breadth squares farthest from the nearest enemy are
+    kept per target, and only the breadth quiet moves that close in on
+    an enemy the most, which keeps the branching factor of heroes that
+    may move anywhere in check.
+    """
+    player = board.players
+    side = board.player.value
+    units = range(board.units)
+    on_board = [slot for slot in units if board.positions[slot] != NOWHERE]
+    living = [slot for slot in on_board if board.temp_healths[slot] > 0]
+    enemies = [board.coord_of(slot) for slot in living if player[slot] != side]
+    dead = [slot for slot in on_board if board.temp_healths[slot] <= 0]
+    height = board.height
+    width = board.width
+
+    def nearest(square: Coord) -> int:
+        return min(_distance(square, enemy) for enemy in enemies) if enemies else 0
+
+    attacks = []
+    support = []
+    quiet = []
+    for slot in living:
+        if player[slot] != side:
+            continue
+        start = board.coord_of(slot)
+        reachable = [start] + board.legal_moves(slot)
+        allowed = set(reachable)
+        mask = range_mask(height, width, board.ranges[slot])
+        kind = KINDS[board.kinds[slot]]
+
+        def spots(target: Coord) -> List[Optional[Coord]]:
+            # range is symmetric, so the squares in range of target are the mask around it
+            squares = [s for s in mask[target.x][target.y] if s in allowed]
+            squares.sort(key=lambda s: (-nearest(s), s != start))
+            return [None if s == start else s for s in squares[:breadth]]
+
+        for enemy in living:
+            if player[enemy] == side:
+                continue
+            target = board.coord_of(enemy)
+            outcomes = attack_outcomes(board.kinds[slot], board.kinds[enemy], board.temp_healths[enemy])
+            expected = sum(chance * dealt for chance, dealt in outcomes)
+            kill = sum(chance for chance, dealt in outcomes if dealt >= board.temp_healths[enemy])
+            for to in spots(target):
+                attacks.append((-(kill * 10 + expected), TurnPlan(slot, start, to, ActionType.ATTACK, target)))
+        if kind is Necromancer or (kind is Paladin and board.flags[slot] & CAN_HEAL):
+            for fallen in dead:
+                if kind is Paladin and player[fallen] != side:
+                    continue
+                target = board.coord_of(fallen)
+                action = ActionType.RAISE_DEAD if kind is Necromancer else ActionType.HEAL
+                for to in spots(target):
+                    support.append(TurnPlan(slot, start, to, action, target))
+        reachable.sort(key=lambda s: (nearest(s), s != start))
+        for square in reachable[:breadth]:
+            quiet.append((nearest(square), TurnPlan(slot, start, None if square == start else square)))
+    attacks.sort(key=lambda entry: entry[0])
+    quiet.sort(key=lambda entry: entry[0])
+    return [plan for _, plan in attacks] + support + [plan for _, plan in quiet]
+
+
+class _Timeout(Exception):
+    pass
+
+
+class ExpectiminimaxAgent(Agent):
+    """
+    Agent that plans a whole turn with expectiminimax search. Each ply is
+    one turn of one side; every attack leads to a chance node over the
+    exact damage distribution of the odds table, pruned with Star1 and
+    Star2 probing. Turns are searched on a CompactBoard copy of the
+    Dungeon, deepening one ply at a time until depth or the time budget
+    is reached, with results kept in a transposition table between calls.
+
+    Attributes:
+        depth (int): most turns looked ahead, 1 scores only the agent's own turn
+        time_limit (float): seconds a decision may take, None for no limit;
+            the first ply is always searched completely
+        breadth (int): squares kept per target and quiet moves kept per unit
+        table (TranspositionTable): search results keyed by position
+        nodes (int): positions searched for the last decision
+    """
+
+    def __init__(self, depth: int = 2, time_limit: Optional[float] = 0.05, breadth: int = 2,
+                 table: TranspositionTable = None):
+        if depth < 1 or breadth < 1:
+            raise ValueError
+        self.depth = depth
+        self.time_limit = time_limit
+        self.breadth = breadth
+        self.table = table if table is not None else TranspositionTable()
+        self.nodes = 0
+        self.__board: Optional[CompactBoard] = None
+        self.__deadline = None
+        self.__bound = WIN
+        self.__plan: Optional[TurnPlan] = None
+        self.__moved = False
+        self.__acted = False
+
+    def select(self, dungeon: Dungeon, choices: List[Coord]) -> Coord:
+        self.__plan = self.plan(dungeon)
+        self.__moved = self.__plan is None or self.__plan.to_coord is None
+        self.__acted = self.__plan is None or self.__plan.kind is None
+        if self.__plan is None or self.__plan.start not in choices:
+            self.__plan = None
+            return choices[0]
+        return self.__plan.start
+
+    def act(self, dungeon: Dungeon, actions: List[Action]) -> Action:
+        plan = self.__plan
+        if plan is not None and not self.__moved:
+            self.__moved = True
+            for action in actions:
+                if action.kind is ActionType.MOVE and action.to_coord == plan.to_coord:
+                    return action
+        if plan is not None and not self.__acted:
+            self.__acted = True
+            for action in actions:
+                if action.kind is plan.kind and action.to_coord == plan.target:
+                    return action
+        return actions[-1]
+
+    def plan(self, dungeon: Dungeon) -> Optional[TurnPlan]:
+        """
+        Searches the position for the side to move
+
+        Returns:
+            plan (TurnPlan): the best turn found, None if no unit can act
+        """
+        self.__board = CompactBoard.from_dungeon(dungeon)
+        self.__deadline = time.perf_counter() + self.time_limit if self.time_limit is not None else None
+        self.nodes = 0
+        best = None
+        for depth in range(1, self.depth + 1):
+            self.__bound = WIN + depth + 1
+            snapshot = self.__board.snapshot()
+            try:
+                self.__search(depth, -self.__bound, self.__bound, depth > 1)
+            except _Timeout:
+                self.__board.restore(snapshot)
+                break
+            entry = self.table.probe(hash(self.__board))
+            if entry is not None and entry.move is not None:
+                best = entry.move
+        if best is None:
+            return None
+        for plan in turn_plans(self.__board, self.breadth):
+            if plan.key == best:
+                return plan
+        return None
+
+    def __search(self, depth: int, alpha: float, beta: float, timed: bool, probe: bool = False) -> float:
+        board = self.__board
+        self.nodes += 1
+        if timed and self.__deadline is not None and time.perf_counter() > self.__deadline:
+            raise _Timeout
+        if board.is_dungeon_clear():
+            return WIN + depth
+        if board.adventurer_defeat():
+            return -WIN - depth
+        if depth == 0:
+            return evaluate(board)
+
+        key = hash(board)
+        entry = self.table.probe(key)
+        if entry is not None and entry.depth >= depth:
+            if entry.bound is Bound.EXACT:
+                return entry.value
+            if entry.bound is Bound.LOWER and entry.value >= beta:
+                return entry.value
+            if entry.bound is Bound.UPPER and entry.value <= alpha:
+                return entry.value
+
+        plans = turn_plans(board, self.breadth)
+        if entry is not None and entry.move is not None:
+            for i, plan in enumerate(plans):
+                if plan.key == entry.move:
+                    plans.insert(0, plans.pop(i))
+                    break
+        if not plans:
+            # a side with no living unit left on the board just passes
+            snapshot = board.snapshot()
+            board.set_next_player()
+            value = self.__search(depth - 1, alpha, beta, timed)
+            board.restore(snapshot)
+            return value
+        if probe:
+            plans = plans[:1]
+
+        maximizing = board.player is Player.HERO
+        low, high = alpha, beta
+        best = None
+        best_value = None
+        for plan in plans:
+            value = self.__plan_value(plan, depth, low, high, timed)
+            if best_value is None or (value > best_value if maximizing else value < best_value):
+                best = plan
+                best_value = value
+            if maximizing:
+                low = max(low, value)
+            else:
+                high = min(high, value)
+            if low >= high:
+                break
+
+        if not probe:
+            if best_value <= alpha:
+                bound = Bound.UPPER
+            elif best_value >= beta:
+                bound = Bound.LOWER
+            else:
+                bound = Bound.EXACT
+            self.table.store(key, depth, best_value, bound, best.key)
+        return best_value
+
+    def __plan_value(self, plan: TurnPlan, depth: int, alpha: float, beta: float, timed: bool) -> float:
+        board = self.__board
+        snapshot = board.snapshot()
+        if plan.to_coord is not None:
+            board.move(plan.start, plan.to_coord)
+        at = plan.to_coord if plan.to_coord is not None else plan.start
+        if plan.kind is ActionType.ATTACK:
+            value = self.__chance(at, plan.target, depth, alpha, beta, timed)
+        else:
+            if plan.kind is ActionType.HEAL:
+                board.revive(at, plan.target)
+            elif plan.kind is ActionType.RAISE_DEAD:
+                board.raise_dead(at, plan.target)
+            board.set_next_player()
+            value = self.__search(depth - 1, alpha, beta, timed)
+        board.restore(snapshot)
+        return value
+
+    def __chance(self, at: Coord, target: Coord, depth: int, alpha: float, beta: float, timed: bool) -> float:
+        """
+        Value of a chance node: the attack from at on target, followed by
+        the other side's turn. Star2 first probes every outcome with just
+        the opponent's first reply, which bounds its value from one side,
+        then Star1 searches the outcomes in full with windows narrowed by
+        the outcomes already known and the score bounds of the rest.
+        """
+        board = self.__board
+        width = board.width
+        defd = board.cells[target.x * width + target.y] - 1
+        hp = board.temp_healths[defd]
+        outcomes = attack_outcomes(board.kinds[board.cells[at.x * width + at.y] - 1], board.kinds[defd], hp)
+        board.set_next_player()
+        lowest, highest = -self.__bound, self.__bound
+        # the reply node minimizes after a hero attack and maximizes after a villain one,
+        # so probing its first reply gives an upper or a lower bound on each outcome
+        replier_max = board.player is Player.HERO
+
+        if depth > 1 and len(outcomes) > 1:
+            total = 0.0
+            rest = 1.0
+            for chance, dealt in outcomes:
+                rest -= chance
+                board.temp_healths[defd] = hp - dealt
+                if replier_max:
+                    child_beta = (beta - total - rest * lowest) / chance
+                    value = self.__search(depth - 1, lowest, min(highest, child_beta), timed, probe=True)
+                    total += chance * value
+                    if value >= child_beta:
+                        board.temp_healths[defd] = hp
+                        return total + rest * lowest
+                else:
+                    child_alpha = (alpha - total - rest * highest) / chance
+                    value = self.__search(depth - 1, max(lowest, child_alpha), highest, timed, probe=True)
+                    total += chance * value
+                    if value <= child_alpha:
+                        board.temp_healths[defd] = hp
+                        return total + rest * highest
+
+        total = 0.0
+        rest = 1.0
+        for chance, dealt in outcomes:
+            rest -= chance
+            child_alpha = (alpha - total - rest * highest) / chance
+            child_beta = (beta - total - rest * lowest) / chance
+            board.temp_healths[defd] = hp - dealt
+            value = self.__search(depth - 1, max(lowest, child_alpha), min(highest, child_beta), timed)
+            total += chance * value
+            if value <= child_alpha:
+                total += rest * highest
+                break
+            if value >= child_beta:
+                total += rest * lowest
+                break
+        board.temp_healths[defd] = hp
+        return total
@@ -0,0 +1,196 @@
+from __future__ import annotations
+import functools
+import threading
+import time
+from typing import Dict, Iterator, List, Tuple
+
+from character import Character
+from dungeon import Dungeon
+from renderer import Renderer
+from simulation import Agent
+
+# Opt-in call counters and latency histograms for the rules hot paths.
+#
+#   instrument.enable()
+#   ... play ...
+#   print(instrument.report())
+#   instrument.metrics['dungeon.attack'].calls
+#
+# Nothing is wrapped until enable() is called and disable() puts the
+# original functions back, so while disabled the game runs the very same
+# code as without this module. Counts are kept per process.
+
+SUB_BUCKETS = 4  # histogram buckets per power of two, about 25% resolution
+BUCKETS = 64 * SUB_BUCKETS
+
+
+def bucket(ns: int) -> int:
+    """
+    Returns the histogram bucket of a latency in nanoseconds: values below 8
+    are exact, above that each power of two is split into SUB_BUCKETS
+    """
+    n = ns.bit_length()
+    if n <= 3:
+        return ns
+    return (n - 2) * SUB_BUCKETS + (ns >> (n - 3)) - 4
+
+
+def bucket_limit(index: int) -> int:
+    """
+    Returns the largest latency in nanoseconds that falls in bucket index
+    """
+    if index < 2 * SUB_BUCKETS:
+        return index
+    n = index // SUB_BUCKETS + 2
+    top = index % SUB_BUCKETS + 4
+    return ((top + 1) << (n - 3)) - 1
+
+
+class Metric:
+    """
+    Call count and latency histogram of one instrumented phase
+
+    Attributes:
+        name (str): the phase, e.g. 'dungeon.attack'
+        calls (int): calls recorded
+        total (int): nanoseconds spent in them
+        max (int): the slowest call in nanoseconds
+        buckets (list): call count per latency bucket, see bucket()
+    """
+    __slots__ = ('name', 'calls', 'total', 'max', 'buckets')
+
+    def __init__(self, name: str):
+        self.name = name
+        self.clear()
+
+    def clear(self):
+        self.calls = 0
+        self.total = 0
+        self.max = 0
+        self.buckets = [0] * BUCKETS
+
+    def record(self, ns: int):
+        self.calls += 1
+        self.total += ns
+        if ns > self.max:
+            self.max = ns
+        self.buckets[bucket(ns)] += 1
+
+    @property
+    def mean(self) -> float:
+        """
+        Returns the average latency in nanoseconds
+        """
+        return self.total / self.calls if self.calls else 0.0
+
+    def percentile(self, q: float) -> int:
+        """
+        Returns an upper bound, within one bucket, of the latency in
+        nanoseconds that a fraction q of the calls stayed under
+        """
+        if not self.calls:
+            return 0
+        rank = q * self.calls
+        seen = 0
+        for index, count in enumerate(self.buckets):
+            seen += count
+            if count and seen >= rank:
+                return min(bucket_limit(index), self.max)
+        return self.max
+
+
+# phase name -> the methods timed for it. Every class below the owner that
+# defines the method itself is wrapped too; a call is only recorded once
+# even when overrides call super().
+PHASES: Dict[str, Tuple[Tuple[type, str], ...]] = {
+    'dungeon.attack': ((Dungeon, 'attack'),),
+    'dungeon.is_valid_move': ((Dungeon, 'is_valid_move'),),
+    'dungeon.is_valid_attack': ((Dungeon, 'is_valid_attack'),),
+    'character.calculate_dice': ((Character, 'calculate_dice'),),
+    'character.deal_damage': ((Character, 'deal_damage'),),
+    'render': ((Renderer, 'draw'), (Dungeon, 'print_board')),
+    'agent.select': ((Agent, 'select'),),
+    'agent.act': ((Agent, 'act'),),
+}
+
+metrics: Dict[str, Metric] = {name: Metric(name) for name in PHASES}
+_patched: List[Tuple[type, str, object]] = []  # (class, attribute, original) to put back
+_active = threading.local()  # phases the current thread is inside
+
+
+def _subclasses(cls: type) -> Iterator[type]:
+    yield cls
+    for sub in cls.__subclasses__():
+        yield from _subclasses(sub)
+
+
+def _timed(func, metric: Metric):
+    clock = time.perf_counter_ns
+    name = metric.name
+
+    @functools.wraps(func)
+    def timed(*args, **kwargs):
+        inside = getattr(_active, 'phases', None)
+        if inside is None:
+            inside = _active.phases = set()
+        if name in inside:  # an override calling super(), already being timed
+            return func(*args, **kwargs)
+        inside.add(name)
+        start = clock()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            metric.record(clock() - start)
+            inside.discard(name)
+    return timed
+
+
+def enabled() -> bool:
+    return bool(_patched)
+
+
+def enable():
+    """
+    Wraps every instrumented method. Classes defined after this call are
+    not instrumented until the next enable().
+    """
+    if _patched:
+        return
+    for name, targets in PHASES.items():
+        for owner, attribute in targets:
+            for cls in set(_subclasses(owner)):
+                original = cls.__dict__.get(attribute)
+                if callable(original):
+                    _patched.append((cls, attribute, original))
+                    setattr(cls, attribute, _timed(original, metrics[name]))
+
+
+def disable():
+    """
+    Puts the original methods back; the metrics are kept
+    """
+    while _patched:
+        cls, attribute, original = _patched.pop()
+        setattr(cls, attribute, original)
+
+
+def reset():
+    """
+    Clears every metric
+    """
+    for metric in metrics.values():
+        metric.clear()
+
+
+def report() -> str:
+    """
+    Returns a table of every phase that was called: calls, total time and
+    mean, median, 99th percentile and slowest call
+    """
+    lines = [f'{"phase":<26}{"calls":>10}{"total ms":>11}{"mean us":>10}{"p50 us":>10}{"p99 us":>10}{"max us":>10}']
+    for metric in sorted(metrics.values(), key=lambda m: m.total, reverse=True):
+        if metric.calls:
+            lines.append(f'{metric.name:<26}{metric.calls:>10}{metric.total / 1e6:>11.2f}{metric.mean / 1e3:>10.2f}'
+                         f'{metric.percentile(0.5) / 1e3:>10.2f}{metric.percentile(0.99) / 1e3:>10.2f}'
+                         f'{metric.max / 1e3:>10.2f}')
+    return '\n'.join(lines)
@@ -0,0 +1,419 @@
+from __future__ import annotations
+import copy
+import math
+import os
+import random
+import secrets
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple, Type
+
+from character import Player
+from coord import Coord
+from dice import MarginBuffer
+from dungeon import Dungeon
+from events import EventBus
+from rng import CounterRNG
+from simulation import Agent, Action, ActionType, GreedyAgent, Simulation
+from tournament import chunk_seed
+
+EXPLORATION = 1.4  # UCT exploration constant, rewards lie in 0..1
+WIDENING = 1.0  # a node with n visits considers its 1 + WIDENING * sqrt(n) best ranked steps
+
+
+def step_key(step) -> Tuple:
+    """
+    Returns the tree key of a step: a selected square or an Action
+    """
+    if isinstance(step, Action):
+        return step.kind, step.from_coord, step.to_coord
+    return None, None, step
+
+
+def reward(dungeon: Dungeon, player: Player) -> float:
+    """
+    Scores a position for player between 0 and 1: 1 for a win, 0 for a
+    loss, and otherwise 0.5 moved by the difference between the share of
+    health each side has left
+    """
+    if dungeon.is_dungeon_clear():
+        return 1.0 if player is Player.HERO else 0.0
+    if dungeon.adventurer_defeat():
+        return 0.0 if player is Player.HERO else 1.0
+    left = {Player.HERO: 0, Player.VILLAIN: 0}
+    full = {Player.HERO: 0, Player.VILLAIN: 0}
+    for char in dungeon.positions:
+        full[char._player] += char._health
+        left[char._player] += max(char._temp_health, 0)
+    share = {side: left[side] / full[side] if full[side] else 0.0 for side in left}
+    other = Player.VILLAIN if player is Player.HERO else Player.HERO
+    return 0.5 + 0.5 * (share[player] - share[other])
+
+
+class Node:
+    """
+    One step of the search tree. The tree is open loop: a node stands for
+    the sequence of steps leading to it, not for one position, since
+    attacks are rolled again on every pass.
+
+    Attributes:
+        player (Player): side making the step that leads into this node
+        visits (int): playouts that went through this node
+        total (float): sum of their rewards for player
+        children (dict): step key -> Node
+    """
+    __slots__ = ('player', 'visits', 'total', 'children')
+
+    def __init__(self, player: Optional[Player]):
+        self.player = player
+        self.visits = 0
+        self.total = 0.0
+        self.children: Dict[Tuple, Node] = {}
+
+    def best_child(self, keys: List[Tuple]) -> Tuple:
+        """
+        Returns the key among keys, all already expanded, of the child with
+        the highest UCT score
+        """
+        log_visits = math.log(self.visits)
+        best = None
+        best_score = None
+        for key in keys:
+            child = self.children[key]
+            score = child.total / child.visits + EXPLORATION * math.sqrt(log_visits / child.visits)
+            if best_score is None or score > best_score:
+                best = key
+                best_score = score
+        return best
+
+
+class Search:
+    """
+    Monte Carlo tree search over the steps of Simulation: selecting a unit,
+    then its moves and attack, heal or raise dead until the turn ends, so
+    every playout follows the same turn structure and Dungeon rules as
+    Game. Each pass plays the tree path and its playout on the root
+    Dungeon itself with fresh dice, then undoes every change. The dice
+    come from the search's own CounterRNG, never the game's, so how long
+    a search runs doesn't change the game's later rolls.
+
+    Attributes:
+        root (Node): the tree
+        playout_agent (type): Agent class that finishes each playout, made
+            with a random.Random of the search's own
+        playout_turns (int): turns a playout runs before it is scored
+        leaf_batch (int): playouts run per leaf; above 1 they run on a
+            thread pool and are backed up together
+        seed (int): seed of the search's randomness, fresh when not given;
+            the global random module is never touched
+        rng (CounterRNG): dice of every pass on the root dungeon, stream 0
+            of seed; leaf batch copies get streams 1, 2, ...
+    """
+
+    def __init__(self, dungeon: Dungeon, selected: Coord = None, moves: int = 0, atk: int = 0,
+                 playout_agent: Type[Agent] = GreedyAgent, playout_turns: int = 10, leaf_batch: int = 1, seed: int = None):
+        if playout_turns < 0 or leaf_batch < 1:
+            raise ValueError
+        self.dungeon = dungeon
+        self.selected = selected
+        self.moves = moves
+        self.atk = atk
+        self.playout_agent = playout_agent
+        self.playout_turns = playout_turns
+        self.leaf_batch = leaf_batch
+        self.seed = seed if seed is not None else secrets.randbits(64)
+        self.agent_rng = random.Random(self.seed)  # picks of the playout agents
+        self.rng = CounterRNG(self.seed)
+        self.margins = self.__margins(dungeon)  # batched margins of the passes, if the game batches
+        self.__streams = 0  # dice streams handed to copies so far
+        self.root = Node(None)
+        self.__threads = ThreadPoolExecutor(max_workers=leaf_batch) if leaf_batch > 1 else None
+
+    def close(self):
+        if self.__threads is not None:
+            self.__threads.shutdown()
+            self.__threads = None
+
+    def __simulation(self, dungeon: Dungeon, record: bool = False, agent_rng: random.Random = None) -> Simulation:
+        agent = self.playout_agent(agent_rng if agent_rng is not None else self.agent_rng)
+        sim = Simulation(dungeon, agent, agent, record=record)
+        sim.selected = self.selected
+        sim.moves = self.moves
+        sim.atk = self.atk
+        return sim
+
+    @staticmethod
+    def __margins(dungeon: Dungeon) -> Optional[MarginBuffer]:
+        return MarginBuffer(dungeon.margins.size) if dungeon.margins is not None else None
+
+    @staticmethod
+    def legal_steps(sim: Simulation) -> Dict[Tuple, object]:
+        """
+        Returns step key -> step for everything the side to move may do next
+        """
+        steps = sim.legal_selections() if sim.selected is None else sim.legal_actions()
+        return {step_key(step): step for step in steps}
+
+    @staticmethod
+    def ranked(sim: Simulation, legal: Dict[Tuple, object]) -> List[Tuple]:
+        """
+        Orders step keys the way GreedyAgent would rank them: units closest
+        to an enemy first; attacks, heals and raises before moves, moves
+        that close in on an enemy first and ending the turn last
+        """
+        dungeon = sim.dungeon
+        if sim.selected is None:
+            enemies = [pos for char, pos in dungeon.positions.items()
+                       if char._player is not dungeon.player and char._temp_health > 0]
+            if not enemies:
+                return list(legal)
+            return sorted(legal, key=lambda key: GreedyAgent.distance_to(enemies, key[2]))
+        enemies = GreedyAgent.enemies(dungeon, sim.selected)
+        here = GreedyAgent.distance_to(enemies, sim.selected) if enemies else 0
+
+        def score(key: Tuple) -> float:
+            kind, _, to = key
+            if kind is ActionType.END_TURN:
+                return 0
+            if kind is ActionType.MOVE:
+                return here - GreedyAgent.distance_to(enemies, to) if enemies else 0
+            return 100
+        return sorted(legal, key=score, reverse=True)
+
+    @staticmethod
+    def take(sim: Simulation, step):
+        """
+        Carries out a step the way Simulation.play_turn would
+        """
+        if not isinstance(step, Action):
+            sim.selected = step
+        elif sim.apply(step) or sim.winner() is not None:
+            sim.end_turn()
+
+    def run(self, iterations: int = None, time_limit: float = None) -> int:
+        """
+        Searches until iterations passes are done or time_limit seconds
+        have gone by, whichever comes first; at least one bound is needed
+
+        Returns:
+            passes (int): passes made by this call
+        """
+        if iterations is None and time_limit is None:
+            raise ValueError
+        deadline = time.perf_counter() + time_limit if time_limit is not None else None
+        passes = 0
+        while iterations is None or passes < iterations:
+            if deadline is not None and time.perf_counter() > deadline:
+                break
+            self.iterate()
+            passes += 1
+        return passes
+
+    def iterate(self):
+        """
+        One pass: descend by UCT, expand one step, play out and back up
+        """
+        dungeon = self.dungeon
+        verbose, replay_log, events = dungeon.verbose, dungeon.replay_log, dungeon.events
+        rng, margins = dungeon.rng, dungeon.margins
+        dungeon.replay_log = None  # search passes are not part of the game
+        dungeon.events = EventBus()  # and observers never hear of them
+        dungeon.rng, dungeon.margins = self.rng, self.margins  # nor do they use up the game's dice
+        sim = self.__simulation(dungeon, record=True)
+        try:
+            self.__descend(sim)
+        finally:
+            sim.rewind()
+            dungeon.events = events
+            dungeon.rng, dungeon.margins = rng, margins
+            dungeon.verbose, dungeon.replay_log = verbose, replay_log
+
+    def __descend(self, sim: Simulation):
+        node = self.root
+        path = [node]
+        while sim.winner() is None:
+            legal = self.legal_steps(sim)
+            if not legal:
+                sim.end_turn()
+                continue
+            player = sim.dungeon.player
+            # progressive widening: rarely visited nodes only look at their best ranked steps
+            allowed = self.ranked(sim, legal)[:1 + int(WIDENING * math.sqrt(node.visits))]
+            fresh = [key for key in allowed if key not in node.children]
+            if fresh:
+                key = fresh[0]
+                node.children[key] = Node(player)
+                self.take(sim, legal[key])
+                path.append(node.children[key])
+                break
+            key = node.best_child(allowed)
+            self.take(sim, legal[key])
+            node = node.children[key]
+            path.append(node)
+
+        if self.__threads is None:
+            results = [self.playout(sim)]
+        else:
+            # threads cannot share one dungeon, the extra playouts get copies
+            copies = [sim] + [self.clone(sim) for _ in range(self.leaf_batch - 1)]
+            results = list(self.__threads.map(self.playout, copies))
+        for node in path:
+            node.visits += len(results)
+            if node.player is not None:
+                node.total += sum(result[node.player] for result in results)
+
+    def clone(self, sim: Simulation) -> Simulation:
+        """
+        Returns a copy of sim for another thread to play out. A deep copy
+        would roll the very dice the original rolls next, so every copy
+        gets the next stream of rng and an agent of its own.
+        """
+        self.__streams += 1
+        dungeon = copy.deepcopy(sim.dungeon)
+        dungeon.rng = self.rng.spawn(self.__streams)
+        dungeon.margins = self.__margins(dungeon)
+        clone = self.__simulation(dungeon, agent_rng=random.Random(f'{self.seed}:{self.__streams}'))
+        clone.selected = sim.selected
+        clone.moves = sim.moves
+        clone.atk = sim.atk
+        return clone
+
+    def playout(self, sim: Simulation) -> Dict[Player, float]:
+        """
+        Finishes the current turn and plays up to playout_turns more with
+        playout_agent, then scores the result for both sides
+        """
+        if sim.selected is not None and sim.winner() is None:
+            agent = sim.agents[sim.dungeon.player]
+            while not self.__finish_step(sim, agent):
+                pass
+            sim.end_turn()
+        start = sim.turns
+        while sim.winner() is None and sim.turns - start < self.playout_turns:
+            sim.play_turn()
+        return {side: reward(sim.dungeon, side) for side in Player}
+
+    @staticmethod
+    def __finish_step(sim: Simulation, agent: Agent) -> bool:
+        return sim.apply(agent.act(sim.dungeon, sim.legal_actions())) or sim.winner() is not None
+
+    def visit_counts(self) -> Dict[Tuple, int]:
+        """
+        Returns step key -> visits for the children of the root
+        """
+        return {key: child.visits for key, child in self.root.children.items()}
+
+
+def search_root(dungeon: Dungeon, selected: Coord = None, moves: int = 0, atk: int = 0, seed: int = None,
+                iterations: int = None, time_limit: float = None, **options) -> Dict[Tuple, int]:
+    """
+    Runs one independent search and returns its root visit counts; keyword
+    options are passed on to Search.
+    """
+    search = Search(dungeon, selected, moves, atk, seed=seed, **options)
+    try:
+        search.run(iterations, time_limit)
+    finally:
+        search.close()
+    return search.visit_counts()
+
+
+def _search_worker(*state, seed: int = None, **options) -> Dict[Tuple, int]:
+    # the unit of work of a root parallel worker; forked workers start with
+    # the parent's random state, so each one reseeds its own copy
+    random.seed(seed)
+    return search_root(*state, seed=seed, **options)
+
+
+class MCTSAgent(Agent):
+    """
+    Agent that picks every step by Monte Carlo tree search. With several
+    workers, each process searches the same position on its own tree
+    (root parallelism) and the root visit counts are added up before the
+    most visited step is played. Within a tree, leaf_batch playouts per
+    leaf share a thread pool (leaf parallelism).
+
+    Attributes:
+        workers (int): search processes, 1 searches in this process
+        iterations (int): passes per tree and decision, None for no limit
+        time_limit (float): seconds per decision, None for no limit
+        seed (int): master seed of the worker seeds, None for fresh ones
+        options (dict): passed on to Search
+    """
+
+    def __init__(self, workers: int = 1, iterations: Optional[int] = None, time_limit: Optional[float] = 0.5,
+                 seed: Optional[int] = None, **options):
+        if workers is None:
+            workers = os.cpu_count() or 1
+        if workers < 1:
+            raise ValueError
+        if iterations is None and time_limit is None:
+            raise ValueError
+        self.workers = workers
+        self.iterations = iterations
+        self.time_limit = time_limit
+        self.seed = seed
+        self.options = options
+        self.__pool: Optional[ProcessPoolExecutor] = None
+        self.__decisions = 0
+        self.__selected = None
+        self.__moves = 0
+        self.__atk = 0
+
+    def close(self):
+        """
+        Shuts the worker processes down
+        """
+        if self.__pool is not None:
+            self.__pool.shutdown()
+            self.__pool = None
+
+    def select(self, dungeon: Dungeon, choices: List[Coord]) -> Coord:
+        self.__moves = 0
+        self.__atk = 0
+        self.__selected = None
+        choice = self.__decide(dungeon, {step_key(c): c for c in choices})
+        self.__selected = choice
+        return choice
+
+    def act(self, dungeon: Dungeon, actions: List[Action]) -> Action:
+        action = self.__decide(dungeon, {step_key(a): a for a in actions})
+        if action.kind is ActionType.MOVE:
+            self.__moves += 1
+            self.__selected = action.to_coord
+        elif action.kind is not ActionType.END_TURN:
+            self.__atk += 1
+        return action
+
+    def __decide(self, dungeon: Dungeon, legal: Dict[Tuple, object]):
+        if len(legal) == 1:
+            return next(iter(legal.values()))
+        counts = self.visit_counts(dungeon)
+        best = max(legal, key=lambda key: counts.get(key, 0))
+        return legal[best]
+
+    def visit_counts(self, dungeon: Dungeon) -> Dict[Tuple, int]:
+        """
+        Searches the current step and returns the merged root visit counts
+        of every worker
+        """
+        state = (dungeon, self.__selected, self.__moves, self.__atk)
+        self.__decisions += 1
+        if self.workers == 1:
+            return search_root(*state, seed=self.__seed(0), iterations=self.iterations,
+                               time_limit=self.time_limit, **self.options)
+        if self.__pool is None:
+            self.__pool = ProcessPoolExecutor(max_workers=self.workers)
+        futures = [self.__pool.submit(_search_worker, *state, seed=self.__seed(index), iterations=self.iterations,
+                                      time_limit=self.time_limit, **self.options)
+                   for index in range(self.workers)]
+        merged: Dict[Tuple, int] = {}
+        for future in futures:
+            for key, visits in future.result().items():
+                merged[key] = merged.get(key, 0) + visits
+        return merged
+
+    def __seed(self, index: int) -> Optional[int]:
+        if self.seed is None:
+            return None
+        return chunk_seed(self.seed, self.__decisions * self.workers + index)
@@ -0,0 +1,127 @@
+from __future__ import annotations
+import random
+from bisect import bisect_right
+from fractions import Fraction
+from functools import lru_cache
+from itertools import product
+from math import comb
+from typing import Dict, List, Tuple
+
+from character import Character
+from creatures import Goblin, Skeleton, Necromancer, Warrior, Mage, Paladin, Ranger
+from dice import ATTACK_THRESHOLD, DEFENSE_THRESHOLD
+
+HEROES = (Warrior, Mage, Paladin, Ranger)
+VILLAINS = (Goblin, Skeleton, Necromancer)
+
+ATTACK_P = Fraction(6 - ATTACK_THRESHOLD, 6)  # chance one attack die succeeds
+DEFENSE_P = Fraction(6 - DEFENSE_THRESHOLD, 6)  # chance one defense die succeeds
+
+
+def binomial_pmf(n: int, p: Fraction) -> List[Fraction]:
+    """
+    Returns the exact chance of 0..n successes from n dice that each succeed with p
+    """
+    return [comb(n, k) * p ** k * (1 - p) ** (n - k) for k in range(n + 1)]
+
+
+class CombatOdds:
+    """
+    Exact outcome of one attack between two classes. Dungeon.attack deals
+    damage only when the attack successes beat the defense successes, so
+    hits is the attack margin with every non-positive margin folded into 0,
+    and damage is what deal_damage turns each margin into.
+
+    Attributes:
+        hits (tuple): chance of each margin 0..attack dice
+        damage (tuple): chance of dealing 0, 1, 2, ... damage, before the
+            defender's remaining health caps it
+        dealt (tuple): damage deal_damage turns each margin into
+        expected (float): expected damage
+    """
+
+    def __init__(self, attacker: Character, defender_type: type, attack_dice: int, defense_dice: int):
+        atk = binomial_pmf(attack_dice, ATTACK_P)
+        defd = binomial_pmf(defense_dice, DEFENSE_P)
+        hits = [Fraction(0)] * (attack_dice + 1)
+        for a, d in product(range(attack_dice + 1), range(defense_dice + 1)):
+            hits[max(a - d, 0)] += atk[a] * defd[d]
+
+        # run every margin through the attacker's own deal_damage so class
+        # modifiers (Mage +1, Ranger -1 against Skeletons) come from the rules
+        dealt = [0]
+        for margin in range(1, attack_dice + 1):
+            probe = defender_type()
+            probe.temp_health = 1000
+            dealt.append(attacker.deal_damage(probe, margin))
+        damage = [Fraction(0)] * (max(dealt) + 1)
+        for margin, chance in enumerate(hits):
+            damage[dealt[margin]] += chance
+
+        self.hits: Tuple[Fraction, ...] = tuple(hits)
+        self.damage: Tuple[Fraction, ...] = tuple(damage)
+        self.dealt: Tuple[int, ...] = tuple(dealt)
+        self.expected = float(sum(k * p for k, p in enumerate(damage)))
+        self.__cumulative = []
+        total = Fraction(0)
+        for chance in hits[:-1]:
+            total += chance
+            self.__cumulative.append(float(total))
+
+    def kill_chance(self, hp: int) -> float:
+        """
+        Returns the chance one attack brings a defender with hp health to 0
+        """
+        return float(sum(self.damage[hp:])) if hp > 0 else 1.0
+
+    def sample(self, rng=random) -> int:
+        """
+        Draws an attack margin with a single random number
+
+        Parameters:
+            rng (random.Random): source of the draw, the random module by default
+
+        Returns:
+            margin (int): attack successes minus defense successes, at least 0
+        """
+        return bisect_right(self.__cumulative, rng.random())
+
+    def __str__(self):
+        return f'CombatOdds(expected={self.expected:.3f}, damage={[float(p) for p in self.damage]})'
+
+
+@lru_cache(maxsize=None)
+def _odds(attacker_type: type, defender_type: type, attack_dice: int, defense_dice: int) -> CombatOdds:
+    return CombatOdds(attacker_type(), defender_type, attack_dice, defense_dice)
+
+
+def combat_odds(attacker: Character, defender: Character) -> CombatOdds:
+    """
+    Returns the memoized odds of attacker attacking defender
+
+    Parameters:
+        attacker (Character): the attacking character
+        defender (Character): the defending character
+
+    Returns:
+        odds (CombatOdds): the table for this pair of classes and dice pools
+    """
+    return _odds(type(attacker), type(defender), attacker.attack_dice(defender), defender.combat[1])
+
+
+def odds_table() -> Dict[Tuple[str, str], CombatOdds]:
+    """
+    Returns the odds of every hero attacking every villain and every villain
+    attacking every hero, keyed by (attacker class name, defender class name)
+    """
+    table = {}
+    for attackers, defenders in ((HEROES, VILLAINS), (VILLAINS, HEROES)):
+        for atk_type in attackers:
+            for def_type in defenders:
+                table[(atk_type.__name__, def_type.__name__)] = combat_odds(atk_type(), def_type())
+    return table
+
+
+if __name__ == "__main__":
+    for (atk_name, def_name), odds in odds_table().items():
+        print(f'{atk_name:<12}{def_name:<12}{odds}')
@@ -0,0 +1,137 @@
+from __future__ import annotations
+from functools import lru_cache
+from typing import Dict, FrozenSet, List, Sequence, Tuple
+
+from coord import Coord, board_coords
+from creatures import Villain
+
+# Villain spawning. The squares villains may start on, every row but the
+# heroes' bottom two less anything too close to a character already on
+# the board, are worked out once per board layout and cached. Placing a
+# board then draws squares from them without replacement, a partial
+# Fisher-Yates shuffle that only remembers the squares it swapped, so a
+# board of n villains costs O(n) and two villains never share a square.
+
+HERO_ROWS = 2  # bottom rows place_heroes uses, never spawned on
+
+
+class PlacementError(ValueError):
+    """
+    Raised when there are fewer free squares than villains to place
+    """
+
+
+@lru_cache(maxsize=1024)
+def spawn_cells(height: int, width: int, blocked: FrozenSet[Coord] = frozenset(),
+                min_distance: int = 1) -> Tuple[Tuple[Coord, ...], Tuple[int, ...]]:
+    """
+    Returns the squares villains may spawn on, rearmost row first, and for
+    every row x the index in them just past row x's last square
+
+    Parameters:
+        height (int): board height
+        width (int): board width
+        blocked (frozenset): squares of characters that stay where they are
+        min_distance (int): Manhattan distance every spawn keeps from the
+            blocked squares; below 1 only the squares themselves are left out
+
+    Raises:
+        ValueError: if height or width is outside 1..MAX_SIDE
+    """
+    reach = max(min_distance, 1)
+    cells = []
+    ends = []
+    for row in board_coords(height, width)[:max(height - HERO_ROWS, 0)]:
+        cells.extend(c for c in row if all(abs(c.x - b.x) + abs(c.y - b.y) >= reach for b in blocked))
+        ends.append(len(cells))
+    return tuple(cells), tuple(ends)
+
+
+class FreeCells:
+    """
+    Squares not taken yet, handing out uniformly random ones in O(1). Taken
+    squares are swapped to the front of cells; the swaps are kept in a
+    dict instead of copying cells, which can be shared.
+
+    Attributes:
+        cells (sequence): every square, sorted by row
+        ends (sequence): for every row x, the index in cells just past
+            row x's last square
+        start (int): squares before this index are taken
+    """
+    __slots__ = ('cells', 'ends', 'start', 'swapped')
+
+    def __init__(self, cells: Sequence[Coord], ends: Sequence[int]):
+        self.cells = cells
+        self.ends = ends
+        self.start = 0
+        self.swapped: Dict[int, Coord] = {}  # index -> square now there, if not cells[index]
+
+    def __len__(self):
+        return len(self.cells) - self.start
+
+    def __at(self, index: int) -> Coord:
+        cell = self.swapped.get(index)
+        return self.cells[index] if cell is None else cell
+
+    def __take(self, index: int) -> Coord:
+        cell = self.__at(index)
+        if index != self.start:
+            self.swapped[index] = self.__at(self.start)
+        self.swapped.pop(self.start, None)
+        self.start += 1
+        return cell
+
+    def take(self, rng) -> Coord:
+        """
+        Returns a random free square and takes it
+
+        Raises:
+            PlacementError: if every square is taken
+        """
+        if not len(self):
+            raise PlacementError('no free squares left')
+        return self.__take(rng.randint(self.start, len(self.cells) - 1))
+
+    def take_rear(self, rng) -> Coord:
+        """
+        Returns a random free square of the rearmost row that has one and
+        takes it. Only valid while nothing but take_rear has taken squares,
+        since then the free squares of that row are the ones right after
+        start.
+
+        Raises:
+            PlacementError: if every square is taken
+        """
+        if not len(self):
+            raise PlacementError('no free squares left')
+        return self.__take(rng.randint(self.start, self.ends[self.__at(self.start).x] - 1))
+
+
+def place(villains: Sequence[Villain], height: int, width: int, rng, blocked: FrozenSet[Coord] = frozenset(),
+          min_distance: int = 1, rear: Tuple[type, ...] = ()) -> List[Tuple[Villain, Coord]]:
+    """
+    Picks a distinct spawn square for every villain, see spawn_cells
+
+    Parameters:
+        villains (sequence): the villains to place
+        height (int): board height
+        width (int): board width
+        rng: randint(a, b) source, see rng.py
+        blocked (frozenset): squares of characters that stay where they are
+        min_distance (int): Manhattan distance kept from the blocked squares
+        rear (tuple): villain classes placed in the rearmost free rows,
+            furthest from the heroes
+
+    Returns:
+        placements (list): (villain, square) pairs, rear villains first
+
+    Raises:
+        PlacementError: if the allowed squares can't hold every villain
+    """
+    free = FreeCells(*spawn_cells(height, width, blocked, min_distance))
+    if len(villains) > len(free):
+        raise PlacementError(f'{len(villains)} villains but {len(free)} free squares')
+    back = [v for v in villains if isinstance(v, rear)]
+    front = [v for v in villains if not isinstance(v, rear)]
+    return [(v, free.take_rear(rng)) for v in back] + [(v, free.take(rng)) for v in front]
@@ -0,0 +1,182 @@
+from __future__ import annotations
+import argparse
+import inspect
+import os
+import signal
+import sys
+import threading
+from collections import Counter
+from typing import Dict, Iterator, List, Tuple
+
+from character import Character
+from dungeon import Dungeon
+from game import Game
+from renderer import Renderer
+from simulation import Agent, Simulation
+from tournament import play_chunk
+
+# Sampling profiler for headless batches, written as collapsed stacks for
+# flamegraph.pl or speedscope:
+#
+#   python profiler.py --games 200 --out stacks.txt
+#   flamegraph.pl stacks.txt > games.svg
+#
+# A CPU timer interrupts the main thread every --interval seconds and the
+# stack it was running is counted; nothing is hooked into the calls
+# themselves, so property access and dice rolls run at full speed and get
+# their real share of the samples. Every stack starts with the game phase
+# it was sampled in: select, move_validation, attack_resolution,
+# villain_setup, rendering, decision (the agent's act) or other.
+
+INTERVAL = 0.001  # seconds of CPU time between samples
+OTHER = 'other'
+
+# phase -> the methods that mark it. A sample belongs to the innermost of
+# these on its stack, overrides in subclasses included.
+PHASES: Dict[str, Tuple[Tuple[type, str], ...]] = {
+    'select': ((Simulation, 'legal_selections'), (Agent, 'select'), (Game, 'select')),
+    'move_validation': ((Dungeon, 'is_valid_move'), (Dungeon, 'legal_moves'), (Dungeon, 'all_moves'),
+                        (Character, 'is_valid_move'), (Character, 'legal_moves'), (Simulation, 'legal_actions')),
+    'attack_resolution': ((Dungeon, 'attack'), (Dungeon, 'is_valid_attack'), (Dungeon, 'targets'),
+                          (Dungeon, 'revive'), (Dungeon, 'raise_dead'),
+                          (Character, 'calculate_dice'), (Character, 'deal_damage')),
+    'villain_setup': ((Dungeon, 'generate_villains'), (Dungeon, 'place_villains'), (Dungeon, 'place_heroes'),
+                      (Dungeon, 'generate_new_board')),
+    'rendering': ((Renderer, 'draw'), (Dungeon, 'print_board')),
+    'decision': ((Agent, 'act'),),
+}
+
+
+def _subclasses(cls: type) -> Iterator[type]:
+    yield cls
+    for sub in cls.__subclasses__():
+        yield from _subclasses(sub)
+
+
+def phase_codes() -> dict:
+    """
+    Returns code object -> phase for every method named in PHASES
+    """
+    codes = {}
+    for phase, targets in PHASES.items():
+        for owner, attribute in targets:
+            for cls in _subclasses(owner):
+                func = cls.__dict__.get(attribute)
+                code = getattr(inspect.unwrap(func), '__code__', None) if func is not None else None
+                if code is not None:
+                    codes[code] = phase
+    return codes
+
+
+def phase_of(stack: tuple, codes: dict) -> str:
+    """
+    Returns the phase of a stack of code objects, innermost first
+    """
+    return next((codes[code] for code in stack if code in codes), OTHER)
+
+
+def frame_name(code) -> str:
+    """
+    Returns 'module.qualified_name' for a code object
+    """
+    module = os.path.splitext(os.path.basename(code.co_filename))[0]
+    return f'{module}.{getattr(code, "co_qualname", code.co_name)}'
+
+
+class SamplingProfiler:
+    """
+    Counts the main thread's stack every interval seconds of CPU time,
+    using the ITIMER_PROF timer and its signal. The handler only walks the
+    frames and bumps a counter; names and phases are worked out when the
+    profile is written.
+
+    Attributes:
+        interval (float): seconds of CPU time between samples
+        samples (Counter): stack as code objects, innermost first -> samples
+    """
+
+    def __init__(self, interval: float = INTERVAL):
+        if interval <= 0:
+            raise ValueError
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self.__previous = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def __sample(self, signum, frame):
+        stack = []
+        while frame is not None:
+            stack.append(frame.f_code)
+            frame = frame.f_back
+        self.samples[tuple(stack)] += 1
+
+    def start(self):
+        """
+        Raises:
+            RuntimeError: if this is not the main thread or the platform has no ITIMER_PROF
+        """
+        if not hasattr(signal, 'setitimer') or threading.current_thread() is not threading.main_thread():
+            raise RuntimeError('sampling needs ITIMER_PROF and the main thread')
+        self.__previous = signal.signal(signal.SIGPROF, self.__sample)
+        signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+
+    def stop(self):
+        signal.setitimer(signal.ITIMER_PROF, 0, 0)
+        if self.__previous is not None:
+            signal.signal(signal.SIGPROF, self.__previous)
+            self.__previous = None
+
+    def phases(self) -> Counter:
+        """
+        Returns phase -> samples taken in it
+        """
+        codes = phase_codes()
+        totals = Counter()
+        for stack, count in self.samples.items():
+            totals[phase_of(stack, codes)] += count
+        return totals
+
+    def collapsed(self) -> List[str]:
+        """
+        Returns the profile in collapsed stack format, one
+        'phase;outermost;...;innermost count' line per distinct stack
+        """
+        codes = phase_codes()
+        lines = Counter()
+        for stack, count in self.samples.items():
+            lines[';'.join([phase_of(stack, codes)] + [frame_name(code) for code in reversed(stack)])] += count
+        return [f'{line} {count}' for line, count in sorted(lines.items())]
+
+    def write(self, path: str):
+        with open(path, 'w') as f:
+            for line in self.collapsed():
+                f.write(line + '\n')
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description='Profiles a batch of headless games')
+    parser.add_argument('--games', type=int, default=100)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--size', type=int, default=8, help='board height and width')
+    parser.add_argument('--interval', type=float, default=INTERVAL, help='seconds of CPU time between samples')
+    parser.add_argument('--out', default='stacks.txt', help='collapsed stacks are written here')
+    args = parser.parse_args(argv)
+
+    with SamplingProfiler(args.interval) as profiler:
+        result = play_chunk(args.seed, args.games, args.size, args.size)
+    profiler.write(args.out)
+    print(result)
+    total = sum(profiler.samples.values()) or 1
+    for phase, count in profiler.phases().most_common():
+        print(f'{phase:<20}{count:>8} samples {count / total:6.1%}')
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,152 @@
+from __future__ import annotations
+import shutil
+import sys
+from typing import List, Optional, TextIO, Tuple
+
+from dungeon import Dungeon
+
+CELL = 5  # width of one board cell, '|___|'
+LABEL = 4  # width of the row number column
+RULE = '-' * 51
+
+HOME = '\x1b[H'
+CLEAR_SCREEN = '\x1b[2J'
+CLEAR_LINE = '\x1b[K'  # from the cursor to the end of the line
+CLEAR_BELOW = '\x1b[J'  # from the cursor to the end of the screen
+RESET_SCROLL_REGION = '\x1b[r'  # the whole screen scrolls again
+PROMPT_ROWS = 8  # terminal rows kept below the frame for Game's prompts and menus
+
+
+def cursor(row: int, column: int) -> str:
+    """
+    Returns the ANSI sequence moving the cursor to a 0 based row and column
+    """
+    return f'\x1b[{row + 1};{column + 1}H'
+
+
+def scroll_region(top: int, bottom: int) -> str:
+    """
+    Returns the ANSI sequence that limits scrolling to the 0 based rows
+    top..bottom - 1; terminals also move the cursor home on it
+    """
+    return f'\x1b[{top + 1};{bottom}r'
+
+
+class Renderer:
+    """
+    Draws Game's display with ANSI cursor moves instead of clearing the
+    screen. The previous frame is kept as rows of fixed width segments,
+    roster lines being one segment and board rows one per cell, and a new
+    frame only writes the segments that changed. The whole frame goes out
+    in one write, so nothing flickers and no process is started to clear
+    the terminal.
+
+    Rows are addressed from the top of the screen, so the frame must never
+    scroll away. The rows below it are made a scroll region for the
+    prompts; a frame leaving fewer than PROMPT_ROWS of the terminal for
+    them is painted in full every time instead, and so is the first frame
+    after the terminal changes height.
+
+    Attributes:
+        stream (TextIO): where frames are written, sys.stdout by default
+        lines (int): terminal height, None to ask shutil.get_terminal_size
+            on every draw
+    """
+
+    def __init__(self, stream: TextIO = None, lines: int = None):
+        self.stream = stream if stream is not None else sys.stdout
+        self.lines = lines
+        self.__previous: Optional[List[Tuple[str, ...]]] = None
+        self.__region: Optional[Tuple[int, int]] = None  # (top, bottom) of the prompts' scroll region
+
+    def reset(self):
+        """
+        Forgets the previous frame, so the next one repaints the whole screen
+        """
+        self.__previous = None
+
+    def close(self) -> None:
+        """
+        Gives the whole screen back to scrolling, leaving the cursor on the
+        last row so later output starts below the frame
+        """
+        if self.__region is not None:
+            self.stream.write(RESET_SCROLL_REGION + cursor(self.__region[1] - 1, 0) + '\n')
+            self.stream.flush()
+        self.__region = None
+        self.__previous = None
+
+    def terminal_lines(self) -> int:
+        return self.lines if self.lines is not None else shutil.get_terminal_size().lines
+
+    @staticmethod
+    def frame(dungeon: Dungeon) -> List[Tuple[str, ...]]:
+        """
+        Lays out one frame: villain roster, board, hero roster and the side
+        to move, as rows of segments
+        """
+        rows: List[Tuple[str, ...]] = [('=====================Villains======================',)]
+        for v in dungeon.villains:
+            rows.append((Renderer.roster_line(dungeon, v),))
+        rows.append((RULE,))
+        rows.append((' ' * LABEL + '_' * CELL * dungeon.width,))
+        for x, line in enumerate(dungeon.board):
+            rows.append((f'{x:<{LABEL}}',) + tuple('|___|' if char is None else f'|{char.__class__.__name__[:3]}|'
+                                                     for char in line))
+        rows.append((' ' * LABEL + ''.join(f'{y:^{CELL}}' for y in range(dungeon.width)),))
+        rows.append(('===================Heroes==========================',))
+        for h in dungeon.heroes:
+            rows.append((Renderer.roster_line(dungeon, h),))
+        rows.append((RULE,))
+        rows.append((f'{dungeon.player.name}\'s turn',))
+        return rows
+
+    @staticmethod
+    def roster_line(dungeon: Dungeon, char) -> str:
+        return f'{char.__class__.__name__:<12}{char.temp_health}/{char.health} HP  LOC -> {dungeon.position_of(char)}'
+
+    def diff(self, rows: List[Tuple[str, ...]]) -> str:
+        """
+        Returns the escape sequences and text turning the previous frame into
+        rows, and remembers rows as the previous frame
+        """
+        lines = self.terminal_lines()
+        if len(rows) + PROMPT_ROWS > lines:  # too tall to keep in place, let it scroll with the prompts
+            out = [RESET_SCROLL_REGION] if self.__region is not None else []
+            out.append(HOME + CLEAR_SCREEN + '\n'.join(''.join(row) for row in rows) + '\n')
+            self.__previous = None
+            self.__region = None
+            return ''.join(out)
+
+        previous = self.__previous
+        out = []
+        region = (len(rows), lines)
+        if self.__region is not None and self.__region[1] != lines:
+            previous = None  # the terminal was resized and may have moved the old frame
+        if previous is None:
+            out.append(HOME + CLEAR_SCREEN)
+            previous = []
+        if region != self.__region:
+            out.append(scroll_region(*region))
+            self.__region = region
+        for r, row in enumerate(rows):
+            old = previous[r] if r < len(previous) else None
+            if old is None or len(old) != len(row) or len(row) == 1:
+                if old != row:
+                    out.append(cursor(r, 0) + ''.join(row) + CLEAR_LINE)
+                continue
+            column = 0
+            for segment, before in zip(row, old):
+                if segment != before:
+                    out.append(cursor(r, column) + segment)
+                column += len(segment)
+        out.append(cursor(len(rows), 0) + CLEAR_BELOW)  # the prompts of the last turn go too
+        self.__previous = rows
+        return ''.join(out)
+
+    def draw(self, dungeon: Dungeon):
+        """
+        Writes the changes since the previous frame in a single write
+        """
+        self.stream.write(self.diff(self.frame(dungeon)))
+        self.stream.flush()
@@ -0,0 +1,264 @@
+from __future__ import annotations
+import mmap
+import struct
+from bisect import bisect_right
+from enum import Enum
+from typing import Iterator, List, Optional, Tuple
+
+import snapshot
+from action import ActionType
+from coord import Coord
+from dungeon import Dungeon
+from game import Game
+
+MAGIC = b'DNGR'
+VERSION = 1
+
+
+class Event(Enum):
+    SEED = 0  # only in older logs, read and skipped
+    SELECT = 1
+    MOVE = 2
+    ATTACK = 3
+    HEAL = 4
+    RAISE_DEAD = 5
+    END_TURN = 6
+    SNAPSHOT = 7
+
+
+_ACTION_EVENTS = {ActionType.MOVE: Event.MOVE, ActionType.ATTACK: Event.ATTACK, ActionType.HEAL: Event.HEAL,
+                  ActionType.RAISE_DEAD: Event.RAISE_DEAD, ActionType.END_TURN: Event.END_TURN}
+
+# log layout: HEADER, then events, each a one byte Event tag and its payload
+HEADER = struct.Struct('<4sB3x')
+SELECT = struct.Struct('<BBB')  # tag, x, y
+ACTION = struct.Struct('<BBBBBb')  # tag, from x, from y, to x, to y, attack margin
+END_TURN = struct.Struct('<B')
+SEED = struct.Struct('<BQ')
+SNAPSHOT = struct.Struct(f'<B{snapshot.SIZE}s')
+# the index file, path + '.idx', holds one entry per snapshot
+INDEX = struct.Struct('<QQQ')  # turn, events before it, offset of the SNAPSHOT event in the log
+
+
+class ReplayError(ValueError):
+    """
+    Raised for a file that is not a replay log this version can read
+    """
+
+
+class ReplayWriter:
+    """
+    Append only log of a game. Once attached, the Dungeon reports every
+    move, attack, heal, raise dead and end of turn it carries out;
+    selections are written by whoever makes them. Attacks are stored with
+    the margin they were resolved with, so replaying them never depends
+    on the dice and no RNG state is logged. A snapshot of the whole position is
+    appended at the first end of turn after every `every` events and
+    listed in the index file, so a reader can start near any turn.
+
+    Attributes:
+        path (str): the log; the index is path + '.idx'
+        dungeon (Dungeon): the game being recorded
+        game (Game): its Game, if any, for rooms_cleared, moves and atk
+        every (int): events between snapshots
+        events (int): events written so far
+        turn (int): ends of turn written so far
+    """
+
+    def __init__(self, path: str, dungeon: Dungeon, every: int = 1000, game: Game = None):
+        if every < 1:
+            raise ValueError
+        self.path = path
+        self.dungeon = dungeon
+        self.game = game
+        self.every = every
+        self.events = 0
+        self.turn = 0
+        self.__since = 0
+        self.__file = open(path, 'wb')
+        self.__index = open(path + '.idx', 'wb')
+        self.__offset = 0
+        self.__write(HEADER.pack(MAGIC, VERSION))
+        self.snapshot()
+        dungeon.replay_log = self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __write(self, data: bytes):
+        self.__file.write(data)
+        self.__offset += len(data)
+
+    def record(self, kind: ActionType, from_coord: Coord = None, to_coord: Coord = None, margin: int = 0):
+        """
+        Appends an action the Dungeon carried out
+        """
+        event = _ACTION_EVENTS[kind]
+        self.events += 1
+        self.__since += 1
+        if event is Event.END_TURN:
+            self.__write(END_TURN.pack(event.value))
+            self.turn += 1
+            if self.__since >= self.every:
+                self.snapshot()
+        else:
+            margin = max(-128, min(127, margin))
+            self.__write(ACTION.pack(event.value, from_coord.x, from_coord.y, to_coord.x, to_coord.y, margin))
+
+    def select(self, coord: Coord):
+        """
+        Appends the selection of the unit on coord
+        """
+        self.events += 1
+        self.__since += 1
+        self.__write(SELECT.pack(Event.SELECT.value, coord.x, coord.y))
+
+    def snapshot(self):
+        """
+        Appends a snapshot of the position and indexes it
+        """
+        game = self.game
+        counters = (game.rooms_cleared, game.moves, game.atk) if game is not None else (0, 0, 0)
+        data = snapshot.encode(self.dungeon, *counters)
+        self.__index.write(INDEX.pack(self.turn, self.events, self.__offset))
+        self.__write(SNAPSHOT.pack(Event.SNAPSHOT.value, data))
+        self.__since = 0
+
+    def flush(self):
+        self.__file.flush()
+        self.__index.flush()
+
+    def close(self):
+        """
+        Detaches from the Dungeon and closes both files
+        """
+        if self.dungeon.replay_log is self:
+            self.dungeon.replay_log = None
+        self.__file.close()
+        self.__index.close()
+
+
+class ReplayReader:
+    """
+    Reads a log written by ReplayWriter. Both files are memory mapped, so
+    opening a long log reads nothing up front and seeking to a turn only
+    touches the nearest snapshot and the events after it.
+
+    Attributes:
+        path (str): the log
+        snapshots (list): (turn, events before it, offset) per snapshot, by turn
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.__files = []
+        self.__log = self.__map(path)
+        if len(self.__log) < HEADER.size:
+            raise ReplayError('truncated log')
+        magic, version = HEADER.unpack_from(self.__log)
+        if magic != MAGIC:
+            raise ReplayError('not a replay log')
+        if version != VERSION:
+            raise ReplayError(f'unsupported replay version {version}')
+        index = self.__map(path + '.idx')
+        self.snapshots: List[Tuple[int, int, int]] = [entry for entry in INDEX.iter_unpack(index)]
+        self.__turns = [turn for turn, _, _ in self.snapshots]
+
+    def __map(self, path: str):
+        f = open(path, 'rb')
+        self.__files.append(f)
+        try:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # an empty file cannot be mapped
+            return b''
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        for f in self.__files:
+            f.close()
+        self.__files = []
+
+    def events(self, offset: int = HEADER.size) -> Iterator[Tuple[int, Event, tuple]]:
+        """
+        Yields (offset, event, payload) for every event from offset on. The
+        payload is (coord,) for SELECT, (from, to, margin) for actions, (seed,)
+        for the SEED of an older log, (Snapshot,) for SNAPSHOT and () for END_TURN.
+
+        Raises:
+            ReplayError: if an event is cut off or unknown
+        """
+        log = self.__log
+        size = len(log)
+        while offset < size:
+            try:
+                event = Event(log[offset])
+                if event is Event.SELECT:
+                    _, x, y = SELECT.unpack_from(log, offset)
+                    payload, length = (Coord(x, y),), SELECT.size
+                elif event is Event.END_TURN:
+                    payload, length = (), END_TURN.size
+                elif event is Event.SEED:
+                    payload, length = (SEED.unpack_from(log, offset)[1],), SEED.size
+                elif event is Event.SNAPSHOT:
+                    if offset + SNAPSHOT.size > size:
+                        raise ReplayError('truncated log')
+                    payload, length = (snapshot.decode(log, offset + 1),), SNAPSHOT.size
+                else:
+                    _, fx, fy, tx, ty, margin = ACTION.unpack_from(log, offset)
+                    payload, length = (Coord(fx, fy), Coord(tx, ty), margin), ACTION.size
+            except (ValueError, struct.error) as e:
+                if isinstance(e, ReplayError):
+                    raise
+                raise ReplayError(f'bad event at {offset}') from None
+            yield offset, event, payload
+            offset += length
+
+    def replay(self, turn: Optional[int] = None) -> Game:
+        """
+        Rebuilds the game as it stood at the start of turn, counting ends
+        of turn from the start of the log, or at the end of the log when
+        turn is None. Play starts from the last snapshot at or before
+        turn, so only the events after it are replayed.
+
+        Raises:
+            ValueError: if turn is negative
+        """
+        if turn is not None and turn < 0:
+            raise ValueError
+        at = len(self.snapshots) - 1 if turn is None else bisect_right(self.__turns, turn) - 1
+        current, _, offset = self.snapshots[at]
+        events = self.events(offset)
+        _, _, (state,) = next(events)
+        game = state.to_game()
+        dungeon = game.dungeon
+        for _, event, payload in events:
+            if turn is not None and current >= turn:
+                break
+            if event is Event.END_TURN:
+                dungeon.set_next_player()
+                game.moves = 0
+                game.atk = 0
+                current += 1
+            elif event is Event.MOVE:
+                dungeon.move(payload[0], payload[1])
+                game.moves += 1
+            elif event is Event.ATTACK:
+                dungeon.attack(payload[0], payload[1], payload[2])
+                game.atk += 1
+            elif event is Event.HEAL:
+                dungeon.revive(payload[0], payload[1])
+                game.atk += 1
+            elif event is Event.RAISE_DEAD:
+                dungeon.raise_dead(payload[0], payload[1])
+                game.atk += 1
+            elif event is Event.SELECT:
+                game.selected = dungeon.character_at(payload[0].x, payload[0].y)
+        return game
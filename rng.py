@@ -0,0 +1,153 @@
+from __future__ import annotations
+import random
+from typing import List
+
+import dice
+
+MASK = 0xFFFFFFFF
+
+# Philox4x32-10 constants (Salmon et al., "Parallel random numbers: as easy as 1, 2, 3")
+_M0 = 0xD2511F53
+_M1 = 0xCD9E8D57
+_W0 = 0x9E3779B9
+_W1 = 0xBB67AE85
+ROUNDS = 10
+
+_DICE_PER_WORD = 24  # base 6 digits taken from one 64 bit draw
+_DIGITS = 6 ** _DICE_PER_WORD
+_DICE_LIMIT = (1 << 64) // _DIGITS * _DIGITS  # draws at or above this are rejected to keep the dice fair
+_BLOCKS_PER_REFILL = 8
+
+
+def philox(counter: tuple, key: tuple) -> tuple:
+    """
+    Returns the four 32 bit words Philox4x32-10 makes from a four word
+    counter and a two word key
+    """
+    c0, c1, c2, c3 = counter
+    k0, k1 = key
+    for _ in range(ROUNDS):
+        p0 = _M0 * c0
+        p1 = _M1 * c2
+        c0, c1, c2, c3 = (p1 >> 32) ^ c1 ^ k0, p1 & MASK, (p0 >> 32) ^ c3 ^ k1, p0 & MASK
+        k0 = (k0 + _W0) & MASK
+        k1 = (k1 + _W1) & MASK
+    return c0, c1, c2, c3
+
+
+class GlobalRNG:
+    """
+    The RNG service Dungeon uses by default: the random module, so
+    random.seed keeps working the way it always has
+    """
+
+    @staticmethod
+    def randint(a: int, b: int) -> int:
+        return random.randint(a, b)
+
+    @staticmethod
+    def random() -> float:
+        return random.random()
+
+    @staticmethod
+    def roll(n: int) -> List[int]:
+        return dice.roll(n)
+
+
+GLOBAL_RNG = GlobalRNG()
+
+
+class CounterRNG:
+    """
+    Counter based RNG service. Block i of stream s is
+    philox((i, s), seed): nothing is shared between instances and the
+    numbers depend only on (seed, stream) and how many have been drawn,
+    so games in separate threads or processes draw independently and
+    any game can be reproduced from its seed and stream id alone.
+
+    Words are generated a few blocks at a time and dice are cut out of
+    64 bit draws 24 at a time, so roll(n) is a slice of a buffer.
+
+    Attributes:
+        seed (int): 64 bit key
+        stream (int): 64 bit stream id
+    """
+
+    def __init__(self, seed: int = 0, stream: int = 0):
+        if not (0 <= seed < 1 << 64) or not (0 <= stream < 1 << 64):
+            raise ValueError
+        self.seed = seed
+        self.stream = stream
+        self.__key = (seed & MASK, seed >> 32)
+        self.__block = 0
+        self.__words: List[int] = []
+        self.__dice: List[int] = []
+
+    def spawn(self, stream: int) -> CounterRNG:
+        """
+        Returns a fresh service for another stream under the same seed
+        """
+        return CounterRNG(self.seed, stream)
+
+    def __refill_words(self):
+        key = self.__key
+        lo = self.stream & MASK
+        hi = self.stream >> 32
+        words = self.__words
+        block = self.__block
+        for i in range(block, block + _BLOCKS_PER_REFILL):
+            words.extend(philox((i & MASK, i >> 32, lo, hi), key))
+        self.__block = block + _BLOCKS_PER_REFILL
+        words.reverse()  # popped from the end, so the first word comes out first
+
+    def getrandbits32(self) -> int:
+        if not self.__words:
+            self.__refill_words()
+        return self.__words.pop()
+
+    def __draw64(self) -> int:
+        return (self.getrandbits32() << 32) | self.getrandbits32()
+
+    def randbelow(self, n: int) -> int:
+        """
+        Returns a uniform integer in 0..n-1
+        """
+        if n <= 0:
+            raise ValueError
+        limit = (1 << 64) // n * n
+        while True:
+            value = self.__draw64()
+            if value < limit:
+                return value % n
+
+    def randint(self, a: int, b: int) -> int:
+        """
+        Returns a uniform integer in a..b, both included, like random.randint
+        """
+        return a + self.randbelow(b - a + 1)
+
+    def random(self) -> float:
+        """
+        Returns a uniform float in [0, 1) with 53 random bits
+        """
+        return (self.__draw64() >> 11) * (1.0 / (1 << 53))
+
+    def roll(self, n: int) -> List[int]:
+        """
+        Rolls n six sided dice at once
+
+        Returns:
+            lst (list): the rolls, each between 1 and 6
+        """
+        buffered = self.__dice
+        while len(buffered) < n:
+            value = self.__draw64()
+            if value >= _DICE_LIMIT:
+                continue
+            value %= _DIGITS
+            for _ in range(_DICE_PER_WORD):
+                value, face = divmod(value, 6)
+                buffered.append(face + 1)
+        rolls = buffered[:n]
+        del buffered[:n]
+        return rolls
@@ -0,0 +1,352 @@
+from __future__ import annotations
+import asyncio
+import itertools
+from typing import Dict, List, Optional, Set
+
+from action import ActionType
+from character import Player
+from coord import Coord
+from dungeon import Dungeon
+from rng import CounterRNG
+from simulation import Simulation
+
+# line protocol, one command per line, coordinates as in Game: 'x y'
+#   new [height width]   start a match; this connection holds every seat
+#   join <id>            take the villain seat of a match
+#   select x y           select the unit on x y
+#   move x y | attack x y | heal x y | raise x y
+#   end                  end the turn ('end turn' works too)
+#   state | board | quit
+# every command is answered by one 'ok ...' or 'err ...' line; 'board' sends
+# the board lines first. Lines starting with '*' are pushed to the other seats
+# of a match: '* <command> ...', '* end <side to move>' and '* over <winner>'.
+
+ACTIONS = {'move': ActionType.MOVE, 'attack': ActionType.ATTACK, 'heal': ActionType.HEAL,
+           'raise': ActionType.RAISE_DEAD}
+MAX_LINE = 256
+MAX_BUFFERED = 1 << 16  # a seat that lets this much output pile up is dropped
+
+
+class ProtocolError(ValueError):
+    """
+    Raised for a command the server cannot carry out; the message is sent
+    back to the client after 'err'
+    """
+
+
+class Match:
+    """
+    One game and the connections seated at it. The turn structure is
+    Simulation's: select a unit, then up to two moves and one attack, heal
+    or raise dead before the turn passes. Each match rolls from its own
+    CounterRNG stream, so matches never share random state and any match
+    can be replayed from the server seed and its id.
+
+    Attributes:
+        id (int): match id, also the RNG stream
+        sim (Simulation): turn state of the game
+        seats (dict): Player -> Connection holding that side
+    """
+    __slots__ = ('id', 'sim', 'seats')
+
+    def __init__(self, id: int, dungeon: Dungeon):
+        self.id = id
+        self.sim = Simulation(dungeon, None, None)
+        self.sim.setup()
+        self.seats: Dict[Player, Connection] = {}
+
+    def broadcast(self, line: str, source: Connection = None):
+        """
+        Pushes line to every connection seated at the match except source
+        """
+        for conn in set(self.seats.values()):
+            if conn is not source:
+                conn.push(line)
+
+    def state(self) -> str:
+        sim = self.sim
+        winner = sim.winner()
+        status = f'over {winner.name}' if winner is not None else f'turn {sim.dungeon.player.name}'
+        return f'{self.id} {status} {sim.turns} {sim.dungeon.zobrist:016x}'
+
+
+class Connection:
+    """
+    One client. Commands are handled entirely between two reads: the rules
+    calls behind a command take microseconds, far less than handing them to
+    a thread would, so nothing else waits longer than one command.
+
+    Attributes:
+        match (Match): the match this connection is seated at, if any
+    """
+
+    def __init__(self, server: GameServer, writer: asyncio.StreamWriter):
+        self.server = server
+        self.writer = writer
+        self.match: Optional[Match] = None
+
+    def push(self, line: str):
+        """
+        Queues a line without waiting for the client to read it
+        """
+        writer = self.writer
+        if writer.is_closing():
+            return
+        if writer.transport.get_write_buffer_size() > MAX_BUFFERED:
+            writer.close()
+            return
+        writer.write(line.encode() + b'\n')
+
+    def sides(self) -> List[Player]:
+        match = self.match
+        return [side for side, conn in match.seats.items() if conn is self] if match is not None else []
+
+    def handle(self, line: str) -> List[str]:
+        """
+        Carries out one command
+
+        Returns:
+            lines (list): the reply, 'ok ...' last
+
+        Raises:
+            ProtocolError: if the command is unknown, malformed or not allowed
+        """
+        words = line.split()
+        if not words:
+            raise ProtocolError('empty command')
+        command, args = words[0].lower(), words[1:]
+        if command == 'new':
+            return [self.new(args)]
+        if command == 'join':
+            return [self.join(args)]
+        if command == 'quit':
+            return ['ok bye']
+        match = self.match
+        if match is None:
+            raise ProtocolError('no match')
+        if command == 'state':
+            return [f'ok {match.state()}']
+        if command == 'board':
+            return self.board() + ['ok']
+        sim = match.sim
+        if sim.winner() is not None:
+            raise ProtocolError('game over')
+        if sim.dungeon.player not in self.sides():
+            raise ProtocolError('not your turn')
+        if command == 'end':
+            return [f'ok {self.end_turn()}']
+        if command == 'raise' and args[:1] == ['dead']:
+            args = args[1:]
+        if command == 'select':
+            return [self.select(self.coord(args))]
+        if command in ACTIONS:
+            return [self.act(ACTIONS[command], self.coord(args), command)]
+        raise ProtocolError(f'unknown command {command}')
+
+    def coord(self, args: List[str]) -> Coord:
+        dungeon = self.match.sim.dungeon
+        try:
+            x, y = (int(i) for i in args)
+        except ValueError:
+            raise ProtocolError('expected x y') from None
+        if not (0 <= x < dungeon.height) or not (0 <= y < dungeon.width):
+            raise ProtocolError('off the board')
+        return Coord(x, y)
+
+    def new(self, args: List[str]) -> str:
+        try:
+            height, width = (int(i) for i in args) if args else (8, 8)
+        except ValueError:
+            raise ProtocolError('expected height width') from None
+        match = self.server.create_match(height, width)
+        self.leave()
+        self.match = match
+        match.seats = {Player.HERO: self, Player.VILLAIN: self}
+        return f'ok {match.state()}'
+
+    def join(self, args: List[str]) -> str:
+        try:
+            match = self.server.matches[int(args[0])]
+        except (IndexError, ValueError, KeyError):
+            raise ProtocolError('no such match') from None
+        if match.seats.get(Player.VILLAIN) is not match.seats.get(Player.HERO):
+            raise ProtocolError('match is full')
+        self.leave()
+        self.match = match
+        match.seats[Player.VILLAIN] = self
+        match.broadcast('* joined VILLAIN', self)
+        return f'ok {match.state()} VILLAIN'
+
+    def leave(self):
+        """
+        Gives up every seat held; a match nobody holds a seat at is closed
+        """
+        match = self.match
+        if match is None:
+            return
+        self.match = None
+        sides = [side for side, conn in match.seats.items() if conn is self]
+        for side in sides:
+            del match.seats[side]
+        for side in sides:
+            match.broadcast(f'* left {side.name}')
+        if not match.seats:
+            self.server.matches.pop(match.id, None)
+
+    def board(self) -> List[str]:
+        """
+        Returns one line per board row, a cell being '.' or the first three
+        letters of the class and its health, e.g. 'War7'
+        """
+        return [' '.join('.' if char is None else f'{char.__class__.__name__[:3]}{max(char._temp_health, 0)}'
+                         for char in row)
+                for row in self.match.sim.dungeon.board]
+
+    def select(self, coord: Coord) -> str:
+        sim = self.match.sim
+        if sim.selected is not None:
+            raise ProtocolError('already selected')
+        if coord not in sim.legal_selections():
+            raise ProtocolError('cannot select that')
+        sim.selected = coord
+        if sim.dungeon.replay_log is not None:
+            sim.dungeon.replay_log.select(coord)
+        self.match.broadcast(f'* select {coord.x} {coord.y}', self)
+        return f'ok {sim.dungeon.character_at(coord.x, coord.y).__class__.__name__}'
+
+    def act(self, kind: ActionType, coord: Coord, command: str) -> str:
+        match = self.match
+        sim = match.sim
+        if sim.selected is None:
+            raise ProtocolError('nothing selected')
+        action = next((a for a in sim.legal_actions() if a.kind is kind and a.to_coord is coord), None)
+        if action is None:
+            raise ProtocolError(f'cannot {command} there')
+        target = sim.dungeon.character_at(coord.x, coord.y)
+        done = sim.apply(action)
+        result = f'{command} {coord.x} {coord.y}'
+        if kind is not ActionType.MOVE:
+            result += f' {target._temp_health}'
+        match.broadcast(f'* {result}', self)
+        winner = sim.winner()
+        if winner is not None:
+            match.broadcast(f'* over {winner.name}', self)
+            return f'ok {result} over {winner.name}'
+        if done:
+            return f'ok {result} {self.end_turn()}'
+        return f'ok {result}'
+
+    def end_turn(self) -> str:
+        match = self.match
+        sim = match.sim
+        sim.end_turn()
+        match.broadcast(f'* end {sim.dungeon.player.name}', self)
+        return f'end {sim.dungeon.player.name}'
+
+
+class GameServer:
+    """
+    asyncio TCP server hosting any number of matches, each connection
+    speaking the line protocol above. Matches live in this process and
+    cost one Dungeon each, so thousands fit alongside one another.
+
+    Attributes:
+        host (str): address to listen on
+        port (int): port to listen on, 0 picks a free one; set by start()
+        seed (int): seed of every match's CounterRNG, match ids are the streams
+        matches (dict): id -> Match, for every match somebody is seated at
+    """
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, seed: int = 0):
+        self.host = host
+        self.port = port
+        self.seed = seed
+        self.matches: Dict[int, Match] = {}
+        self.__ids = itertools.count()
+        self.__server: Optional[asyncio.base_events.Server] = None
+        self.__connections: Set[Connection] = set()
+        self.__handlers: Set[asyncio.Task] = set()
+
+    def create_match(self, height: int = 8, width: int = 8) -> Match:
+        """
+        Starts a match with freshly generated villains
+
+        Raises:
+            ProtocolError: if the board size is out of range
+        """
+        id = next(self.__ids)
+        try:
+            dungeon = Dungeon(height, width, [], verbose=False, rng=CounterRNG(self.seed, id))
+        except ValueError:
+            raise ProtocolError('board must be 4 to 12 squares a side') from None
+        match = Match(id, dungeon)
+        self.matches[id] = match
+        return match
+
+    async def start(self) -> int:
+        """
+        Starts listening
+
+        Returns:
+            port (int): the port bound
+        """
+        self.__server = await asyncio.start_server(self.serve, self.host, self.port, limit=MAX_LINE)
+        self.port = self.__server.sockets[0].getsockname()[1]
+        return self.port
+
+    async def serve_forever(self):
+        if self.__server is None:
+            await self.start()
+        async with self.__server:
+            await self.__server.serve_forever()
+
+    async def close(self):
+        """
+        Stops listening, hangs up on every client and waits for their
+        handlers to finish
+        """
+        if self.__server is not None:
+            self.__server.close()
+            for conn in self.__connections:
+                conn.writer.close()
+            await asyncio.gather(*self.__handlers, return_exceptions=True)
+            await self.__server.wait_closed()
+            self.__server = None
+
+    async def serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """
+        Talks to one client until it quits or disconnects
+        """
+        conn = Connection(self, writer)
+        handler = asyncio.current_task()
+        self.__connections.add(conn)
+        self.__handlers.add(handler)
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except (asyncio.LimitOverrunError, ValueError):
+                    writer.write(b'err line too long\n')
+                    break
+                if not line:
+                    break
+                try:
+                    reply = conn.handle(line.decode(errors='replace'))
+                except ProtocolError as e:
+                    reply = [f'err {e}']
+                writer.write(('\n'.join(reply) + '\n').encode())
+                await writer.drain()
+                if reply[-1] == 'ok bye':
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            conn.leave()
+            writer.close()
+            self.__connections.discard(conn)
+            self.__handlers.discard(handler)
+
+
+if __name__ == "__main__":
+    server = GameServer(port=7878)
+    asyncio.run(server.serve_forever())
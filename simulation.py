@@ -0,0 +1,265 @@
+from __future__ import annotations
+import random
+from abc import ABC, abstractmethod
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from action import Action, ActionType, END_TURN
+from character import Player
+from coord import Coord
+from dungeon import Dungeon
+
+
+class Agent(ABC):
+    """
+    Decides for one side of a headless game. Agents never print or prompt,
+    they only pick from the choices the simulation hands them.
+    """
+
+    @abstractmethod
+    def select(self, dungeon: Dungeon, choices: List[Coord]) -> Coord:
+        """
+        Picks the unit that acts this turn
+
+        Parameters:
+            dungeon (Dungeon): current position, read only
+            choices (list): squares of every unit that may be selected
+
+        Returns:
+            coord (Coord): one of choices
+        """
+
+    @abstractmethod
+    def act(self, dungeon: Dungeon, actions: List[Action]) -> Action:
+        """
+        Picks what the selected unit does next
+
+        Parameters:
+            dungeon (Dungeon): current position, read only
+            actions (list): every legal action, END_TURN is always included
+
+        Returns:
+            action (Action): one of actions
+        """
+
+
+class RandomAgent(Agent):
+    """
+    Agent that picks uniformly among the legal choices
+
+    Attributes:
+        rng (random.Random): source of the picks, the random module by default
+    """
+
+    def __init__(self, rng: random.Random = None):
+        self.rng = rng if rng is not None else random
+
+    def select(self, dungeon: Dungeon, choices: List[Coord]) -> Coord:
+        return self.rng.choice(choices)
+
+    def act(self, dungeon: Dungeon, actions: List[Action]) -> Action:
+        return self.rng.choice(actions)
+
+
+class GreedyAgent(RandomAgent):
+    """
+    Agent that attacks, heals or raises whenever it can and otherwise
+    moves toward the closest living enemy, breaking ties at random
+    """
+
+    def act(self, dungeon: Dungeon, actions: List[Action]) -> Action:
+        start = actions[0].from_coord
+        enemies = self.enemies(dungeon, start) if start is not None else []
+        here = self.distance_to(enemies, start) if enemies else 0
+        best = None
+        best_score = None
+        for action in actions:
+            if action.kind is ActionType.END_TURN:
+                score = 0
+            elif action.kind is ActionType.MOVE:
+                score = here - self.distance_to(enemies, action.to_coord) if enemies else 0
+            else:
+                score = 100
+            score += self.rng.random()
+            if best_score is None or score > best_score:
+                best = action
+                best_score = score
+        return best
+
+    @staticmethod
+    def enemies(dungeon: Dungeon, start: Coord) -> List[Coord]:
+        """
+        Returns the squares of every living enemy of the unit standing on start
+        """
+        player = dungeon.character_at(start.x, start.y).player
+        return [pos for char, pos in dungeon.positions.items()
+                if char._player is not player and char._temp_health > 0]
+
+    @staticmethod
+    def distance_to(squares: List[Coord], square: Coord) -> int:
+        """
+        Returns the Manhattan distance from square to the closest of squares
+        """
+        return min(abs(square.x - s.x) + abs(square.y - s.y) for s in squares)
+
+
+class Simulation:
+    """
+    Runs a Dungeon to completion without input(), clear() or printing.
+    Every rule comes from Dungeon itself, the simulation only mirrors the
+    turn structure of Game: select one unit, then up to two moves and one
+    attack, heal or raise dead before the turn passes.
+
+    Attributes:
+        dungeon (Dungeon): the position being played
+        agents (dict): Player -> Agent deciding for that side
+        max_turns (int): turns played before the game is called a draw
+        turns (int): turns played so far
+        moves (int): moves made by the selected unit this turn
+        atk (int): attacks, heals or raises made by the selected unit this turn
+        selected (Coord): square of the selected unit, None between turns
+        kills (Counter): attacker class name -> units it brought to 0 health
+        history (list): undo records of every change to the dungeon, newest
+            last, when recording; None otherwise
+    """
+
+    def __init__(self, dungeon: Dungeon, hero_agent: Agent, villain_agent: Agent, max_turns: int = 500,
+                 record: bool = False):
+        self.dungeon = dungeon
+        self.dungeon.verbose = False
+        self.agents: Dict[Player, Agent] = {Player.HERO: hero_agent, Player.VILLAIN: villain_agent}
+        self.max_turns = max_turns
+        self.turns = 0
+        self.moves = 0
+        self.atk = 0
+        self.selected: Optional[Coord] = None
+        self.kills: Counter = Counter()
+        self.history: Optional[List[Tuple]] = [] if record else None
+
+    def setup(self):
+        """
+        Places the heroes and villains the same way Game.setup does
+        """
+        self.dungeon.place_heroes()
+        self.dungeon.place_villains()
+
+    def is_over(self) -> bool:
+        """
+        Returns true when either side has won or the turn limit is reached
+        """
+        return self.winner() is not None or self.turns >= self.max_turns
+
+    def winner(self) -> Optional[Player]:
+        """
+        Returns the side that won, or None while the game is undecided
+        """
+        if self.dungeon.is_dungeon_clear():
+            return Player.HERO
+        if self.dungeon.adventurer_defeat():
+            return Player.VILLAIN
+        return None
+
+    def legal_selections(self) -> List[Coord]:
+        """
+        Returns the squares of every living unit belonging to the side to move
+        """
+        player = self.dungeon.player
+        return [pos for char, pos in self.dungeon.positions.items()
+                if char._player is player and char._temp_health > 0]
+
+    def legal_actions(self) -> List[Action]:
+        """
+        Returns every action the selected unit may take with the moves and
+        attacks it has left this turn. END_TURN is always the last entry.
+        """
+        dungeon = self.dungeon
+        start = self.selected
+        char = dungeon.character_at(start.x, start.y)
+        actions = []
+        if self.moves < 2:
+            for to in char.legal_moves(start, dungeon.board):
+                actions.append(Action(ActionType.MOVE, start, to))
+        if self.atk < 1:
+            attacks, heals, raises = dungeon.targets(start)
+            for to in attacks:
+                actions.append(Action(ActionType.ATTACK, start, to))
+            for to in heals:
+                actions.append(Action(ActionType.HEAL, start, to))
+            for to in raises:
+                actions.append(Action(ActionType.RAISE_DEAD, start, to))
+        actions.append(END_TURN)
+        return actions
+
+    def apply(self, action: Action) -> bool:
+        """
+        Carries out an action for the selected unit
+
+        Parameters:
+            action (Action): an entry of legal_actions()
+
+        Returns:
+            True (Bool): if the turn is over after this action, else False
+        """
+        dungeon = self.dungeon
+        if action.kind is ActionType.END_TURN:
+            return True
+        char = dungeon.character_at(action.from_coord.x, action.from_coord.y)
+        record = dungeon.apply(action)
+        if self.history is not None:
+            self.history.append(record)
+        if action.kind is ActionType.MOVE:
+            self.selected = action.to_coord
+            self.moves += 1
+        else:
+            if action.kind is ActionType.ATTACK and record[2] is not None and record[2].temp_health <= 0:
+                self.kills[char.__class__.__name__] += 1
+            self.atk += 1
+        return self.moves >= 2
+
+    def end_turn(self):
+        """
+        Resets the per-turn counters and passes play to the other side
+        """
+        self.selected = None
+        self.moves = 0
+        self.atk = 0
+        self.turns += 1
+        record = self.dungeon.apply(END_TURN)
+        if self.history is not None:
+            self.history.append(record)
+
+    def rewind(self):
+        """
+        Undoes every recorded change, newest first, leaving the dungeon as
+        it was when recording started. The turn counters are not restored.
+        """
+        while self.history:
+            self.dungeon.undo(self.history.pop())
+
+    def play_turn(self):
+        """
+        Plays one full turn for the side to move
+        """
+        agent = self.agents[self.dungeon.player]
+        choices = self.legal_selections()
+        if choices:
+            self.selected = agent.select(self.dungeon, choices)
+            if self.dungeon.replay_log is not None:
+                self.dungeon.replay_log.select(self.selected)
+            while True:
+                if self.apply(agent.act(self.dungeon, self.legal_actions())):
+                    break
+                if self.winner() is not None:
+                    break
+        self.end_turn()
+
+    def play(self) -> Optional[Player]:
+        """
+        Plays turns until the game is decided or the turn limit is reached
+
+        Returns:
+            winner (Player): the winning side, None for a draw
+        """
+        while not self.is_over():
+            self.play_turn()
+        return self.winner()
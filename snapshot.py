@@ -0,0 +1,186 @@
+from __future__ import annotations
+import struct
+from typing import Iterator, Optional
+
+from character import Player
+from compact_board import CompactBoard, KINDS, SIZE as BOARD_SIZE, IN_HEROES, IN_VILLAINS, CAN_HEAL, NOWHERE
+from creatures import Paladin
+from dungeon import Dungeon
+from game import Game
+
+MAGIC = b'DNGS'
+VERSION = 1
+
+# magic, version, Game.moves, Game.atk, reserved, Game.rooms_cleared; the
+# CompactBoard layout follows: dims, side to move, unit count, cells and
+# one array per stat, see compact_board.py
+HEADER = struct.Struct('<4sBBBBI')
+SIZE = HEADER.size + BOARD_SIZE
+
+
+class SnapshotError(ValueError):
+    """
+    Raised for bytes that are not a snapshot this version can read
+    """
+
+
+def encode_board(board: CompactBoard, rooms_cleared: int = 0, moves: int = 0, atk: int = 0,
+                 out: bytearray = None, offset: int = 0) -> Optional[bytes]:
+    """
+    Encodes a CompactBoard and the Game counters. This is the bulk path:
+    with out given, the record is written into out at offset in place
+    and nothing is allocated.
+
+    Returns:
+        snapshot (bytes): the record, None when written into out
+    """
+    if out is None:
+        out = bytearray(SIZE)
+        HEADER.pack_into(out, 0, MAGIC, VERSION, moves, atk, 0, rooms_cleared)
+        out[HEADER.size:] = board.buffer
+        return bytes(out)
+    HEADER.pack_into(out, offset, MAGIC, VERSION, moves, atk, 0, rooms_cleared)
+    out[offset + HEADER.size:offset + SIZE] = board.buffer
+    return None
+
+
+def encode(dungeon: Dungeon, rooms_cleared: int = 0, moves: int = 0, atk: int = 0) -> bytes:
+    """
+    Encodes a Dungeon: board dims, every unit's class, side, stats, health
+    and square, the Paladin's heal flag and the side to move
+    """
+    return encode_board(CompactBoard.from_dungeon(dungeon), rooms_cleared, moves, atk)
+
+
+def encode_game(game: Game) -> bytes:
+    """
+    Encodes a Game: its Dungeon plus rooms_cleared, moves and atk
+    """
+    return encode(game.dungeon, game.rooms_cleared, game.moves, game.atk)
+
+
+class Snapshot:
+    """
+    Read only view of one encoded record. Nothing is copied: the header
+    fields are read out of the buffer on access and board is a
+    CompactBoard over the same memory, made on first use.
+
+    Attributes:
+        view (memoryview): the SIZE bytes of the record
+    """
+    __slots__ = ('view', '_board')
+
+    def __init__(self, buffer, offset: int = 0):
+        view = memoryview(buffer)[offset:offset + SIZE]
+        if len(view) != SIZE:
+            raise SnapshotError('truncated snapshot')
+        if view[:4] != MAGIC:
+            raise SnapshotError('not a snapshot')
+        if view[4] != VERSION:
+            raise SnapshotError(f'unsupported snapshot version {view[4]}')
+        self.view = view
+        self._board = None
+
+    @property
+    def board(self) -> CompactBoard:
+        """
+        Returns the position as a CompactBoard viewing the record's bytes
+
+        Raises:
+            SnapshotError: if the board dimensions or unit count are out of range
+        """
+        if self._board is None:
+            try:
+                self._board = CompactBoard.wrap(self.view[HEADER.size:])
+            except ValueError:
+                raise SnapshotError('corrupt board') from None
+        return self._board
+
+    @property
+    def version(self):
+        return self.view[4]
+
+    @property
+    def moves(self):
+        return self.view[5]
+
+    @property
+    def atk(self):
+        return self.view[6]
+
+    @property
+    def rooms_cleared(self):
+        return HEADER.unpack_from(self.view)[5]
+
+    @property
+    def player(self):
+        return self.board.player
+
+    def to_dungeon(self) -> Dungeon:
+        """
+        Rebuilds the Dungeon with new Character objects
+        """
+        board = self.board
+        chars = []
+        for slot in range(board.units):
+            cls = KINDS[board.kinds[slot]]
+            if cls is None:
+                raise SnapshotError('unknown unit class')
+            char = cls()
+            char._player = Player(board.players[slot])
+            char._health = board.healths[slot]
+            char._temp_health = board.temp_healths[slot]
+            char._attack = board.attacks[slot]
+            char._defense = board.defenses[slot]
+            char._move = board.moves[slot]
+            char._range = board.ranges[slot]
+            if cls is Paladin:
+                char._heal = bool(board.flags[slot] & CAN_HEAL)
+            chars.append(char)
+
+        villains = [char for slot, char in enumerate(chars) if board.flags[slot] & IN_VILLAINS]
+        dungeon = Dungeon(board.height, board.width, villains, verbose=False)
+        heroes = [char for slot, char in enumerate(chars) if board.flags[slot] & IN_HEROES]
+        if heroes:
+            dungeon.heroes = heroes
+        if board.player is not Player.HERO:
+            dungeon.set_next_player()
+        width = board.width
+        grid = [[None] * width for _ in range(board.height)]
+        for slot, char in enumerate(chars):
+            index = board.positions[slot]
+            if index != NOWHERE:
+                grid[index // width][index % width] = char
+        dungeon.board = grid  # rebuilds the position index and hash
+        return dungeon
+
+    def to_game(self) -> Game:
+        """
+        Rebuilds the Game, counters included
+        """
+        game = Game(self.to_dungeon())
+        game.rooms_cleared = self.rooms_cleared
+        game.moves = self.moves
+        game.atk = self.atk
+        return game
+
+
+def decode(buffer, offset: int = 0) -> Snapshot:
+    """
+    Returns a zero copy view of the record at offset in buffer
+
+    Raises:
+        SnapshotError: if the bytes there are not a version VERSION record
+    """
+    return Snapshot(buffer, offset)
+
+
+def iter_snapshots(buffer) -> Iterator[Snapshot]:
+    """
+    Yields views of back to back records, as packed by encode_board with out
+    """
+    view = memoryview(buffer)
+    if len(view) % SIZE:
+        raise SnapshotError('truncated snapshot')
+    for offset in range(0, len(view), SIZE):
+        yield Snapshot(view, offset)
@@ -1,389 +1,1602 @@
-import unittest
-import copy
-import character
-from character import Character, Player
-from coord import Coord
-from creatures import Villain, Goblin, Skeleton, Necromancer, Player
-from creatures import Hero, Warrior, Mage, Paladin, Ranger
-from dungeon import Dungeon
-
-
-class CharacterTest(unittest.TestCase):  # test character class
-
-    def test_Villain(self):  # this is going to test if the character is appropriate player
-        n = Necromancer()
-        self.assertEqual(n.player, Player.VILLAIN)
-
-    def test_wrongPlayer(self):
-        g = Goblin()  # goblin is a villain, therefore cannot be hero
-        self.assertNotEquals(g.player, Player.HERO)
-
-    def test_combat_attrType(self):
-        s = Skeleton()
-        self.assertEqual(s.combat, list(s.combat))  # combat attribute must be a list
-
-    def test_villain_combat(self):
-        n = Necromancer()
-        self.assertNotEqual(n.combat, [1, 4])  # testing for right attack and defense
-
-    def test_attackDefense(self):
-        m = Mage()
-        self.assertEqual(m.combat[0], m.combat[1])
-
-    def test_characterDeath(self):
-        s = Skeleton()
-        with self.assertRaises(character.CharacterDeath):
-            s.temp_health = -1
-
-    def test_combat_Int(self):  # check if integers in combat
-        g = Goblin()
-        self.assertIsInstance(g.combat[0], int)
-
-    def test_moveGreater(self):  # testing if move is in bounds
-        w = Warrior()
-        with self.assertRaises(ValueError):
-            w.move = 0
-
-
-    # test villain is_valid_move
-    def test_villain_wrongDirection(self):
-        ch = Villain()
-        board = [[None for _ in range(5)] for _ in range(5)]
-        fromm = Coord(0, 4)
-        board[0][4] = ch
-        to = Coord(1, 3)
-        valid = ch.is_valid_move(fromm, to, board)
-        self.assertFalse(valid)
-
-    def test_villain_Vertical(self):
-        ch = Villain()
-        board = [[None for _ in range(5)] for _ in range(5)]
-        fromm = Coord(0, 4)
-        board[0][4] = ch
-        to = Coord(0, 3)
-        valid = ch.is_valid_move(fromm, to, board)
-        self.assertTrue(valid)
-
-    def test_villain_Horizontal(self):
-        ch = Villain()
-        board = [[None for _ in range(5)] for _ in range(5)]
-        fromm = Coord(1, 0)
-        board[1][0] = ch
-        to = Coord(4, 0)
-        valid = ch.is_valid_move(fromm, to, board)
-        self.assertTrue(valid)
-
-
-    def test_villainWithBlockage(self):
-        s = Skeleton()
-        board = [[None for _ in range(5)] for _ in range(5)]
-        fromm = Coord(0, 4)
-        to = Coord(0, 3)
-        board[0][4] = s
-        board[0][3] = Goblin()
-        valid = s.is_valid_move(fromm, to, board)
-        self.assertFalse(valid)
-
-    def test_villainExceedMove(self):
-        n = Necromancer()
-        board = [[None for _ in range(5)] for _ in range(5)]
-        fromm = Coord(0, 0)
-        to = Coord(0, 4)
-        board[0][0] = n
-        valid = n.is_valid_move(fromm, to, board)
-        self.assertFalse(valid)
-
-    def testOutRangeFromTo(self):
-        ch = Villain()
-        board = [[None for _ in range(5)] for _ in range(5)]
-        fromm = Coord(0, 5)
-        to = Coord(1, 9)
-        valid = ch.is_valid_attack(fromm, to, board)
-        self.assertFalse(valid)
-
-
-    def testOutRangeFrom(self):
-        ch = Hero()
-        board = [[None for _ in range(5)] for _ in range(5)]
-        fromm = Coord(0, 9)
-        to = Coord(1, 3)
-        valid = ch.is_valid_attack(fromm, to, board)
-        self.assertFalse(valid)
-
-    def testInRange(self):
-        ch = Hero()
-        board = [[None for _ in range(5)] for _ in range(5)]
-        fromm = Coord(1, 3)
-        board[fromm.x][fromm.y] = Mage()
-        to = Coord(1, 4)
-        board[1][4] = Goblin()
-        valid = ch.is_valid_attack(fromm, to, board)
-        self.assertEqual(True, valid)
-
-    def test_calculateDiceZero(self):
-        v1 = Necromancer()
-        h = Mage()
-        attack = True
-        lst = [1, 3, 2]
-        dice = v1.calculate_dice(h, attack, lst)
-        self.assertEqual(dice, 0)
-
-    def test_calculateDice(self):
-        v1 = Necromancer()
-        h = Mage()
-        attack = True
-        lst = [1, 5, 5]
-        dice = v1.calculate_dice(h, attack, lst)
-        self.assertEqual(dice, 2)
-
-    def test_calculateDiceEmptyList(self):
-        v1 = Goblin()
-        h = Mage()
-        attack = True
-        lst = []
-        dice = v1.calculate_dice(h, attack, lst)
-        self.assertEqual(dice, 0)
-
-    def test_calculateDiceDefending(self):
-        h = Ranger()
-        v = Goblin()
-        attack = False
-        lst = [1, 2, 4]
-        dice = h.calculate_dice(v, attack, lst)
-        self.assertEqual(dice, 1)
-
-    def test_calculateDiceHeroVHero(self):
-        h = Ranger()
-        h2 = Paladin()
-        attack = False
-        lst = [1, 2, 4]
-        dice = h.calculate_dice(h2, attack, lst)
-        self.assertEqual(dice, 1)
-
-
-
-    def testRaiseIfDead(self):
-        board = [[None for _ in range(5)] for _ in range(5)]
-        v1 = Necromancer()
-        v2 = Skeleton()
-        v2.temp_health = 0
-        fromm = Coord(0, 0)
-        board[0][0] = v1
-        to = Coord(1, 1)
-        board[1][1] = v2
-        v1.raise_dead(v2, fromm, to, board)
-        self.assertEqual(v2.temp_health, v2.health//2)
-
-    def testRaiseOutRange(self):  # if it's out of range
-        board = [[None for _ in range(6)] for _ in range(6)]
-        v1 = Necromancer()
-        v2 = Skeleton()
-        v2.temp_health = 0
-        fromm = Coord(0, 0)
-        board[0][0] = v1
-        to = Coord(1, 1)
-        board[4][4] = v2
-        v1.raise_dead(v2, fromm, to, board)
-        self.assertNotEquals(v2.temp_health, v2.health // 2)
-
-    def testRaiseDeadHero(self):   # this checks for hero being switched to villain
-        board = [[None for _ in range(6)] for _ in range(6)]
-        v1 = Necromancer()
-        v2 = Mage()
-        v2.temp_health = 0
-        fromm = Coord(0, 0)
-        board[0][0] = v1
-        to = Coord(1, 1)
-        board[4][4] = v2
-        v1.raise_dead(v2, fromm, to, board)
-        self.assertEqual(v2.player, Player.VILLAIN)
-
-
-    def test_warrior_dice(self):
-        g = Goblin()
-        w = Warrior()
-        attack = True
-        lst = [1, 5, 4]
-        gob = [5, 3, 2]
-        self.assertEqual(w.calculate_dice(g, attack, lst, gob), 2)
-
-    def test_warriorDiceGobNone(self):
-        g = Goblin()
-        w = Warrior()
-        attack = True
-        lst = [3, 5, 6]
-        gob = []
-        self.assertEqual(w.calculate_dice(g, attack, lst, gob), 2)
-
-    def test_warriorDiceNotGob(self):
-        n = Necromancer()
-        w = Warrior()
-        attack = True
-        lst = [2, 5]
-        gob = [5, 6, 2]
-        self.assertEqual(w.calculate_dice(n, attack, lst, gob), 1)
-
-    def test_warriorDiceFalseAttack(self):
-        g = Goblin()
-        w = Warrior()
-        attack = False
-        lst = [1, 4]
-        gob = []
-        self.assertEqual(w.calculate_dice(g, attack, lst, gob), 1)
-
-
-    def test_character_at(self):
-        board = [[None for _ in range(6)] for _ in range(6)]
-        v1 = Necromancer()
-        d1 = Dungeon(6, 6, [])
-        fromm = Coord(0, 0)
-        board[fromm.x][fromm.y] = v1
-        self.assertEqual(d1.character_at(fromm.x, fromm.y), v1)
-
-    def test_attack_damage(self):
-
-        v1 = Necromancer()
-        h1 = Mage()
-        d1 = Dungeon(6, 6, [])
-        fromm = Coord(0, 0)
-        to = Coord(1, 1)
-        d1.board[fromm.x][fromm.y] = v1
-        d1.board[1][1] = h1
-        initial_health = copy.deepcopy(h1.temp_health)
-        d1.attack(fromm, to)
-        self.assertLess(h1.temp_health, initial_health)
-
-    def test_set_char_at(self):
-        v1 = Necromancer()
-        d1 = Dungeon(6, 6, [])
-        d1.set_character_at(v1, 2, 2)
-        self.assertEqual(d1.board[2][2], v1)
-
-    def test_empty_generateVillains(self):  # testing if this function makes villain list not empty
-        d = Dungeon(6, 6, [])
-        d.generate_villains()
-        self.assertNotEqual(len(d.villains), 0)
-
-    def test_generateVillainsNec(self):  # testing that self.villains doesn't have 2 necromancers
-        d = Dungeon(12, 11, [])
-        d.generate_villains()
-        necro_count = d.villains.count(Necromancer())
-        self.assertEqual(necro_count, 1)
-
-    def test_generateVillainsGobCount(self):  # check if there are more goblins than necromancers
-        d = Dungeon(12, 11, [])
-        gob_count = d.villains.count(Goblin())
-        necro_count = d.villains.count(Necromancer())
-        self.assertGreater(gob_count, necro_count)
-
-    def test_move_fromNone(self):  # testing if move accurately makes from_coord none
-        d = Dungeon(12, 11, [])
-        d.set_character_at(Necromancer(), 0, 0)
-        from_c = Coord(0, 0)
-        to_c = Coord(1, 1)
-        d.move(from_c, to_c)
-        self.assertEqual(d.board[from_c.x][from_c.y], None)
-
-    def test_outRangeMove(self):  # testing if move is out of range
-        d = Dungeon(12, 11, [])
-        d.set_character_at(Necromancer(), 0, 0)
-        from_c = Coord(0, 0)
-        to_c = Coord(1, 20)
-        self.assertRaises(IndexError, d.board[to_c.x][to_c.y])
-
-    def test_place_heroesOdd(self):  # checking where warrior is for odd length
-        d = Dungeon(9, 8, [])
-        d.board = [[None for _ in range(9)] for _ in range(8)]
-        d.place_heroes()
-        x = len(d.board)-2
-        y = len(d.board) // 2  # len(d.board) // 2
-        self.assertEqual(d.board[x][y], Warrior())
-
-    def test_place_heroesEven(self):  # checking where warrior is for even length
-        d = Dungeon(4, 6, [])
-        d.board = [[None for _ in range(4)] for _ in range(6)]
-        d.place_heroes()
-        x = len(d.board)-2
-        y = (len(d.board)//2)-1
-        self.assertEqual(d.board[x][y], Warrior())
-
-    def test_Hero(self):
-        w = Warrior()
-        self.assertEqual(w.player, Player.HERO)
-
-    def test_wrongPlayer(self):
-        m = Mage()
-        self.assertNotEqual(m.player, Player.VILLAIN)
-
-    def test_combat_attrType(self):
-        r = Ranger()
-        self.assertEqual(r.combat, list(r.combat))
-
-    def test_is_valid_attack(self):
-        board = [[None for _ in range(5)] for _ in range(5)]
-        r = Ranger()
-        m = Mage()
-        fromm = Coord((0, 0))
-        e = r.is_valid_attack()
-        self.assertEqual()
-
-    def test_revive(self):
-        board = [[None for _ in range(5)] for _ in range(5)]
-        v1 = Paladin()
-        v2 = Mage()
-        v2.temp_health = 0
-        fromm = Coord(0, 0)
-        board[0][0] = v1
-        to = Coord(1, 1)
-        board[1][1] = v2
-        v1.revive(v2, fromm, to, board)
-        self.assertEqual(v2.temp_health, v2.health // 2)
-
-    def testReviveOutRange(self):
-        board = [[None for _ in range(6)] for _ in range(6)]
-        h1 = Paladin()
-        h2 = Ranger()
-        h2.temp_health = 0
-        fromm = Coord(0, 0)
-        board[0][0] = h1
-        to = Coord(1, 1)
-        board[4][4] = h2
-        h1.revive(h2, fromm, to, board)
-        self.assertNotEqual(h2.temp_health, h2.health // 2)
-
-    def testRaiseDeadHero(self):
-        board = [[None for _ in range(6)] for _ in range(6)]
-        h1 = Paladin()
-        v1 = Goblin()
-        v1.temp_health = 0
-        fromm = Coord(0, 0)
-        board[0][0] = v1
-        to = Coord(1, 1)
-        board[4][4] = v1
-        h1.revive(v1, fromm, to, board)
-        self.assertEqual(v1.player, Player.HERO)
-
-    def test_Ranger_damage(self):
-        r = Ranger()
-        s = Skeleton()
-        r.deal_damage(s, 4)
-        self.assertEqual(s.temp_health, s.health - 3)
-
-    def test_mage_damage(self):
-        m = Mage()
-        g = Goblin()
-        m.deal_damage(g, 1)
-        self.assertEqual(g.temp_health, g.health - 2)
-
-    def test_is_dungeon_clear(self):
-        d = Dungeon(8, 8, [Necromancer()])
-        self.assertEqual(d.is_dungeon_clear(), False)
-
-
-
-
-
-
-
-
-
+import unittest
+import copy
+import contextlib
+import io
+import os
+import random
+import tempfile
+import asyncio
+from collections import Counter
+from unittest import mock
+import numpy as np
+import character
+import dice
+from dice import GOBLIN_BONUS_DICE
+import snapshot
+from character import Character, Player
+from coord import Coord, board_coords, range_mask
+from creatures import Villain, Goblin, Skeleton, Necromancer, Player
+from creatures import Hero, Warrior, Mage, Paladin, Ranger
+from dungeon import Dungeon
+from simulation import Simulation, RandomAgent, GreedyAgent, Action, ActionType, END_TURN
+from tournament import run_tournament, split_chunks
+from odds import combat_odds, odds_table
+from compact_board import CompactBoard
+from zobrist import position_key
+from transposition import TranspositionTable, Replace
+from expectiminimax import ExpectiminimaxAgent, attack_outcomes
+from mcts import MCTSAgent, Search, reward, search_root
+from replay import ReplayWriter, ReplayReader, ReplayError, Event
+from rng import CounterRNG, philox
+from server import GameServer
+from batch import run_commands, run_files
+import bench_game
+import instrument
+import signal
+from profiler import SamplingProfiler
+from placement import FreeCells, PlacementError, spawn_cells
+from events import EventBus, UnitMoved, AttackResolved, DamageDealt, UnitDied, UnitRevived, TurnEnded, RoomCleared
+from game import Game
+from renderer import Renderer, cursor, scroll_region, HOME, CLEAR_SCREEN, CLEAR_BELOW, RESET_SCROLL_REGION, CELL, LABEL, \
+    PROMPT_ROWS
+
+
+class CharacterTest(unittest.TestCase):  # test character class
+
+    def test_Villain(self):  # this is going to test if the character is appropriate player
+        n = Necromancer()
+        self.assertEqual(n.player, Player.VILLAIN)
+
+    def test_wrongPlayer(self):
+        g = Goblin()  # goblin is a villain, therefore cannot be hero
+        self.assertNotEquals(g.player, Player.HERO)
+
+    def test_combat_attrType(self):
+        s = Skeleton()
+        self.assertEqual(s.combat, list(s.combat))  # combat attribute must be a list
+
+    def test_villain_combat(self):
+        n = Necromancer()
+        self.assertNotEqual(n.combat, [1, 4])  # testing for right attack and defense
+
+    def test_attackDefense(self):
+        m = Mage()
+        self.assertEqual(m.combat[0], m.combat[1])
+
+    def test_characterDeath(self):
+        s = Skeleton()
+        with self.assertRaises(character.CharacterDeath):
+            s.temp_health = -1
+
+    def test_combat_Int(self):  # check if integers in combat
+        g = Goblin()
+        self.assertIsInstance(g.combat[0], int)
+
+    def test_moveGreater(self):  # testing if move is in bounds
+        w = Warrior()
+        with self.assertRaises(ValueError):
+            w.move = 0
+
+
+    # test villain is_valid_move
+    def test_villain_wrongDirection(self):
+        ch = Villain()
+        board = [[None for _ in range(5)] for _ in range(5)]
+        fromm = Coord(0, 4)
+        board[0][4] = ch
+        to = Coord(1, 3)
+        valid = ch.is_valid_move(fromm, to, board)
+        self.assertFalse(valid)
+
+    def test_villain_Vertical(self):
+        ch = Villain()
+        board = [[None for _ in range(5)] for _ in range(5)]
+        fromm = Coord(0, 4)
+        board[0][4] = ch
+        to = Coord(0, 3)
+        valid = ch.is_valid_move(fromm, to, board)
+        self.assertTrue(valid)
+
+    def test_villain_Horizontal(self):
+        ch = Villain()
+        board = [[None for _ in range(5)] for _ in range(5)]
+        fromm = Coord(1, 0)
+        board[1][0] = ch
+        to = Coord(4, 0)
+        valid = ch.is_valid_move(fromm, to, board)
+        self.assertTrue(valid)
+
+
+    def test_villainWithBlockage(self):
+        s = Skeleton()
+        board = [[None for _ in range(5)] for _ in range(5)]
+        fromm = Coord(0, 4)
+        to = Coord(0, 3)
+        board[0][4] = s
+        board[0][3] = Goblin()
+        valid = s.is_valid_move(fromm, to, board)
+        self.assertFalse(valid)
+
+    def test_villainExceedMove(self):
+        n = Necromancer()
+        board = [[None for _ in range(5)] for _ in range(5)]
+        fromm = Coord(0, 0)
+        to = Coord(0, 4)
+        board[0][0] = n
+        valid = n.is_valid_move(fromm, to, board)
+        self.assertFalse(valid)
+
+    def testOutRangeFromTo(self):
+        ch = Villain()
+        board = [[None for _ in range(5)] for _ in range(5)]
+        fromm = Coord(0, 5)
+        to = Coord(1, 9)
+        valid = ch.is_valid_attack(fromm, to, board)
+        self.assertFalse(valid)
+
+
+    def testOutRangeFrom(self):
+        ch = Hero()
+        board = [[None for _ in range(5)] for _ in range(5)]
+        fromm = Coord(0, 9)
+        to = Coord(1, 3)
+        valid = ch.is_valid_attack(fromm, to, board)
+        self.assertFalse(valid)
+
+    def testInRange(self):
+        ch = Hero()
+        board = [[None for _ in range(5)] for _ in range(5)]
+        fromm = Coord(1, 3)
+        board[fromm.x][fromm.y] = Mage()
+        to = Coord(1, 4)
+        board[1][4] = Goblin()
+        valid = ch.is_valid_attack(fromm, to, board)
+        self.assertEqual(True, valid)
+
+    def test_calculateDiceZero(self):
+        v1 = Necromancer()
+        h = Mage()
+        attack = True
+        lst = [1, 3, 2]
+        dice = v1.calculate_dice(h, attack, lst)
+        self.assertEqual(dice, 0)
+
+    def test_calculateDice(self):
+        v1 = Necromancer()
+        h = Mage()
+        attack = True
+        lst = [1, 5, 5]
+        dice = v1.calculate_dice(h, attack, lst)
+        self.assertEqual(dice, 2)
+
+    def test_calculateDiceEmptyList(self):
+        v1 = Goblin()
+        h = Mage()
+        attack = True
+        lst = []
+        dice = v1.calculate_dice(h, attack, lst)
+        self.assertEqual(dice, 0)
+
+    def test_calculateDiceDefending(self):
+        h = Ranger()
+        v = Goblin()
+        attack = False
+        lst = [1, 2, 4]
+        dice = h.calculate_dice(v, attack, lst)
+        self.assertEqual(dice, 1)
+
+    def test_calculateDiceHeroVHero(self):
+        h = Ranger()
+        h2 = Paladin()
+        attack = False
+        lst = [1, 2, 4]
+        dice = h.calculate_dice(h2, attack, lst)
+        self.assertEqual(dice, 1)
+
+
+
+    def testRaiseIfDead(self):
+        board = [[None for _ in range(5)] for _ in range(5)]
+        v1 = Necromancer()
+        v2 = Skeleton()
+        v2.temp_health = 0
+        fromm = Coord(0, 0)
+        board[0][0] = v1
+        to = Coord(1, 1)
+        board[1][1] = v2
+        v1.raise_dead(v2, fromm, to, board)
+        self.assertEqual(v2.temp_health, v2.health//2)
+
+    def testRaiseOutRange(self):  # if it's out of range
+        board = [[None for _ in range(6)] for _ in range(6)]
+        v1 = Necromancer()
+        v2 = Skeleton()
+        v2.temp_health = 0
+        fromm = Coord(0, 0)
+        board[0][0] = v1
+        to = Coord(1, 1)
+        board[4][4] = v2
+        v1.raise_dead(v2, fromm, to, board)
+        self.assertNotEquals(v2.temp_health, v2.health // 2)
+
+    def testRaiseDeadHero(self):   # this checks for hero being switched to villain
+        board = [[None for _ in range(6)] for _ in range(6)]
+        v1 = Necromancer()
+        v2 = Mage()
+        v2.temp_health = 0
+        fromm = Coord(0, 0)
+        board[0][0] = v1
+        to = Coord(1, 1)
+        board[4][4] = v2
+        v1.raise_dead(v2, fromm, to, board)
+        self.assertEqual(v2.player, Player.VILLAIN)
+
+
+    def test_warrior_dice(self):
+        g = Goblin()
+        w = Warrior()
+        attack = True
+        lst = [1, 5, 4]
+        gob = [5, 3, 2]
+        self.assertEqual(w.calculate_dice(g, attack, lst, gob), 2)
+
+    def test_warriorDiceGobNone(self):
+        g = Goblin()
+        w = Warrior()
+        attack = True
+        lst = [3, 5, 6]
+        gob = []
+        self.assertEqual(w.calculate_dice(g, attack, lst, gob), 2)
+
+    def test_warriorDiceNotGob(self):
+        n = Necromancer()
+        w = Warrior()
+        attack = True
+        lst = [2, 5]
+        gob = [5, 6, 2]
+        self.assertEqual(w.calculate_dice(n, attack, lst, gob), 1)
+
+    def test_warriorDiceFalseAttack(self):
+        g = Goblin()
+        w = Warrior()
+        attack = False
+        lst = [1, 4]
+        gob = []
+        self.assertEqual(w.calculate_dice(g, attack, lst, gob), 1)
+
+
+    def test_character_at(self):
+        board = [[None for _ in range(6)] for _ in range(6)]
+        v1 = Necromancer()
+        d1 = Dungeon(6, 6, [])
+        fromm = Coord(0, 0)
+        board[fromm.x][fromm.y] = v1
+        self.assertEqual(d1.character_at(fromm.x, fromm.y), v1)
+
+    def test_attack_damage(self):
+
+        v1 = Necromancer()
+        h1 = Mage()
+        d1 = Dungeon(6, 6, [])
+        fromm = Coord(0, 0)
+        to = Coord(1, 1)
+        d1.board[fromm.x][fromm.y] = v1
+        d1.board[1][1] = h1
+        initial_health = copy.deepcopy(h1.temp_health)
+        d1.attack(fromm, to)
+        self.assertLess(h1.temp_health, initial_health)
+
+    def test_set_char_at(self):
+        v1 = Necromancer()
+        d1 = Dungeon(6, 6, [])
+        d1.set_character_at(v1, 2, 2)
+        self.assertEqual(d1.board[2][2], v1)
+
+    def test_empty_generateVillains(self):  # testing if this function makes villain list not empty
+        d = Dungeon(6, 6, [])
+        d.generate_villains()
+        self.assertNotEqual(len(d.villains), 0)
+
+    def test_generateVillainsNec(self):  # testing that self.villains doesn't have 2 necromancers
+        d = Dungeon(12, 11, [])
+        d.generate_villains()
+        necro_count = d.villains.count(Necromancer())
+        self.assertEqual(necro_count, 1)
+
+    def test_generateVillainsGobCount(self):  # check if there are more goblins than necromancers
+        d = Dungeon(12, 11, [])
+        gob_count = d.villains.count(Goblin())
+        necro_count = d.villains.count(Necromancer())
+        self.assertGreater(gob_count, necro_count)
+
+    def test_move_fromNone(self):  # testing if move accurately makes from_coord none
+        d = Dungeon(12, 11, [])
+        d.set_character_at(Necromancer(), 0, 0)
+        from_c = Coord(0, 0)
+        to_c = Coord(1, 1)
+        d.move(from_c, to_c)
+        self.assertEqual(d.board[from_c.x][from_c.y], None)
+
+    def test_outRangeMove(self):  # testing if move is out of range
+        d = Dungeon(12, 11, [])
+        d.set_character_at(Necromancer(), 0, 0)
+        from_c = Coord(0, 0)
+        to_c = Coord(1, 20)
+        self.assertRaises(IndexError, d.board[to_c.x][to_c.y])
+
+    def test_place_heroesOdd(self):  # checking where warrior is for odd length
+        d = Dungeon(9, 8, [])
+        d.board = [[None for _ in range(9)] for _ in range(8)]
+        d.place_heroes()
+        x = len(d.board)-2
+        y = len(d.board) // 2  # len(d.board) // 2
+        self.assertEqual(d.board[x][y], Warrior())
+
+    def test_place_heroesEven(self):  # checking where warrior is for even length
+        d = Dungeon(4, 6, [])
+        d.board = [[None for _ in range(4)] for _ in range(6)]
+        d.place_heroes()
+        x = len(d.board)-2
+        y = (len(d.board)//2)-1
+        self.assertEqual(d.board[x][y], Warrior())
+
+    def test_Hero(self):
+        w = Warrior()
+        self.assertEqual(w.player, Player.HERO)
+
+    def test_wrongPlayer(self):
+        m = Mage()
+        self.assertNotEqual(m.player, Player.VILLAIN)
+
+    def test_combat_attrType(self):
+        r = Ranger()
+        self.assertEqual(r.combat, list(r.combat))
+
+    def test_is_valid_attack(self):
+        board = [[None for _ in range(5)] for _ in range(5)]
+        r = Ranger()
+        m = Mage()
+        fromm = Coord((0, 0))
+        e = r.is_valid_attack()
+        self.assertEqual()
+
+    def test_revive(self):
+        board = [[None for _ in range(5)] for _ in range(5)]
+        v1 = Paladin()
+        v2 = Mage()
+        v2.temp_health = 0
+        fromm = Coord(0, 0)
+        board[0][0] = v1
+        to = Coord(1, 1)
+        board[1][1] = v2
+        v1.revive(v2, fromm, to, board)
+        self.assertEqual(v2.temp_health, v2.health // 2)
+
+    def testReviveOutRange(self):
+        board = [[None for _ in range(6)] for _ in range(6)]
+        h1 = Paladin()
+        h2 = Ranger()
+        h2.temp_health = 0
+        fromm = Coord(0, 0)
+        board[0][0] = h1
+        to = Coord(1, 1)
+        board[4][4] = h2
+        h1.revive(h2, fromm, to, board)
+        self.assertNotEqual(h2.temp_health, h2.health // 2)
+
+    def testRaiseDeadHero(self):
+        board = [[None for _ in range(6)] for _ in range(6)]
+        h1 = Paladin()
+        v1 = Goblin()
+        v1.temp_health = 0
+        fromm = Coord(0, 0)
+        board[0][0] = v1
+        to = Coord(1, 1)
+        board[4][4] = v1
+        h1.revive(v1, fromm, to, board)
+        self.assertEqual(v1.player, Player.HERO)
+
+    def test_Ranger_damage(self):
+        r = Ranger()
+        s = Skeleton()
+        r.deal_damage(s, 4)
+        self.assertEqual(s.temp_health, s.health - 3)
+
+    def test_mage_damage(self):
+        m = Mage()
+        g = Goblin()
+        m.deal_damage(g, 1)
+        self.assertEqual(g.temp_health, g.health - 2)
+
+    def test_is_dungeon_clear(self):
+        d = Dungeon(8, 8, [Necromancer()])
+        self.assertEqual(d.is_dungeon_clear(), False)
+
+
+
+
+
+
+
+
+
+
+
+class SimulationTest(unittest.TestCase):  # test headless games
+
+    def setUp(self):
+        random.seed(7)
+
+    def test_play_without_input(self):
+        d = Dungeon(8, 8, [])
+        sim = Simulation(d, GreedyAgent(), GreedyAgent(), max_turns=200)
+        sim.setup()
+        out = io.StringIO()
+        with mock.patch('builtins.input', side_effect=AssertionError), contextlib.redirect_stdout(out):
+            winner = sim.play()
+        self.assertEqual(out.getvalue(), '')
+        self.assertLessEqual(sim.turns, 200)
+        self.assertEqual(winner, sim.winner())
+
+    def test_heroes_win_when_clear(self):
+        g = Goblin()
+        d = Dungeon(6, 6, [g])
+        sim = Simulation(d, RandomAgent(), RandomAgent())
+        sim.setup()
+        g.temp_health = 0
+        self.assertTrue(sim.is_over())
+        self.assertEqual(sim.play(), Player.HERO)
+        self.assertEqual(sim.turns, 0)
+
+    def test_legal_actions(self):
+        g = Goblin()
+        d = Dungeon(6, 6, [g])
+        sim = Simulation(d, RandomAgent(), RandomAgent())
+        w = d.heroes[0]
+        d.set_character_at(w, 2, 2)
+        d.set_character_at(g, 2, 3)
+        sim.selected = Coord(2, 2)
+        actions = sim.legal_actions()
+        self.assertIs(actions[-1].kind, ActionType.END_TURN)
+        attacks = [a for a in actions if a.kind is ActionType.ATTACK]
+        self.assertEqual(len(attacks), 1)
+        for a in actions:
+            if a.kind is ActionType.MOVE:
+                self.assertIsNone(d.character_at(a.to_coord.x, a.to_coord.y))
+                self.assertTrue(a.to_coord.x == 2 or a.to_coord.y == 2)  # warrior moves orthogonally
+
+    def test_turn_limit(self):
+        d = Dungeon(8, 8, [])
+        sim = Simulation(d, RandomAgent(), RandomAgent(), max_turns=3)
+        sim.setup()
+        sim.play()
+        self.assertLessEqual(sim.turns, 3)
+
+
+class TournamentTest(unittest.TestCase):  # test the process pool runner
+
+    def test_repeatable(self):
+        a = run_tournament(12, seed=3, workers=1, chunk_size=4, height=5, width=5, max_turns=40)
+        b = run_tournament(12, seed=3, workers=1, chunk_size=4, height=5, width=5, max_turns=40)
+        self.assertEqual(a, b)
+        self.assertEqual(a.games, 12)
+        self.assertEqual(a.hero_wins + a.villain_wins + a.draws, 12)
+
+    def test_workers_match_inline(self):
+        inline = run_tournament(8, seed=5, workers=1, chunk_size=2, height=5, width=5, max_turns=40)
+        pooled = run_tournament(8, seed=5, workers=2, chunk_size=2, height=5, width=5, max_turns=40)
+        self.assertEqual(inline, pooled)
+
+    def test_serial_runs_leave_global_random_alone(self):
+        state = random.getstate()
+        a = run_tournament(4, seed=3, workers=1, chunk_size=2, height=5, width=5, max_turns=40)
+        self.assertEqual(random.getstate(), state)
+        random.seed(99)  # nor do they depend on it
+        self.assertEqual(run_tournament(4, seed=3, workers=1, chunk_size=2, height=5, width=5, max_turns=40), a)
+
+    def test_split_chunks(self):
+        self.assertEqual(split_chunks(10, 4), [(0, 4), (1, 4), (2, 2)])
+
+
+class DiceTest(unittest.TestCase):  # test the batched dice engine
+
+    def test_count_successes(self):
+        self.assertEqual(dice.count_successes([4, 5, 6], True), 2)
+        self.assertEqual(dice.count_successes([3, 4, 6], False), 2)
+
+    def test_roll_batch_shape(self):
+        rng = np.random.default_rng(1)
+        rolls = dice.roll_batch([1, 3, 2], 3, rng)
+        self.assertEqual(rolls.shape, (3, 3))
+        self.assertEqual(list((rolls > 0).sum(axis=1)), [1, 3, 2])
+        self.assertTrue(((rolls >= 0) & (rolls <= 6)).all())
+
+    def test_count_successes_batch(self):
+        rolls = np.array([[5, 6, 0], [4, 4, 1]])
+        self.assertEqual(list(dice.count_successes_batch(rolls, True)), [2, 0])
+        self.assertEqual(list(dice.count_successes_batch(rolls, False)), [2, 2])
+
+    def test_warrior_attack_dice(self):
+        w = Warrior()
+        self.assertEqual(w.attack_dice(Goblin()), 4)
+        self.assertEqual(w.attack_dice(Skeleton()), 2)
+
+    def test_damage_batch_mean(self):
+        rng = np.random.default_rng(2)
+        damage = dice.damage_batch(Warrior(), Goblin(), 200000, rng)
+        self.assertAlmostEqual(damage.mean(), 4 / 3 - 1, delta=0.02)  # 4 dice at 1/3 minus 2 dice at 1/2
+        self.assertLessEqual(damage.max(), 4)
+
+    def test_margin_buffer(self):
+        margins = dice.MarginBuffer(size=500)
+        w, g = Warrior(), Goblin()
+        drawn = [margins.draw(w.attack_dice(g), g.combat[1], CounterRNG(seed)) for seed in range(4) for _ in range(5000)]
+        self.assertAlmostEqual(sum(drawn) / len(drawn), 4 / 3 - 1, delta=0.05)
+        self.assertTrue(all(-2 <= m <= 4 for m in drawn))
+
+    def test_dungeons_attack_from_batches(self):
+        def margins(seed):
+            d = Dungeon(6, 6, [Goblin()], verbose=False, rng=CounterRNG(seed), batch_attacks=True)
+            d.set_character_at(d.heroes[0], 3, 3)
+            d.set_character_at(d.villains[0], 3, 4)
+            drawn = []
+            with mock.patch.object(Warrior, 'calculate_dice', side_effect=AssertionError):  # no dice rolled one by one
+                for _ in range(30):
+                    d.villains[0].temp_health = d.villains[0].health
+                    drawn.append(d.attack(Coord(3, 3), Coord(3, 4)))
+            return drawn
+        self.assertEqual(margins(1), margins(1))
+        self.assertNotEqual(margins(1), margins(2))
+
+    def test_batched_tournament_is_repeatable(self):
+        a = run_tournament(6, seed=3, workers=1, chunk_size=3, height=5, width=5, max_turns=40, batch_attacks=True)
+        b = run_tournament(6, seed=3, workers=1, chunk_size=3, height=5, width=5, max_turns=40, batch_attacks=True)
+        self.assertEqual(a, b)
+
+
+class OddsTest(unittest.TestCase):  # test exact combat tables
+
+    def test_pmf_sums_to_one(self):
+        for odds in odds_table().values():
+            self.assertEqual(sum(odds.damage), 1)
+            self.assertEqual(sum(odds.hits), 1)
+
+    def test_mage_bonus(self):
+        odds = combat_odds(Mage(), Goblin())
+        self.assertEqual(odds.damage[1], 0)  # a hit from a mage is never 1 damage
+        self.assertEqual(odds.dealt, (0, 2, 3))
+
+    def test_ranger_vs_skeleton(self):
+        odds = combat_odds(Ranger(), Skeleton())
+        self.assertEqual(odds.dealt, (0, 0, 1, 2))
+
+    def test_memoized(self):
+        self.assertIs(combat_odds(Warrior(), Goblin()), combat_odds(Warrior(), Goblin()))
+
+    def test_matches_dice(self):
+        rng = np.random.default_rng(4)
+        margins = np.maximum(dice.damage_batch(Warrior(), Goblin(), 200000, rng), 0)
+        odds = combat_odds(Warrior(), Goblin())
+        for k, p in enumerate(odds.hits):
+            self.assertAlmostEqual((margins == k).mean(), float(p), delta=0.01)
+
+    def test_sampled_attack(self):
+        random.seed(3)
+        d = Dungeon(6, 6, [Goblin()], verbose=False, sample_attacks=True)
+        w = d.heroes[0]
+        g = d.villains[0]
+        d.set_character_at(w, 2, 2)
+        d.set_character_at(g, 2, 3)
+        for _ in range(50):
+            g.temp_health = g.health
+            d.attack(Coord(2, 2), Coord(2, 3))
+            self.assertIn(g.health - g.temp_health, range(0, 4))
+
+
+class CompactBoardTest(unittest.TestCase):  # test the bytearray board backend
+
+    def setUp(self):
+        random.seed(11)
+        self.d = Dungeon(8, 8, [Goblin(), Skeleton(), Necromancer()], verbose=False)
+        self.d.place_heroes()
+        for v, (x, y) in zip(self.d.villains, [(1, 1), (1, 4), (3, 2)]):
+            self.d.set_character_at(v, x, y)
+        self.b = CompactBoard.from_dungeon(self.d)
+
+    def test_size(self):
+        self.assertLessEqual(len(self.b.snapshot()), 320)
+
+    def test_character_at(self):
+        for x in range(8):
+            for y in range(8):
+                slot = self.b.character_at(x, y)
+                self.assertEqual(slot is None, self.d.character_at(x, y) is None)
+
+    def test_moves_match_dungeon(self):
+        for fx in range(8):
+            for fy in range(8):
+                for tx in range(8):
+                    for ty in range(8):
+                        coords = [Coord(fx, fy), Coord(tx, ty)]
+                        self.assertEqual(bool(self.d.is_valid_move(coords)), self.b.is_valid_move(*coords))
+                        self.assertEqual(self.d.is_valid_attack(coords), self.b.is_valid_attack(*coords))
+
+    def test_snapshot_restore(self):
+        snap = self.b.snapshot()
+        self.b.move(Coord(1, 1), Coord(2, 1))
+        self.assertIsNone(self.b.character_at(1, 1))
+        self.assertNotEqual(self.b.snapshot(), snap)
+        self.b.restore(snap)
+        self.assertEqual(self.b.snapshot(), snap)
+        self.assertEqual(self.b.coord_of(4).x, 1)
+
+    def test_attack_and_win_checks(self):
+        self.b.set_character_at(0, 1, 2)  # warrior next to the goblin
+        self.assertFalse(self.b.is_dungeon_clear())
+        for _ in range(200):
+            self.b.attack(Coord(1, 2), Coord(1, 1))
+        self.assertEqual(self.b.temp_healths[4], 0)
+        for slot in (5, 6):
+            self.b.temp_healths[slot] = 0
+        self.assertTrue(self.b.is_dungeon_clear())
+        self.assertFalse(self.b.adventurer_defeat())
+
+
+class PositionIndexTest(unittest.TestCase):  # test the unit -> Coord index
+
+    def setUp(self):
+        self.d = Dungeon(8, 8, [Goblin(), Skeleton()], verbose=False)
+        self.d.place_heroes()
+
+    def assertIndexMatchesBoard(self):
+        found = {}
+        for x, row in enumerate(self.d.board):
+            for y, char in enumerate(row):
+                if char is not None:
+                    found[char] = (x, y)
+        self.assertEqual({c: (p.x, p.y) for c, p in self.d.positions.items()}, found)
+
+    def test_place_heroes(self):
+        w = self.d.heroes[0]
+        self.assertEqual((self.d.position_of(w).x, self.d.position_of(w).y), (6, 3))
+        self.assertIndexMatchesBoard()
+
+    def test_move(self):
+        g = self.d.villains[0]
+        self.d.set_character_at(g, 1, 1)
+        self.d.move(Coord(1, 1), Coord(1, 3))
+        self.assertEqual(self.d.position_of(g).y, 3)
+        self.assertIndexMatchesBoard()
+
+    def test_set_character_at_moves_and_overwrites(self):
+        g, s = self.d.villains
+        self.d.set_character_at(g, 1, 1)
+        self.d.set_character_at(g, 2, 2)
+        self.assertIsNone(self.d.character_at(1, 1))
+        self.d.set_character_at(s, 2, 2)
+        self.assertIsNone(self.d.position_of(g))
+        self.assertIndexMatchesBoard()
+
+    def test_generate_new_board(self):
+        for v in self.d.villains:
+            v.temp_health = 0
+        self.d.generate_new_board(6, 9)
+        self.assertEqual((self.d.height, self.d.width), (6, 9))
+        self.assertIndexMatchesBoard()
+        for h in self.d.heroes:
+            self.assertIsNotNone(self.d.position_of(h))
+
+
+class CoordTest(unittest.TestCase):  # test interned coordinates
+
+    def test_interned(self):
+        self.assertIs(Coord(3, 4), Coord(3, 4))
+        self.assertIs(board_coords(8, 8)[3][4], Coord(3, 4))
+
+    def test_hash_and_eq(self):
+        self.assertEqual(Coord(20, 1), Coord(20, 1))
+        self.assertEqual(len({Coord(1, 2), Coord(1, 2), Coord(2, 1)}), 2)
+        self.assertLess(Coord(1, 2), Coord(2, 0))
+
+    def test_immutable(self):
+        c = Coord(1, 2)
+        with self.assertRaises(AttributeError):
+            c.x = 5
+        with self.assertRaises(AttributeError):
+            c.z = 5
+
+    def test_copy_keeps_identity(self):
+        self.assertIs(copy.deepcopy(Coord(5, 6)), Coord(5, 6))
+        self.assertEqual(str(Coord(5, 6)), '(5, 6)')
+
+    def test_integer_like_arguments(self):
+        self.assertIs(Coord(np.int64(3), np.int8(4)), Coord(3, 4))
+        self.assertIs(Coord(True, False), Coord(1, 0))
+        self.assertIs(type(Coord(np.int64(20), 1)[0]), int)
+        with self.assertRaisesRegex(TypeError, 'float'):
+            Coord(1.0, 2)
+        with self.assertRaises(TypeError):
+            Coord('1', 2)
+
+    def test_board_coords_shape(self):
+        table = board_coords(4, 7)
+        self.assertEqual((len(table), len(table[0])), (4, 7))
+
+
+class StatBlockTest(unittest.TestCase):  # test slotted characters
+
+    def test_no_instance_dict(self):
+        for cls in (Goblin, Skeleton, Necromancer, Warrior, Mage, Paladin, Ranger):
+            self.assertFalse(hasattr(cls(), '__dict__'))
+
+    def test_class_stats(self):
+        self.assertEqual(Skeleton().combat, [2, 1])
+        self.assertEqual((Skeleton().health, Skeleton().move), (2, 2))
+        self.assertEqual(Warrior().temp_health, 7)
+        self.assertEqual((Mage().combat, Mage().range, Mage().move), ([2, 2], 3, 2))
+        self.assertTrue(Paladin().heal)
+
+    def test_public_setters_still_validate(self):
+        g = Goblin()
+        with self.assertRaises(TypeError):
+            g.temp_health = 1.5
+        with self.assertRaises(ValueError):
+            g.combat = [-1, 2]
+
+    def test_trusted_slots(self):
+        g = Goblin()
+        g._temp_health -= 2
+        self.assertEqual(g.temp_health, 1)
+
+
+class MoveGeneratorTest(unittest.TestCase):  # test legal move generation
+
+    def brute_force(self, d, start):
+        return {(x, y) for x in range(d.height) for y in range(d.width)
+                if d.is_valid_move([start, Coord(x, y)])}
+
+    def test_matches_is_valid_move(self):
+        random.seed(5)
+        for _ in range(30):
+            d = Dungeon(random.randint(4, 12), random.randint(4, 12), [], verbose=False)
+            d.place_heroes()
+            for v in d.villains:
+                d.set_character_at(v, random.randrange(d.height - 2), random.randrange(d.width))
+            for char, pos in list(d.positions.items()):
+                self.assertEqual(set(d.legal_moves(pos)), self.brute_force(d, pos), char)
+
+    def test_skeleton_blocked(self):
+        d = Dungeon(6, 6, [Skeleton(), Goblin()], verbose=False)
+        s, g = d.villains
+        d.set_character_at(s, 0, 0)
+        d.set_character_at(g, 0, 1)
+        self.assertEqual(set(d.legal_moves(Coord(0, 0))), {(1, 0), (2, 0)})
+
+    def test_all_moves_one_side(self):
+        d = Dungeon(6, 6, [Goblin()], verbose=False)
+        d.place_heroes()
+        d.set_character_at(d.villains[0], 1, 1)
+        froms = {f for f, _ in d.all_moves()}
+        self.assertEqual(froms, {d.position_of(h) for h in d.heroes})
+        self.assertEqual({f for f, _ in d.all_moves(Player.VILLAIN)}, {Coord(1, 1)})
+
+
+class TargetGeneratorTest(unittest.TestCase):  # test attack, heal and raise dead targets
+
+    def test_range_mask(self):
+        mask = range_mask(8, 8, 1)
+        self.assertEqual(set(mask[0][0]), {(0, 1), (1, 0)})
+        self.assertEqual(len(range_mask(12, 12, 3)[6][6]), 24)
+        self.assertIs(range_mask(8, 8, 3), range_mask(8, 8, 3))
+
+    def test_attacks_match_is_valid_attack(self):
+        random.seed(9)
+        for _ in range(30):
+            d = Dungeon(8, 8, [], verbose=False)
+            d.place_heroes()
+            for v in d.villains:
+                d.set_character_at(v, random.randrange(6), random.randrange(8))
+            for char, pos in list(d.positions.items()):
+                expected = {(x, y) for x in range(8) for y in range(8) if d.is_valid_attack([pos, Coord(x, y)])}
+                self.assertEqual(set(d.targets(pos)[0]), expected)
+
+    def test_heal_and_raise(self):
+        d = Dungeon(6, 6, [Necromancer()], verbose=False)
+        w, m, p, r = d.heroes
+        n = d.villains[0]
+        d.set_character_at(p, 3, 2)
+        d.set_character_at(w, 3, 3)
+        d.set_character_at(n, 1, 4)
+        w.temp_health = 0
+        self.assertEqual(d.targets(Coord(3, 2)), ([], [Coord(3, 3)], []))
+        self.assertEqual(d.targets(Coord(1, 4)), ([], [], [Coord(3, 3)]))
+        p.heal = False
+        self.assertEqual(d.targets(Coord(3, 2)), ([], [], []))
+
+
+class ZobristTest(unittest.TestCase):  # test incremental hashing and the transposition table
+
+    def test_incremental_matches_full(self):
+        random.seed(13)
+        for _ in range(5):
+            sim = Simulation(Dungeon(8, 8, [], verbose=False), GreedyAgent(), GreedyAgent(), max_turns=60)
+            sim.setup()
+            while not sim.is_over():
+                sim.play_turn()
+                self.assertEqual(sim.dungeon.zobrist, position_key(sim.dungeon.board, sim.dungeon.player))
+
+    def test_transposition(self):
+        d = Dungeon(6, 6, [Goblin(), Skeleton()], verbose=False)
+        g, s = d.villains
+        d.set_character_at(g, 0, 0)
+        d.set_character_at(s, 0, 5)
+        start = d.zobrist
+        d.move(Coord(0, 0), Coord(1, 0))
+        d.move(Coord(0, 5), Coord(1, 5))
+        first = d.zobrist
+        d.move(Coord(1, 0), Coord(0, 0))
+        d.move(Coord(1, 5), Coord(0, 5))
+        self.assertEqual(d.zobrist, start)
+        d.move(Coord(0, 5), Coord(1, 5))
+        d.move(Coord(0, 0), Coord(1, 0))
+        self.assertEqual(d.zobrist, first)
+
+    def test_side_and_heal(self):
+        d = Dungeon(6, 6, [Goblin()], verbose=False)
+        d.place_heroes()
+        start = d.zobrist
+        d.set_next_player()
+        self.assertNotEqual(d.zobrist, start)
+        d.set_next_player()
+        w, m, p, r = d.heroes
+        w.temp_health = 0
+        d.rehash()
+        dead = d.zobrist
+        d.revive(d.position_of(p), d.position_of(w))
+        self.assertEqual(w.temp_health, 3)
+        self.assertNotEqual(d.zobrist, dead)
+        self.assertEqual(d.zobrist, position_key(d.board, d.player))
+
+    def test_table_policies(self):
+        for policy in Replace:
+            tt = TranspositionTable(4, policy)
+            tt.store(1, 5, 1.0)
+            tt.store(5, 1, 2.0)  # same bucket, shallower
+            if policy is Replace.ALWAYS:
+                self.assertIsNone(tt.probe(1))
+            else:
+                self.assertEqual(tt.probe(1).value, 1.0)
+            if policy is Replace.DEPTH:
+                self.assertIsNone(tt.probe(5))
+            else:
+                self.assertEqual(tt.probe(5).value, 2.0)
+        self.assertEqual(TranspositionTable(5).capacity, 8)
+
+
+class ExpectiminimaxTest(unittest.TestCase):  # test the search agent
+
+    def test_compact_generators_match_dungeon(self):
+        random.seed(21)
+        for _ in range(20):
+            d = Dungeon(8, 8, [], verbose=False)
+            d.place_heroes()
+            for v in d.villains:
+                d.set_character_at(v, random.randrange(6), random.randrange(8))
+            board = CompactBoard.from_dungeon(d)
+            for char, pos in d.positions.items():
+                slot = board.character_at(pos.x, pos.y)
+                self.assertEqual(set(board.legal_moves(slot)), set(char.legal_moves(pos, d.board)))
+
+    def test_attack_outcomes(self):
+        for hp in range(1, 6):
+            outcomes = attack_outcomes(1, 5, hp)  # Warrior against Goblin
+            self.assertAlmostEqual(sum(chance for chance, _ in outcomes), 1.0)
+            self.assertTrue(all(0 <= dealt <= hp for _, dealt in outcomes))
+
+    def test_takes_the_kill(self):
+        d = Dungeon(8, 8, [Goblin(), Skeleton()], verbose=False)
+        d.place_heroes()
+        g, s = d.villains
+        d.set_character_at(g, 0, 0)
+        d.set_character_at(s, 3, 3)
+        s.temp_health = 1
+        agent = ExpectiminimaxAgent(depth=2, time_limit=None)
+        plan = agent.plan(d)
+        self.assertIs(plan.kind, ActionType.ATTACK)
+        self.assertEqual(plan.target, Coord(3, 3))  # the one hit Skeleton, not the full health Goblin
+        self.assertEqual(d.position_of(s), Coord(3, 3))  # planning leaves the Dungeon untouched
+
+    def test_plays_legal_games(self):
+        random.seed(4)
+        for villain in (True, False):
+            agent = ExpectiminimaxAgent(depth=2, time_limit=0.02)
+            hero, other = (GreedyAgent(), agent) if villain else (agent, GreedyAgent())
+            sim = Simulation(Dungeon(6, 6, [], verbose=False), hero, other, max_turns=40)
+            sim.setup()
+            sim.play()
+            self.assertTrue(sim.is_over())
+
+
+class MCTSTest(unittest.TestCase):  # test the tree search agent
+
+    def setUp(self):
+        random.seed(6)
+        self.d = Dungeon(6, 6, [Goblin(), Skeleton()], verbose=False)
+        self.d.place_heroes()
+        g, s = self.d.villains
+        self.d.set_character_at(g, 0, 1)
+        self.d.set_character_at(s, 1, 4)
+
+    def test_reward(self):
+        self.assertEqual(reward(self.d, Player.HERO), 0.5)
+        self.d.villains[0].temp_health = 0
+        self.assertGreater(reward(self.d, Player.HERO), 0.5)
+        self.d.villains[1].temp_health = 0
+        self.assertEqual(reward(self.d, Player.HERO), 1.0)
+        self.assertEqual(reward(self.d, Player.VILLAIN), 0.0)
+
+    def test_visits_add_up(self):
+        for batch in (1, 3):
+            search = Search(self.d, leaf_batch=batch)
+            self.assertEqual(search.run(iterations=12), 12)
+            search.close()
+            self.assertEqual(search.root.visits, 12 * batch)
+            self.assertEqual(sum(search.visit_counts().values()), 12 * batch)
+            self.assertEqual(self.d.position_of(self.d.villains[0]), Coord(0, 1))  # the root is never played on
+
+    def test_root_parallel_merge(self):
+        agent = MCTSAgent(workers=2, iterations=6, time_limit=None, seed=1)
+        try:
+            counts = agent.visit_counts(self.d)
+        finally:
+            agent.close()
+        self.assertEqual(sum(counts.values()), 12)
+
+    def test_search_leaves_global_random_alone(self):
+        self.d.rng = CounterRNG(1)
+        state = random.getstate()
+        search_root(self.d, seed=3, iterations=10)
+        MCTSAgent(iterations=4, time_limit=None, seed=5).visit_counts(self.d)
+        self.assertEqual(random.getstate(), state)
+
+    def test_search_leaves_the_game_dice_alone(self):
+        rolls = []
+        for iterations in (0, 20, 60):
+            self.d.rng = CounterRNG(7, 1)
+            search_root(self.d, seed=2, iterations=iterations, leaf_batch=2)
+            rolls.append(self.d.rng.roll(10))
+        self.assertEqual(rolls[0], rolls[1])
+        self.assertEqual(rolls[0], rolls[2])
+
+    def test_search_keeps_its_own_margin_batches(self):
+        self.d.margins = dice.MarginBuffer(size=64)
+        search_root(self.d, seed=2, iterations=20, leaf_batch=2)
+        self.assertEqual(self.d.margins.margins, {})
+
+    def test_clones_roll_their_own_dice(self):
+        search = Search(self.d, leaf_batch=3, seed=1)
+        sim = Simulation(self.d, GreedyAgent(), GreedyAgent())
+        first, second = search.clone(sim), search.clone(sim)
+        search.close()
+        rolls = [first.dungeon.rng.roll(20), second.dungeon.rng.roll(20), search.rng.roll(20)]
+        self.assertEqual(len({tuple(r) for r in rolls}), 3)
+
+    def test_plays_legal_games(self):
+        agent = MCTSAgent(iterations=8, time_limit=None, playout_turns=2)
+        sim = Simulation(self.d, agent, GreedyAgent(), max_turns=10)
+        sim.play()
+        self.assertTrue(sim.is_over())
+
+
+class UndoTest(unittest.TestCase):  # test Dungeon.apply and Dungeon.undo
+
+    @staticmethod
+    def state(d):
+        chars = d.heroes + d.villains
+        return ([[id(c) if c is not None else None for c in row] for row in d.board],
+                [(c.temp_health, c.player, getattr(c, 'heal', None), d.position_of(c)) for c in chars],
+                d.player, d.zobrist, dict(d.positions))
+
+    def test_rewind_whole_games(self):
+        random.seed(17)
+        for _ in range(5):
+            d = Dungeon(8, 8, [], verbose=False)
+            d.place_heroes()
+            d.place_villains()
+            start = self.state(d)
+            sim = Simulation(d, RandomAgent(), GreedyAgent(), max_turns=80, record=True)
+            sim.play()
+            self.assertEqual(d.zobrist, position_key(d.board, d.player))
+            sim.rewind()
+            self.assertEqual(self.state(d), start)
+
+    def test_single_actions(self):
+        d = Dungeon(6, 6, [Goblin(), Necromancer()], verbose=False)
+        w, m, p, r = d.heroes
+        g, n = d.villains
+        d.set_character_at(w, 3, 3)
+        d.set_character_at(g, 3, 4)
+        d.set_character_at(p, 4, 3)
+        d.set_character_at(n, 1, 4)
+        start = self.state(d)
+        record = d.apply(Action(ActionType.ATTACK, Coord(3, 3), Coord(3, 4)), margin=2)
+        self.assertEqual(g.temp_health, 1)
+        d.undo(record)
+        self.assertEqual(self.state(d), start)
+
+        w.temp_health = 0
+        d.rehash()
+        start = self.state(d)
+        for action, changes in ((Action(ActionType.HEAL, Coord(4, 3), Coord(3, 3)), True),
+                                (Action(ActionType.RAISE_DEAD, Coord(1, 4), Coord(3, 3)), True),
+                                (Action(ActionType.MOVE, Coord(3, 4), Coord(2, 4)), True),
+                                (Action(ActionType.MOVE, Coord(3, 4), Coord(5, 5)), False),  # rejected
+                                (END_TURN, True)):
+            record = d.apply(action)
+            self.assertEqual(self.state(d) != start, changes)
+            d.undo(record)
+            self.assertEqual(self.state(d), start)
+
+
+class RendererTest(unittest.TestCase):  # test the diff based terminal renderer
+
+    def setUp(self):
+        self.d = Dungeon(6, 6, [Goblin()], verbose=False)
+        self.d.place_heroes()
+        self.d.set_character_at(self.d.villains[0], 1, 1)
+        self.out = io.StringIO()
+        self.renderer = Renderer(self.out, lines=40)
+
+    def draw(self):
+        self.out.seek(0)
+        self.out.truncate()
+        self.renderer.draw(self.d)
+        return self.out.getvalue()
+
+    def test_first_frame_paints_everything(self):
+        text = self.draw()
+        self.assertTrue(text.startswith(HOME + CLEAR_SCREEN))
+        for name in ('Goblin', 'Warrior', 'Ranger', "HERO's turn", '|Gob|'):
+            self.assertIn(name, text)
+
+    def test_only_changes_are_written(self):
+        self.draw()
+        self.assertEqual(self.draw(), cursor(len(Renderer.frame(self.d)), 0) + CLEAR_BELOW)
+        self.d.move(Coord(1, 1), Coord(2, 1))
+        text = self.draw()
+        self.assertNotIn(CLEAR_SCREEN, text)
+        self.assertIn(cursor(5, LABEL + CELL) + '|___|', text)  # the Goblin's old cell, board row 1
+        self.assertIn(cursor(6, LABEL + CELL) + '|Gob|', text)
+        self.assertIn('LOC -> (2, 1)', text)
+        self.assertNotIn('Warrior', text)
+
+    def test_single_write(self):
+        stream = mock.Mock()
+        Renderer(stream).draw(self.d)
+        stream.write.assert_called_once()
+
+    def test_prompts_scroll_below_the_frame(self):
+        height = len(Renderer.frame(self.d))
+        self.assertTrue(self.draw().startswith(HOME + CLEAR_SCREEN + scroll_region(height, 40)))
+        self.assertNotIn(scroll_region(height, 40), self.draw())
+        self.renderer.lines = 30  # resized, the old frame may have moved
+        self.assertTrue(self.draw().startswith(HOME + CLEAR_SCREEN + scroll_region(height, 30)))
+        self.renderer.close()
+        self.assertTrue(self.out.getvalue().endswith(RESET_SCROLL_REGION + cursor(29, 0) + '\n'))
+
+    def test_tall_frames_are_repainted(self):
+        self.renderer.lines = len(Renderer.frame(self.d)) + PROMPT_ROWS - 1
+        for _ in range(2):
+            text = self.draw()
+            self.assertTrue(text.startswith(HOME + CLEAR_SCREEN))
+            self.assertIn('Ranger', text)
+            self.assertNotRegex(text, r'\x1b\[\d+;\d+[Hr]')  # no cursor addressing or scroll region
+
+
+class SnapshotTest(unittest.TestCase):  # test the binary state format
+
+    def setUp(self):
+        random.seed(23)
+        self.d = Dungeon(8, 7, [], verbose=False)
+        sim = Simulation(self.d, GreedyAgent(), GreedyAgent(), max_turns=9)
+        sim.setup()
+        sim.play()
+        self.d.heroes[2].heal = False
+        self.d.rehash()
+
+    def test_round_trip(self):
+        data = snapshot.encode(self.d, rooms_cleared=3, moves=1, atk=1)
+        self.assertEqual(len(data), snapshot.SIZE)
+        game = snapshot.decode(data).to_game()
+        d = game.dungeon
+        self.assertEqual((game.rooms_cleared, game.moves, game.atk), (3, 1, 1))
+        self.assertEqual((d.height, d.width, d.player), (8, 7, self.d.player))
+        self.assertEqual(d.zobrist, self.d.zobrist)
+        self.assertFalse(d.heroes[2].heal)
+        for old, new in zip(self.d.heroes + self.d.villains, d.heroes + d.villains):
+            self.assertIs(type(new), type(old))
+            self.assertEqual((new.combat, new.temp_health, new.player), (old.combat, old.temp_health, old.player))
+            self.assertEqual(d.position_of(new), self.d.position_of(old))
+        self.assertEqual(snapshot.encode_game(game), data)
+
+    def test_zero_copy_bulk(self):
+        board = CompactBoard.from_dungeon(self.d)
+        out = bytearray(snapshot.SIZE * 3)
+        for i in range(3):
+            snapshot.encode_board(board, rooms_cleared=i, out=out, offset=i * snapshot.SIZE)
+        views = list(snapshot.iter_snapshots(out))
+        self.assertEqual([v.rooms_cleared for v in views], [0, 1, 2])
+        self.assertEqual(views[1].board, board)
+        out[snapshot.HEADER.size + 3] = 0  # the board of the first record now has no units
+        self.assertEqual(views[0].board.units, 0)
+
+    def test_rejects_bad_input(self):
+        data = bytearray(snapshot.encode(self.d))
+        with self.assertRaises(snapshot.SnapshotError):
+            snapshot.decode(data[:-1])
+        data[4] = snapshot.VERSION + 1
+        with self.assertRaises(snapshot.SnapshotError):
+            snapshot.decode(data)
+        data[4] = snapshot.VERSION
+        data[snapshot.HEADER.size] = 40  # height
+        with self.assertRaises(snapshot.SnapshotError):
+            snapshot.decode(data).board
+
+
+class ReplayTest(unittest.TestCase):  # test the replay log
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, 'game.log')
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_replay_every_turn(self):
+        random.seed(8)
+        d = Dungeon(8, 8, [], verbose=False)
+        sim = Simulation(d, GreedyAgent(), GreedyAgent(), max_turns=60)
+        sim.setup()
+        states = {}
+        with ReplayWriter(self.path, d, every=25) as log:
+            states[0] = snapshot.encode(d)
+            while not sim.is_over():
+                sim.play_turn()
+                states[sim.turns] = snapshot.encode(d)
+        self.assertIsNone(d.replay_log)
+        with ReplayReader(self.path) as reader:
+            self.assertGreater(len(reader.snapshots), 2)
+            kinds = Counter(event for _, event, _ in reader.events())
+            self.assertEqual(kinds[Event.SELECT], sim.turns)
+            self.assertEqual(kinds[Event.END_TURN], sim.turns)
+            self.assertEqual(kinds[Event.SEED], 0)
+            state = random.getstate()
+            for turn, encoded in states.items():
+                self.assertEqual(snapshot.encode(reader.replay(turn).dungeon), encoded)
+            self.assertEqual(random.getstate(), state)  # replays never need the dice
+            self.assertEqual(snapshot.encode(reader.replay().dungeon), states[sim.turns])
+
+    def test_copies_do_not_log(self):
+        d = Dungeon(6, 6, [Goblin()], verbose=False)
+        d.place_heroes()
+        with ReplayWriter(self.path, d):
+            self.assertIsNone(copy.deepcopy(d).replay_log)
+            self.assertIs(d.replay_log.dungeon, d)
+
+    def test_rejects_other_files(self):
+        with open(self.path, 'wb') as f:
+            f.write(b'not a log at all')
+        open(self.path + '.idx', 'wb').close()
+        with self.assertRaises(ReplayError):
+            ReplayReader(self.path)
+
+
+class CounterRNGTest(unittest.TestCase):  # test the counter based RNG service
+
+    def test_known_answers(self):
+        # Random123 known answer vectors for philox4x32_10
+        self.assertEqual(philox((0, 0, 0, 0), (0, 0)), (0x6627e8d5, 0xe169c58d, 0xbc57ac4c, 0x9b00dbd8))
+        self.assertEqual(philox((0xffffffff,) * 4, (0xffffffff,) * 2), (0x408f276d, 0x41c83b0e, 0xa20bc7c6, 0x6d5451fd))
+
+    def test_streams(self):
+        a = CounterRNG(42, 1)
+        b = CounterRNG(42, 1)
+        self.assertEqual(a.roll(100), b.roll(100))
+        self.assertEqual([a.randint(1, 10) for _ in range(20)], [b.randint(1, 10) for _ in range(20)])
+        self.assertNotEqual(CounterRNG(42, 2).roll(100), CounterRNG(42, 1).roll(100))
+        rolls = a.roll(6000)
+        self.assertEqual(set(rolls), {1, 2, 3, 4, 5, 6})
+        self.assertTrue(all(800 < rolls.count(face) < 1200 for face in range(1, 7)))
+        self.assertTrue(all(0 <= a.random() < 1 for _ in range(100)))
+
+    def test_games_reproduce_from_seed_and_stream(self):
+        def play(stream):
+            d = Dungeon(8, 8, [], verbose=False, rng=CounterRNG(9, stream))
+            sim = Simulation(d, GreedyAgent(random.Random(1)), GreedyAgent(random.Random(2)), max_turns=40)
+            sim.setup()
+            random.seed(stream * 1000)  # the global random module must not matter
+            sim.play()
+            return snapshot.encode(d)
+        self.assertEqual(play(3), play(3))
+        self.assertNotEqual(play(3), play(4))
+
+    def test_dice_come_from_the_service(self):
+        w = Warrior()
+        g = Goblin()
+        rolls = CounterRNG(5).roll(GOBLIN_BONUS_DICE + w.combat[0])  # the bonus dice are rolled first
+        self.assertEqual(w.calculate_dice(g, True, rng=CounterRNG(5)), dice.count_successes(rolls, True))
+        rolls = CounterRNG(6).roll(g.combat[1])
+        self.assertEqual(g.calculate_dice(w, False, rng=CounterRNG(6)), dice.count_successes(rolls, False))
+
+
+class ServerTest(unittest.TestCase):  # test the asyncio game server
+
+    @staticmethod
+    async def command(client, line):
+        reader, writer = client
+        writer.write(line.encode() + b'\n')
+        await writer.drain()
+        lines = []
+        while True:
+            lines.append((await reader.readline()).decode().rstrip('\n'))
+            if lines[-1].startswith(('ok', 'err')):
+                return lines
+
+    def run_server(self, script):
+        async def main():
+            server = GameServer(seed=3)
+            port = await server.start()
+            try:
+                await script(server, port)
+            finally:
+                await server.close()
+        asyncio.run(main())
+
+    def test_session(self):
+        async def script(server, port):
+            client = await asyncio.open_connection('127.0.0.1', port)
+            self.assertEqual(await self.command(client, 'state'), ['err no match'])
+            reply = await self.command(client, 'new')
+            self.assertEqual(reply[0].split()[:4], ['ok', '0', 'turn', 'HERO'])
+            board = await self.command(client, 'board')
+            self.assertEqual(len(board), 9)
+            self.assertEqual(board[6].split()[3:5], ['War7', 'Pal6'])
+            self.assertEqual(await self.command(client, 'select 6 3'), ['ok Warrior'])
+            self.assertEqual(await self.command(client, 'select 6 4'), ['err already selected'])
+            self.assertEqual(await self.command(client, 'move 0 0'), ['err cannot move there'])
+            self.assertEqual(await self.command(client, 'fly 0 0'), ['err unknown command fly'])
+            self.assertEqual(await self.command(client, 'attack 9 9'), ['err off the board'])
+            self.assertEqual(await self.command(client, 'end turn'), ['ok end VILLAIN'])
+            self.assertEqual(await self.command(client, 'select 6 3'), ['err cannot select that'])
+            self.assertEqual((await self.command(client, 'state'))[0].split()[2:5], ['turn', 'VILLAIN', '1'])
+            self.assertEqual(await self.command(client, 'new 20 20'), ['err board must be 4 to 12 squares a side'])
+            self.assertEqual(await self.command(client, 'quit'), ['ok bye'])
+            self.assertEqual(await client[0].read(), b'')
+            self.assertEqual(server.matches, {})
+        self.run_server(script)
+
+    def test_moves_follow_the_rules(self):
+        async def script(server, port):
+            client = await asyncio.open_connection('127.0.0.1', port)
+            await self.command(client, 'new')
+            sim = server.matches[0].sim
+            start = Coord(6, 3)
+            to = next(sim.dungeon.legal_moves(start))
+            await self.command(client, 'select 6 3')
+            self.assertEqual(await self.command(client, f'move {to.x} {to.y}'), [f'ok move {to.x} {to.y}'])
+            self.assertIsInstance(sim.dungeon.character_at(to.x, to.y), Warrior)
+            self.assertEqual(sim.moves, 1)
+        self.run_server(script)
+
+    def test_two_players(self):
+        async def script(server, port):
+            hero = await asyncio.open_connection('127.0.0.1', port)
+            villain = await asyncio.open_connection('127.0.0.1', port)
+            await self.command(hero, 'new')
+            self.assertEqual((await self.command(villain, 'join 0'))[0].split()[-1], 'VILLAIN')
+            self.assertEqual(await self.command(villain, 'join 0'), ['err match is full'])
+            self.assertEqual(await self.command(villain, 'end'), ['err not your turn'])
+            self.assertEqual(await self.command(hero, 'end'), ['* joined VILLAIN', 'ok end VILLAIN'])
+            self.assertEqual(await self.command(villain, 'end'), ['* end VILLAIN', 'ok end HERO'])
+            self.assertEqual(await self.command(hero, 'end'), ['* end HERO', 'ok end VILLAIN'])
+        self.run_server(script)
+
+    def test_concurrent_matches(self):
+        async def script(server, port):
+            clients = [await asyncio.open_connection('127.0.0.1', port) for _ in range(50)]
+            replies = await asyncio.gather(*[self.command(client, 'new') for client in clients])
+            self.assertEqual(sorted(int(reply[0].split()[1]) for reply in replies), list(range(50)))
+            # every match rolls from its own stream, so their villains differ
+            self.assertGreater(len({reply[0].split()[-1] for reply in replies}), 1)
+            await asyncio.gather(*[self.command(client, 'end') for client in clients])
+            self.assertTrue(all(match.sim.turns == 1 for match in server.matches.values()))
+        self.run_server(script)
+
+
+class ScriptTest(unittest.TestCase):  # test playing Game from command files
+
+    def expected(self, *steps):
+        d = Dungeon(8, 8, [], verbose=False, rng=CounterRNG(0))
+        d.place_heroes()
+        d.place_villains()
+        for step in steps:
+            step(d)
+        return d.zobrist
+
+    def test_commands_replace_input(self):
+        commands = ['6 3', 'move', '5 3', 'q', 'end turn']
+        with mock.patch('builtins.input', side_effect=AssertionError), \
+                contextlib.redirect_stdout(io.StringIO()) as out:
+            result = run_commands(commands)
+        self.assertEqual(out.getvalue(), '')
+        self.assertIsNone(result.error)
+        self.assertEqual(result.zobrist, self.expected(lambda d: d.move(Coord(6, 3), Coord(5, 3)),
+                                                       lambda d: d.set_next_player()))
+
+    def test_game_reads_commands(self):
+        game = Game(Dungeon(8, 8, [], verbose=False), iter(['6 3', 'attack', '0 0', 'end turn']), verbose=False)
+        game.setup()
+        game.play()  # returns once the commands run out
+        self.assertEqual(game.dungeon.player, Player.VILLAIN)
+        self.assertEqual(game.atk, 0)
+
+    def test_errors_are_reported(self):
+        result = run_commands(['6 3', 'move', 'five three', 'q', 'end turn', 'nowhere'])
+        self.assertTrue(result.error.startswith('ValueError'))
+        self.assertEqual(result.zobrist, self.expected(lambda d: d.set_next_player()))
+
+    def test_files_in_parallel(self):
+        with tempfile.TemporaryDirectory() as folder:
+            paths = []
+            for i, commands in enumerate([['6 3', 'move', '5 3', 'q', 'end turn'], ['7 3', 'end turn'], ['x']]):
+                paths.append(os.path.join(folder, f'{i}.txt'))
+                with open(paths[-1], 'w') as f:
+                    f.write('\n'.join(commands) + '\n')
+            serial = list(run_files(paths, workers=1))
+            self.assertEqual(list(run_files(paths, workers=2, chunk_size=1)), serial)
+        self.assertEqual([result.path for result in serial], paths)
+        self.assertEqual([result.error is None for result in serial], [True, True, False])
+        self.assertEqual(serial[1].zobrist, self.expected(lambda d: d.set_next_player()))
+
+
+class BenchmarkTest(unittest.TestCase):  # test the benchmark suite
+
+    def test_build(self):
+        d = bench_game.build(5, 12)
+        self.assertEqual(len(d.positions), 16)
+        self.assertTrue(d.targets(d.position_of(d.heroes[0]))[0])  # there is always an attack
+        self.assertIsNone(bench_game.build(4, 9))
+
+    def test_run(self):
+        results = bench_game.run([4, 12], [1, 9], budget=0.0001, rounds=1)
+        names = set(bench_game.UNIT_BENCHMARKS) | set(bench_game.SIZE_BENCHMARKS)
+        self.assertEqual({case.split('/')[0] for case in results}, names)
+        self.assertIn('dungeon.attack/12x12/9', results)
+        self.assertNotIn('dungeon.attack/4x4/9', results)  # 9 villains don't fit above the heroes
+        self.assertIn('simulation.game/4x4', results)
+        self.assertTrue(all(seconds > 0 for seconds in results.values()))
+
+    def test_compare(self):
+        baseline = {'a/4x4/1': 1.0, 'a/4x4/2': 1.0, 'b/4x4/1': 2.0, 'c/4x4': 1.0}
+        current = {'a/4x4/1': 1.1, 'a/4x4/2': 1.1, 'b/4x4/1': 3.0, 'd/4x4': 5.0}
+        self.assertEqual(bench_game.compare(baseline, current, 0.25), [('b', 1.5, 1)])
+        self.assertEqual(bench_game.compare(baseline, current, 0.5), [])
+        slower = {case: seconds * 2 for case, seconds in baseline.items()}
+        self.assertEqual(len(bench_game.compare(baseline, slower)), 3)
+        self.assertEqual(bench_game.compare(baseline, slower, normalize=True), [])
+
+
+class InstrumentTest(unittest.TestCase):  # test the opt-in hot path counters
+
+    def tearDown(self):
+        instrument.disable()
+        instrument.reset()
+
+    def test_buckets(self):
+        for ns in list(range(100)) + [1000, 1023, 1024, 12345, 10 ** 9, 2 ** 40 + 1]:
+            index = instrument.bucket(ns)
+            self.assertLessEqual(ns, instrument.bucket_limit(index))
+            if index:
+                self.assertLess(instrument.bucket_limit(index - 1), ns)
+
+    def test_disabled_leaves_the_code_alone(self):
+        attack = Dungeon.attack
+        dice = Warrior.calculate_dice
+        instrument.enable()
+        self.assertIsNot(Dungeon.attack, attack)
+        instrument.disable()
+        self.assertIs(Dungeon.attack, attack)
+        self.assertIs(Warrior.calculate_dice, dice)
+        self.assertFalse(instrument.enabled())
+
+    def test_counts(self):
+        instrument.enable()
+        d = Dungeon(8, 8, [Goblin()], verbose=False, rng=CounterRNG(1))
+        d.set_character_at(d.villains[0], 5, 3)
+        d.place_heroes()
+        d.attack(Coord(6, 3), Coord(5, 3))
+        d.attack(Coord(0, 0), Coord(5, 3))  # rejected, no dice rolled
+        sim = Simulation(d, GreedyAgent(random.Random(1)), GreedyAgent(random.Random(2)), max_turns=4)
+        sim.play()
+        metrics = instrument.metrics
+        self.assertGreaterEqual(metrics['dungeon.attack'].calls, 2)
+        self.assertEqual(metrics['dungeon.is_valid_attack'].calls, metrics['dungeon.attack'].calls)
+        # one roll per side of every attack made, Warrior.calculate_dice calling super() counts once
+        self.assertEqual(metrics['character.calculate_dice'].calls, 2 * (metrics['dungeon.attack'].calls - 1))
+        self.assertEqual(metrics['agent.select'].calls, 4)
+        self.assertGreater(metrics['agent.act'].calls, 0)
+        attack = metrics['dungeon.attack']
+        self.assertLessEqual(attack.percentile(0.5), attack.max)
+        self.assertEqual(sum(attack.buckets), attack.calls)
+        report = instrument.report()
+        self.assertIn('dungeon.attack', report)
+        self.assertNotIn('render', report)
+        instrument.reset()
+        self.assertEqual(metrics['dungeon.attack'].calls, 0)
+
+
+class ProfilerTest(unittest.TestCase):  # test the sampling profiler
+
+    def test_phases(self):
+        profiler = SamplingProfiler()
+        attack = Dungeon.attack.__code__
+        dice = Character.calculate_dice.__code__
+        place = Dungeon.place_villains.__code__
+        play = Simulation.play.__code__
+        profiler.samples[(dice, attack, play)] = 3  # innermost first
+        profiler.samples[(place, play)] = 2
+        profiler.samples[(play,)] = 1
+        self.assertEqual(profiler.phases(), Counter({'attack_resolution': 3, 'villain_setup': 2, 'other': 1}))
+        self.assertEqual(profiler.collapsed(), [
+            'attack_resolution;simulation.Simulation.play;dungeon.Dungeon.attack;character.Character.calculate_dice 3',
+            'other;simulation.Simulation.play 1',
+            'villain_setup;simulation.Simulation.play;dungeon.Dungeon.place_villains 2'])
+
+    @unittest.skipUnless(hasattr(signal, 'setitimer'), 'needs ITIMER_PROF')
+    def test_sampling(self):
+        previous = signal.getsignal(signal.SIGPROF)
+        with SamplingProfiler(0.0005) as profiler:
+            for seed in range(200):
+                sim = Simulation(Dungeon(8, 8, [], verbose=False, rng=CounterRNG(seed)), GreedyAgent(), GreedyAgent())
+                sim.setup()
+                sim.play()
+                if sum(profiler.samples.values()) >= 20:
+                    break
+        self.assertIs(signal.getsignal(signal.SIGPROF), previous)
+        self.assertGreaterEqual(sum(profiler.samples.values()), 20)
+        for line in profiler.collapsed():
+            stack, count = line.rsplit(' ', 1)
+            self.assertIn(stack.split(';')[0], {'select', 'move_validation', 'attack_resolution', 'villain_setup',
+                                                'rendering', 'decision', 'other'})
+            self.assertGreater(int(count), 0)
+
+
+class EventTest(unittest.TestCase):  # test the game event bus
+
+    def setUp(self):
+        self.d = Dungeon(6, 6, [Goblin(), Skeleton()], verbose=False)
+        self.w, self.m, self.p, self.r = self.d.heroes
+        self.g, self.s = self.d.villains
+        for char, x, y in ((self.w, 3, 3), (self.g, 3, 4), (self.s, 2, 3), (self.p, 4, 3), (self.m, 4, 4)):
+            self.d.set_character_at(char, x, y)
+        self.log = []
+        self.d.events.subscribe_all(self.log.append)
+
+    def test_rules_emit_events(self):
+        d = self.d
+        w_at, g_at, s_at = Coord(3, 3), Coord(3, 4), Coord(2, 3)
+        d.attack(w_at, g_at, 0)
+        self.assertEqual(self.log, [AttackResolved(self.w, self.g, w_at, g_at, 0, 0)])
+        self.log.clear()
+        d.attack(w_at, g_at, 100)
+        self.assertEqual(self.log, [AttackResolved(self.w, self.g, w_at, g_at, 100, self.g.health),
+                                    DamageDealt(self.w, self.g, g_at, self.g.health),
+                                    UnitDied(self.g, g_at, self.w)])
+        self.log.clear()
+        d.attack(w_at, s_at, 100)
+        self.assertEqual(self.log[-2:], [UnitDied(self.s, s_at, self.w), RoomCleared()])
+        self.log.clear()
+        to = next(d.legal_moves(w_at))
+        d.move(w_at, to)
+        d.set_next_player()
+        self.assertEqual(self.log, [UnitMoved(self.w, w_at, to), TurnEnded(Player.HERO)])
+        self.log.clear()
+        self.m.temp_health = 0
+        d.revive(Coord(4, 3), Coord(4, 4))
+        self.assertEqual(self.log, [UnitRevived(self.m, Coord(4, 4), self.p)])
+
+    def test_unsubscribed_events_are_never_built(self):
+        self.d.events.unsubscribe_all(self.log.append)
+        self.assertEqual(self.d.events.handlers, {})
+        with mock.patch('dungeon.AttackResolved', side_effect=AssertionError), \
+                mock.patch('dungeon.UnitMoved', side_effect=AssertionError):
+            self.d.attack(Coord(3, 3), Coord(3, 4), 100)
+            self.d.move(Coord(3, 3), next(self.d.legal_moves(Coord(3, 3))))
+        self.assertEqual(self.log, [])
+
+    def test_bus(self):
+        bus = EventBus()
+        seen = []
+        bus.subscribe(TurnEnded, seen.append)
+        bus.subscribe(TurnEnded, seen.append)  # once is enough
+        bus.emit(TurnEnded(Player.HERO))
+        bus.emit(RoomCleared())
+        self.assertEqual(seen, [TurnEnded(Player.HERO)])
+        bus.unsubscribe(TurnEnded, seen.append)
+        bus.emit(TurnEnded(Player.VILLAIN))
+        self.assertEqual(len(seen), 1)
+
+    def test_verbose_prints_through_the_bus(self):
+        self.d.verbose = True
+        with contextlib.redirect_stdout(io.StringIO()) as out:
+            self.d.attack(Coord(3, 3), Coord(3, 4), 0)
+            self.d.attack(Coord(3, 3), Coord(3, 4), 1)
+        self.assertEqual(out.getvalue().splitlines(), [f'{self.g} to no damage from {self.w}',
+                                                       f'{self.g} was dealt 1 damage'])
+        self.d.verbose = False
+        with contextlib.redirect_stdout(io.StringIO()) as out:
+            self.d.attack(Coord(3, 3), Coord(3, 4), 1)
+        self.assertEqual(out.getvalue(), '')
+
+    def test_copies_have_no_observers(self):
+        copied = copy.deepcopy(self.d)
+        copied.attack(Coord(3, 3), Coord(3, 4), 100)
+        self.assertEqual(self.log, [])
+        self.assertEqual(copied.events.handlers, {})
+
+    def test_game_counts_cleared_rooms(self):
+        game = Game(self.d, verbose=False)
+        self.d.attack(Coord(3, 3), Coord(3, 4), 100)
+        self.d.attack(Coord(3, 3), Coord(2, 3), 100)
+        self.assertEqual(game.rooms_cleared, 1)
+
+
+class PlacementTest(unittest.TestCase):  # test collision free villain placement
+
+    def test_thousands_of_boards_never_overlap(self):
+        for seed in range(1000):
+            rng = CounterRNG(seed)
+            d = Dungeon(rng.randint(4, 12), rng.randint(4, 12), [], verbose=False, rng=rng)
+            d.place_heroes()
+            d.place_villains(rear=(Necromancer,))
+            squares = [d.position_of(v) for v in d.villains]
+            self.assertNotIn(None, squares)
+            self.assertEqual(len(set(squares)), len(squares))
+            self.assertTrue(all(c.x < d.height - 2 for c in squares))
+            self.assertEqual(len(d.positions), len(d.villains) + 4)
+            self.assertEqual(d.zobrist, position_key(d.board, d.player))
+
+    def test_free_cells_take_each_square_once(self):
+        cells, ends = spawn_cells(5, 4)
+        self.assertEqual(ends, (4, 8, 12))
+        free = FreeCells(cells, ends)
+        taken = [free.take(CounterRNG(3)) for _ in range(len(cells))]
+        self.assertEqual(sorted(taken), sorted(cells))
+        self.assertEqual(len(free.swapped), 0)
+        self.assertRaises(PlacementError, free.take, CounterRNG(3))
+
+    def test_min_distance(self):
+        d = Dungeon(8, 8, [Goblin() for _ in range(6)], verbose=False, rng=CounterRNG(1))
+        d.place_heroes()
+        heroes = [d.position_of(h) for h in d.heroes]
+        for seed in range(50):
+            d.rng = CounterRNG(seed)
+            d.place_villains(min_distance=3)
+            for v in d.villains:
+                c = d.position_of(v)
+                self.assertTrue(all(abs(c.x - h.x) + abs(c.y - h.y) >= 3 for h in heroes))
+        self.assertEqual(len(d.positions), 10)
+
+    def test_necromancer_at_the_back(self):
+        villains = [Necromancer() for _ in range(6)] + [Goblin(), Skeleton()]
+        d = Dungeon(6, 4, villains, verbose=False, rng=CounterRNG(5))
+        d.place_heroes()
+        d.place_villains(rear=(Necromancer,))
+        rows = sorted(d.position_of(v).x for v in villains[:6])
+        self.assertEqual(rows, [0, 0, 0, 0, 1, 1])
+
+    def test_too_many_villains(self):
+        d = Dungeon(4, 4, [Goblin() for _ in range(9)], verbose=False)
+        d.place_heroes()
+        self.assertRaises(PlacementError, d.place_villains)
+        self.assertEqual(len(d.positions), 4)  # nothing was placed
@@ -0,0 +1,205 @@
+from __future__ import annotations
+import os
+import random
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Iterator, List, Optional, Tuple, Type
+
+from character import Player
+from dice import MarginBuffer
+from dungeon import Dungeon
+from rng import CounterRNG
+from simulation import Agent, GreedyAgent, RandomAgent, Simulation
+
+
+class TournamentResult:
+    """
+    Totals for a batch of headless games. Results from separate chunks
+    are combined with merge(), which does not depend on the order the
+    chunks finished in.
+
+    Attributes:
+        games (int): games played
+        hero_wins (int): games won by the heroes
+        villain_wins (int): games won by the villains
+        draws (int): games stopped by the turn limit
+        lengths (Counter): game length in turns -> number of games
+        kills (Counter): attacker class name -> units it brought to 0 health
+    """
+
+    def __init__(self):
+        self.games = 0
+        self.hero_wins = 0
+        self.villain_wins = 0
+        self.draws = 0
+        self.lengths: Counter = Counter()
+        self.kills: Counter = Counter()
+
+    def record(self, sim: Simulation, winner: Optional[Player]):
+        """
+        Adds one finished game to the totals
+        """
+        self.games += 1
+        if winner is Player.HERO:
+            self.hero_wins += 1
+        elif winner is Player.VILLAIN:
+            self.villain_wins += 1
+        else:
+            self.draws += 1
+        self.lengths[sim.turns] += 1
+        self.kills.update(sim.kills)
+
+    def merge(self, other: TournamentResult):
+        """
+        Adds the totals of other into self
+        """
+        self.games += other.games
+        self.hero_wins += other.hero_wins
+        self.villain_wins += other.villain_wins
+        self.draws += other.draws
+        self.lengths.update(other.lengths)
+        self.kills.update(other.kills)
+
+    @property
+    def hero_win_rate(self):
+        return self.hero_wins / self.games if self.games else 0.0
+
+    @property
+    def villain_win_rate(self):
+        return self.villain_wins / self.games if self.games else 0.0
+
+    @property
+    def draw_rate(self):
+        return self.draws / self.games if self.games else 0.0
+
+    @property
+    def mean_length(self):
+        """
+        Returns the average game length in turns
+        """
+        if not self.games:
+            return 0.0
+        return sum(turns * n for turns, n in self.lengths.items()) / self.games
+
+    def __eq__(self, other):
+        if not isinstance(other, TournamentResult):
+            return NotImplemented
+        return (self.games, self.hero_wins, self.villain_wins, self.draws, self.lengths, self.kills) == \
+            (other.games, other.hero_wins, other.villain_wins, other.draws, other.lengths, other.kills)
+
+    def __str__(self):
+        return (f'{self.games} games: heroes {self.hero_win_rate:.1%}, villains {self.villain_win_rate:.1%}, '
+                f'draws {self.draw_rate:.1%}, mean length {self.mean_length:.1f} turns')
+
+
+def chunk_seed(seed: int, index: int) -> int:
+    """
+    Derives the RNG seed of one chunk from the master seed. Seeds belong to
+    chunks rather than worker processes, so a run is repeatable no matter
+    how many workers there are or which worker picks up which chunk.
+    """
+    return random.Random(f'{seed}:{index}').getrandbits(64)
+
+
+def make_agent(kind: Type[Agent], rng: random.Random) -> Agent:
+    """
+    Returns a new agent of class kind, handing it rng if it picks at random
+    the way RandomAgent and GreedyAgent do
+    """
+    return kind(rng) if issubclass(kind, RandomAgent) else kind()
+
+
+def play_chunk(seed: int, games: int, height: int = 8, width: int = 8,
+               hero_agent: Type[Agent] = GreedyAgent, villain_agent: Type[Agent] = GreedyAgent,
+               max_turns: int = 500, sample_attacks: bool = False, batch_attacks: bool = False) -> TournamentResult:
+    """
+    Plays a chunk of games inside one worker, or in this process
+
+    Game i of the chunk rolls from CounterRNG(seed, i) and its agents pick
+    with random.Random seeded from seed and i, so every chunk has its own
+    independent streams and the random module is never touched.
+
+    Parameters:
+        seed (int): RNG seed of this chunk
+        games (int): games to play
+        height (int): dungeon height
+        width (int): dungeon width
+        hero_agent (type): Agent class deciding for the heroes
+        villain_agent (type): Agent class deciding for the villains
+        max_turns (int): turn limit of each game
+        sample_attacks (Bool): resolve attacks from the odds tables
+        batch_attacks (Bool): roll attacks in NumPy batches, see dice.MarginBuffer
+
+    Returns:
+        result (TournamentResult): totals for this chunk
+    """
+    result = TournamentResult()
+    margins = MarginBuffer() if batch_attacks else None  # shared, a game uses only a few of each batch
+    for game in range(games):
+        dungeon = Dungeon(height, width, [], verbose=False, sample_attacks=sample_attacks,
+                          rng=CounterRNG(seed, game))
+        dungeon.margins = margins
+        heroes = make_agent(hero_agent, random.Random(f'{seed}:{game}:hero'))
+        villains = make_agent(villain_agent, random.Random(f'{seed}:{game}:villain'))
+        sim = Simulation(dungeon, heroes, villains, max_turns)
+        sim.setup()
+        result.record(sim, sim.play())
+    return result
+
+
+def split_chunks(games: int, chunk_size: int) -> List[Tuple[int, int]]:
+    """
+    Returns (chunk index, games in chunk) pairs covering all games
+    """
+    chunks = []
+    for index, start in enumerate(range(0, games, chunk_size)):
+        chunks.append((index, min(chunk_size, games - start)))
+    return chunks
+
+
+def iter_tournament(games: int, seed: int = 0, workers: int = None, chunk_size: int = 100,
+                    **options) -> Iterator[TournamentResult]:
+    """
+    Plays games across a process pool and yields each chunk's result as
+    soon as it finishes. Keyword options are passed on to play_chunk.
+
+    Parameters:
+        games (int): total number of games
+        seed (int): master seed the whole run is derived from
+        workers (int): worker processes, os.cpu_count() by default; 1 plays
+            every chunk in this process
+        chunk_size (int): games handed to a worker at a time
+
+    Yields:
+        result (TournamentResult): totals for one chunk
+    """
+    if games < 0 or chunk_size <= 0:
+        raise ValueError
+    chunks = split_chunks(games, chunk_size)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers == 1:
+        for index, count in chunks:
+            yield play_chunk(chunk_seed(seed, index), count, **options)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(play_chunk, chunk_seed(seed, index), count, **options)
+                   for index, count in chunks]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def run_tournament(games: int, seed: int = 0, workers: int = None, chunk_size: int = 100,
+                   **options) -> TournamentResult:
+    """
+    Plays games across a process pool and combines every chunk into one
+    result. The same seed and options always give the same result.
+    """
+    total = TournamentResult()
+    for result in iter_tournament(games, seed, workers, chunk_size, **options):
+        total.merge(result)
+    return total
+
+
+if __name__ == "__main__":
+    print(run_tournament(1000))
@@ -0,0 +1,116 @@
+from __future__ import annotations
+from enum import Enum
+from typing import Any, List, Optional
+
+
+class Bound(Enum):
+    EXACT = 0
+    LOWER = 1  # the true value is at least the stored one (fail high)
+    UPPER = 2  # the true value is at most the stored one (fail low)
+
+
+class Replace(Enum):
+    ALWAYS = 0  # the newest result wins
+    DEPTH = 1  # keep whichever result was searched deeper
+    TWO_TIER = 2  # one depth preferred slot and one always replaced slot per bucket
+
+
+class Entry:
+    """
+    One stored search result
+
+    Attributes:
+        key (int): full Zobrist hash of the position
+        depth (int): remaining depth the value was searched to
+        value (float): the score
+        bound (Bound): whether value is exact or a bound
+        move (Any): best action found, if any
+    """
+    __slots__ = ('key', 'depth', 'value', 'bound', 'move')
+
+    def __init__(self, key: int, depth: int, value: float, bound: Bound, move: Any):
+        self.key = key
+        self.depth = depth
+        self.value = value
+        self.bound = bound
+        self.move = move
+
+
+class TranspositionTable:
+    """
+    Fixed size table of search results keyed by Dungeon.zobrist. The low
+    bits of the key pick a bucket and the full key is stored to reject
+    collisions, so memory never grows past capacity entries.
+
+    Attributes:
+        capacity (int): number of buckets, rounded up to a power of two
+        policy (Replace): what to do when a bucket is already taken
+        hits (int): probes that found their position
+        misses (int): probes that did not
+    """
+
+    def __init__(self, capacity: int = 1 << 16, policy: Replace = Replace.DEPTH):
+        if capacity <= 0:
+            raise ValueError
+        if not isinstance(policy, Replace):
+            raise TypeError
+        size = 1
+        while size < capacity:
+            size <<= 1
+        self.capacity = size
+        self.policy = policy
+        self.__mask = size - 1
+        ways = 2 if policy is Replace.TWO_TIER else 1
+        self.__slots: List[Optional[Entry]] = [None] * (size * ways)
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return sum(1 for entry in self.__slots if entry is not None)
+
+    def clear(self):
+        self.__slots = [None] * len(self.__slots)
+        self.hits = 0
+        self.misses = 0
+
+    def probe(self, key: int) -> Optional[Entry]:
+        """
+        Returns the entry stored for key, None if there is none
+        """
+        slots = self.__slots
+        if self.policy is Replace.TWO_TIER:
+            index = (key & self.__mask) * 2
+            for entry in (slots[index], slots[index + 1]):
+                if entry is not None and entry.key == key:
+                    self.hits += 1
+                    return entry
+        else:
+            entry = slots[key & self.__mask]
+            if entry is not None and entry.key == key:
+                self.hits += 1
+                return entry
+        self.misses += 1
+        return None
+
+    def store(self, key: int, depth: int, value: float, bound: Bound = Bound.EXACT, move: Any = None):
+        """
+        Saves a search result, following the table's replacement policy
+        """
+        slots = self.__slots
+        entry = Entry(key, depth, value, bound, move)
+        if self.policy is Replace.ALWAYS:
+            slots[key & self.__mask] = entry
+        elif self.policy is Replace.DEPTH:
+            index = key & self.__mask
+            old = slots[index]
+            if old is None or old.key == key or depth >= old.depth:
+                slots[index] = entry
+        else:
+            index = (key & self.__mask) * 2
+            preferred = slots[index]
+            if preferred is None or preferred.key == key or depth >= preferred.depth:
+                if preferred is not None and preferred.key != key:
+                    slots[index + 1] = preferred  # the deeper result moves down instead of vanishing
+                slots[index] = entry
+            else:
+                slots[index + 1] = entry
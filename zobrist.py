@@ -0,0 +1,45 @@
+from __future__ import annotations
+import random
+
+from character import Character, Player
+from coord import MAX_SIDE
+from compact_board import KINDS, KIND_CODES, MAX_CELLS
+from creatures import Paladin
+
+HP_BUCKETS = 16  # health above 15 shares the top bucket
+
+# a fixed seed keeps hashes stable between runs, so they can be stored
+_rng = random.Random(0x5EED2B0B)
+PIECE_KEYS = tuple(tuple(tuple(tuple(_rng.getrandbits(64) for _ in range(MAX_CELLS))
+                               for _ in range(HP_BUCKETS))
+                         for _ in Player)
+                   for _ in KINDS)
+VILLAIN_TO_MOVE = _rng.getrandbits(64)
+PALADIN_CAN_HEAL = _rng.getrandbits(64)
+del _rng
+
+
+def piece_key(char: Character, x: int, y: int) -> int:
+    """
+    Returns the key of char standing on (x, y): its class, side, health
+    bucket, square and, for a Paladin, whether its revive is still unused.
+    Classes without a piece code (plain Hero or Villain) share code 0.
+    """
+    hp = char._temp_health
+    key = PIECE_KEYS[KIND_CODES.get(type(char), 0)][char._player.value][hp if hp < HP_BUCKETS else HP_BUCKETS - 1][x * MAX_SIDE + y]
+    if type(char) is Paladin and char._heal:
+        key ^= PALADIN_CAN_HEAL
+    return key
+
+
+def position_key(board, player: Player) -> int:
+    """
+    Hashes a whole position from scratch. Dungeon keeps the same value up
+    to date incrementally; this is the reference it is checked against.
+    """
+    key = VILLAIN_TO_MOVE if player is Player.VILLAIN else 0
+    for x, row in enumerate(board):
+        for y, char in enumerate(row):
+            if char is not None:
+                key ^= piece_key(char, x, y)
+    return key